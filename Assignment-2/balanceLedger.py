@@ -0,0 +1,199 @@
+import numpy as np
+from transaction import Transaction
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class BalanceLedger:
+    """
+    Balances of all peers after a block, delta-encoded.
+    Each ledger stores only the balance changes made by the transactions of its block, on top of its parent's ledger.
+    Full balances are materialized as a checkpoint every `checkpointInterval` blocks (by depth), so a lookup
+    walks at most that many deltas, and memory per block no longer grows with the number of peers.
+    """
+    checkpointInterval = 32
+    __slots__ = ("parent", "delta", "checkpoint")
+
+    def __init__(self, parent: Optional['BalanceLedger'], txnArrays: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]], depth: int, peerIds: List[int]):
+        """
+        Args:
+            parent (Optional[BalanceLedger]): Ledger of the parent block, None for the genesis block.
+            txnArrays (Optional[Tuple]): Senders, receivers and amounts of the block's transactions (coinbase sender is -1), None for the genesis block.
+            depth (int): Depth of the block in the blockchain.
+            peerIds (List[int]): IDs of all peers (used only by the genesis block, all balances start at 0).
+        """
+        delta: Dict[int, int] = {}
+        if txnArrays is not None:
+            senders, receivers, amounts = txnArrays
+            for senderId, receiverId, amount in zip(senders.tolist(), receivers.tolist(), amounts.tolist()):
+                if senderId != -1:
+                    delta[senderId] = delta.get(senderId, 0) - amount
+                delta[receiverId] = delta.get(receiverId, 0) + amount
+        self.delta = delta
+
+        if parent is None or depth % BalanceLedger.checkpointInterval == 0:
+            checkpoint = parent.to_dict() if parent is not None else {peerId: 0 for peerId in peerIds}
+            for peerId, amount in delta.items():
+                checkpoint[peerId] += amount
+            self.checkpoint: Optional[Dict[int, int]] = checkpoint
+            self.parent = None
+        else:
+            self.checkpoint = None
+            self.parent = parent
+
+    @classmethod
+    def restore(cls, balances: np.ndarray, peerIds: List[int]) -> 'BalanceLedger':
+        """Rebuilds a ledger from the balances of all peers (a checkpoint without parent, e.g. a block loaded from the block store)."""
+        ledger = cls.__new__(cls)
+        ledger.delta = {}
+        ledger.checkpoint = dict(zip(peerIds, balances.tolist()))
+        ledger.parent = None
+        return ledger
+
+    @classmethod
+    def restore_delta(cls, parent: 'BalanceLedger', peerIds: np.ndarray, amounts: np.ndarray) -> 'BalanceLedger':
+        """Rebuilds a ledger from its delta (peer IDs and balance changes) on top of its parent's ledger (e.g. a block loaded from the block store)."""
+        ledger = cls.__new__(cls)
+        ledger.delta = dict(zip(peerIds.tolist(), amounts.tolist()))
+        ledger.checkpoint = None
+        ledger.parent = parent
+        return ledger
+
+    def delta_arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns the delta as arrays of peer IDs and balance changes."""
+        return np.fromiter(self.delta.keys(), dtype=np.int64, count=len(self.delta)), np.fromiter(self.delta.values(), dtype=np.int64, count=len(self.delta))
+
+    def __getitem__(self, peerId: int) -> int:
+        """Returns the balance of the given peer."""
+        amount = 0
+        ledger = self
+        while ledger.checkpoint is None:
+            amount += ledger.delta.get(peerId, 0)
+            ledger = ledger.parent
+        return amount + ledger.checkpoint[peerId]
+
+    def get_balances(self, peerIds: Iterable[int]) -> Dict[int, int]:
+        """Returns the balances of the given peers, walking the deltas once (cheaper than a lookup per peer)."""
+        deltas = []
+        ledger = self
+        while ledger.checkpoint is None:
+            deltas.append(ledger.delta)
+            ledger = ledger.parent
+        checkpoint = ledger.checkpoint
+        balances = {peerId: checkpoint[peerId] for peerId in peerIds}
+        for delta in deltas:
+            for peerId, amount in delta.items():
+                if peerId in balances:
+                    balances[peerId] += amount
+        return balances
+
+    def to_dict(self) -> Dict[int, int]:
+        """Returns the balances of all peers, as a new dict."""
+        deltas = []
+        ledger = self
+        while ledger.checkpoint is None:
+            deltas.append(ledger.delta)
+            ledger = ledger.parent
+        balances = dict(ledger.checkpoint)
+        for delta in reversed(deltas):
+            for peerId, amount in delta.items():
+                balances[peerId] += amount
+        return balances
+
+
+def transaction_arrays(txnIDs: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Returns the senders, receivers and amounts of the given transactions (gathered from the transaction store, coinbase sender is -1)."""
+    store = Transaction.store
+    return store.senders[txnIDs], store.receivers[txnIDs], store.amounts[txnIDs]
+
+
+def spend_totals(senders: np.ndarray, amounts: np.ndarray, numPeers: int) -> np.ndarray:
+    """Returns the total amount sent by each peer (indexed by peer ID), coinbase (sender -1) is ignored."""
+    paid = senders >= 0
+    return np.bincount(senders[paid], weights=amounts[paid], minlength=numPeers).astype(np.int64)
+
+
+class ArrayBalanceLedger(BalanceLedger):
+    """
+    Balance ledger backed by NumPy arrays indexed by peer ID.
+    The transactions of a block are applied as batched array operations, deltas are stored sparse (peer IDs, amounts)
+    and checkpoints as dense integer arrays.
+    """
+    __slots__ = ()
+
+    def __init__(self, parent: Optional['ArrayBalanceLedger'], txnArrays: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]], depth: int, numPeers: int):
+        """
+        Args:
+            parent (Optional[ArrayBalanceLedger]): Ledger of the parent block, None for the genesis block.
+            txnArrays (Optional[Tuple]): Senders, receivers and amounts of the block's transactions, None for the genesis block.
+            depth (int): Depth of the block in the blockchain.
+            numPeers (int): Number of peers (peer IDs are 0 to numPeers - 1).
+        """
+        change = np.zeros(numPeers, dtype=np.int64)
+        if txnArrays is not None:
+            senders, receivers, amounts = txnArrays
+            np.add.at(change, receivers, amounts)
+            change -= spend_totals(senders, amounts, numPeers)
+        peerIds = np.flatnonzero(change)
+        self.delta = (peerIds, change[peerIds])
+
+        if parent is None or depth % BalanceLedger.checkpointInterval == 0:
+            self.checkpoint = change if parent is None else parent.to_array() + change
+            self.parent = None
+        else:
+            self.checkpoint = None
+            self.parent = parent
+
+    @classmethod
+    def restore(cls, balances: np.ndarray, peerIds: List[int]) -> 'ArrayBalanceLedger':
+        """Rebuilds a ledger from the balances of all peers, indexed by peer ID (a checkpoint without parent)."""
+        ledger = cls.__new__(cls)
+        ledger.delta = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64))
+        ledger.checkpoint = balances.astype(np.int64)
+        ledger.parent = None
+        return ledger
+
+    @classmethod
+    def restore_delta(cls, parent: 'ArrayBalanceLedger', peerIds: np.ndarray, amounts: np.ndarray) -> 'ArrayBalanceLedger':
+        """Rebuilds a ledger from its delta (sorted peer IDs and balance changes) on top of its parent's ledger."""
+        ledger = cls.__new__(cls)
+        ledger.delta = (peerIds, amounts)
+        ledger.checkpoint = None
+        ledger.parent = parent
+        return ledger
+
+    def delta_arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns the delta as arrays of peer IDs and balance changes."""
+        return self.delta
+
+    def __getitem__(self, peerId: int) -> int:
+        """Returns the balance of the given peer."""
+        amount = 0
+        ledger = self
+        while ledger.checkpoint is None:
+            peerIds, amounts = ledger.delta
+            position = peerIds.searchsorted(peerId)
+            if position < len(peerIds) and peerIds[position] == peerId:
+                amount += int(amounts[position])
+            ledger = ledger.parent
+        return amount + int(ledger.checkpoint[peerId])
+
+    def get_balances(self, peerIds: Iterable[int]) -> Dict[int, int]:
+        """Returns the balances of the given peers."""
+        balances = self.to_array()
+        return {peerId: int(balances[peerId]) for peerId in peerIds}
+
+    def to_array(self) -> np.ndarray:
+        """Returns the balances of all peers, as a new array indexed by peer ID."""
+        deltas = []
+        ledger = self
+        while ledger.checkpoint is None:
+            deltas.append(ledger.delta)
+            ledger = ledger.parent
+        balances = ledger.checkpoint.copy()
+        for peerIds, amounts in deltas:
+            balances[peerIds] += amounts      # Peer IDs of a delta are unique
+        return balances
+
+    def to_dict(self) -> Dict[int, int]:
+        """Returns the balances of all peers, as a new dict."""
+        return dict(enumerate(self.to_array().tolist()))
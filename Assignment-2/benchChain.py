@@ -0,0 +1,442 @@
+import random
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+from config import Config
+from benchUtils import measure_memory, measure_time, run_seeded, preserved_config
+
+
+#############################################
+## Block DAG Benchmark
+class DictTree:
+    """Reference per-peer blockchain tree storage (layout before the shared block DAG)."""
+    def __init__(self, genesisBlock):
+        self.seenBlocks = {genesisBlock.blkId: genesisBlock}
+        self.children = {}
+        self.VerifiedBlocks = [genesisBlock.blkId]
+        self.arrTime = {genesisBlock.blkId: 0}
+
+    def add_block(self, block, arrTime):
+        self.arrTime[block.blkId] = arrTime
+        self.seenBlocks[block.blkId] = block
+        self.VerifiedBlocks.append(block.blkId)
+        self.children.setdefault(block.parentBlkID, []).append(block.blkId)
+
+
+def bench_dag(num_peers: int, num_blocks: int):
+    """Compares memory per peer and block of per-peer dict trees against per-peer views of the shared block DAG,
+    for every peer receiving the same chain of blocks."""
+    from block import Block
+    from blockchainTree import BlockchainTree
+    from transaction import Transaction
+
+    Block.peerIds = list(range(num_peers))
+    genesis = Block(creatorId=-1, txns=[], parentBlockId="-1", parentBlockBalance=None, depth=0, timestamp=0)
+    blocks = [genesis]
+    for depth in range(1, num_blocks):
+        blocks.append(Block(creatorId=0, txns=[Transaction.create(-1, 0, Block.miningReward)], parentBlockId=blocks[-1].blkId, parentBlockBalance=blocks[-1].peerBalance, depth=depth, timestamp=depth))
+
+    def build(tree_class, count):
+        trees = [tree_class(genesis) for _ in range(count)]
+        for block in blocks[1:]:
+            for tree in trees:
+                tree.add_block(block, block.timestamp + 0.5)
+        return trees
+
+    dict_memory = measure_memory(lambda n: build(DictTree, n), num_peers) / num_blocks
+    dag_memory = measure_memory(lambda n: build(BlockchainTree, n), num_peers) / num_blocks
+    print(f"{num_peers} peers, {num_blocks} blocks (shared block DAG stored once: {len(BlockchainTree.dag)} blocks)")
+    print(f"{'Trees':<20}{'B/peer/block':>14}")
+    print(f"{'per-peer dicts':<20}{dict_memory:>14.1f}")
+    print(f"{'shared DAG views':<20}{dag_memory:>14.1f}")
+## Block DAG Benchmark Ends
+#############################################
+
+
+#############################################
+## Tree Scaling Benchmark
+def bench_tree(max_blocks: int, batch: int):
+    """Reports the cost per add_block (verification included) as the tree grows, every tenth block forking off a side branch,
+    against the verified-list membership check of the previous tree layout alone."""
+    from block import Block
+    from blockchainTree import BlockchainTree
+    from transaction import Transaction
+
+    Block.peerIds = list(range(10))
+    genesis = Block(creatorId=-1, txns=[], parentBlockId="-1", parentBlockBalance=None, depth=0, timestamp=0)
+    tree = BlockchainTree(genesis)
+    verifiedList = [genesis.blkId]
+    tip = genesis
+
+    def next_blocks(count):
+        nonlocal tip
+        blocks = []
+        for _ in range(count):
+            block = Block(creatorId=0, txns=[Transaction.create(-1, 0, Block.miningReward)], parentBlockId=tip.blkId, parentBlockBalance=tip.peerBalance, depth=tip.depth + 1, timestamp=tip.timestamp + 1)
+            blocks.append(block)
+            if block.depth % 10 == 0:
+                blocks.append(Block(creatorId=1, txns=[Transaction.create(-1, 1, Block.miningReward)], parentBlockId=tip.blkId, parentBlockBalance=tip.peerBalance, depth=tip.depth + 1, timestamp=tip.timestamp + 1))
+            tip = block
+        return blocks
+
+    print(f"{'Blocks':>10}{'add_block (us)':>16}{'list check (us)':>17}{'Tips':>8}{'Height':>8}")
+    size = 100
+    while size <= max_blocks:
+        for block in next_blocks(size - tree.verifiedCount):
+            tree.add_block(block, block.timestamp)
+            verifiedList.append(block.blkId)
+        blocks = next_blocks(batch)
+        start = time.perf_counter()
+        for block in blocks:
+            tree.add_block(block, block.timestamp)
+        add_time = (time.perf_counter() - start) / len(blocks)
+        list_time = measure_time(lambda: [block.parentBlkID in verifiedList for block in blocks], repeat=1) / len(blocks)
+        verifiedList += [block.blkId for block in blocks]
+        print(f"{size:>10}{add_time * 1e6:>16.1f}{list_time * 1e6:>17.1f}{len(tree.tips()):>8}{tree.height:>8}")
+        size *= 10
+## Tree Scaling Benchmark Ends
+#############################################
+
+
+#############################################
+## LCA Benchmark
+def walk_lca(tree, blk1, blk2):
+    """Reference LCA walking parent links one block at a time (previous BlockchainTree.lca)."""
+    block1, block2 = tree.get_block_from_hash(blk1), tree.get_block_from_hash(blk2)
+    while block1.depth < block2.depth:
+        block2 = tree.get_block_from_hash(block2.parentBlkID)
+    while block1.depth > block2.depth:
+        block1 = tree.get_block_from_hash(block1.parentBlkID)
+    while block1.blkId != block2.blkId:
+        block1, block2 = tree.get_block_from_hash(block1.parentBlkID), tree.get_block_from_hash(block2.parentBlkID)
+    return block1.blkId
+
+
+def bench_lca(depth: int, count: int):
+    """Compares LCA queries walking parent links against skip pointers, for reorgs of growing length on a chain of the given depth,
+    and for the tip extension fast path."""
+    from block import Block
+    from blockchainTree import BlockchainTree
+    from transaction import Transaction
+
+    Block.peerIds = list(range(10))
+    genesis = Block(creatorId=-1, txns=[], parentBlockId="-1", parentBlockBalance=None, depth=0, timestamp=0)
+    tree = BlockchainTree(genesis)
+
+    def extend(parent, length, creatorId):
+        for _ in range(length):
+            parent = Block(creatorId=creatorId, txns=[Transaction.create(-1, creatorId, Block.miningReward)], parentBlockId=parent.blkId, parentBlockBalance=parent.peerBalance, depth=parent.depth + 1, timestamp=parent.timestamp + 1)
+            tree.add_block(parent, parent.timestamp)
+        return parent
+
+    tip = extend(genesis, depth, 0)
+    print(f"Chain of {depth} blocks, {count} queries per case")
+    print(f"{'Case':<28}{'walk (us)':>12}{'skip (us)':>12}")
+    cases = [("tip extension", tip.parentBlkID)]
+    for length in [1, 10, 100, 1000, depth // 2]:
+        if length < depth:
+            cases.append((f"reorg of {length} blocks", extend(tree.get_block_from_hash(tree.ancestor(tip.blkId, depth - length)), length, 1).blkId))
+    for name, other in cases:
+        assert walk_lca(tree, tip.blkId, other) == tree.lca(tip.blkId, other)
+        walk_time = measure_time(lambda: [walk_lca(tree, tip.blkId, other) for _ in range(count)]) / count
+        skip_time = measure_time(lambda: [tree.lca(tip.blkId, other) for _ in range(count)]) / count
+        print(f"{name:<28}{walk_time * 1e6:>12.2f}{skip_time * 1e6:>12.2f}")
+## LCA Benchmark Ends
+#############################################
+
+
+#############################################
+## Block ID Benchmark
+def bench_blockids(num_peers: int, sim_time: float, seed: int):
+    """Runs the same seeded simulation with hex digest block IDs and with compact (registry handle) block IDs,
+    and reports wall clock time, peak traced memory and whether every peer ends on the same chain tip."""
+    from block import Block
+
+    results = []
+    run_seeded(num_peers, 1, seed, "heap")     # Warm up (imports) before timing
+    with preserved_config():
+        for name, compact_ids in [("hex digests", False), ("registry handles", True)]:
+            Config.compact_ids = compact_ids
+            tracemalloc.start()
+            start = time.perf_counter()
+            simulator = run_seeded(num_peers, sim_time, seed, "heap")
+            elapsed = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            tips = tuple(Block.hex_id(peer.get_lastBlk().blkId) for peer in simulator.peers)
+            results.append((name, elapsed, peak, tips))
+            del simulator
+
+    print(f"{num_peers} peers, {sim_time}s simulated, {len(Block.registry)} blocks registered")
+    print(f"{'Block IDs':<20}{'Time (s)':>10}{'Peak (MB)':>12}{'Same result':>14}")
+    for name, elapsed, peak, tips in results:
+        print(f"{name:<20}{elapsed:>10.2f}{peak / 2**20:>12.1f}{str(tips == results[0][3]):>14}")
+## Block ID Benchmark Ends
+#############################################
+
+
+#############################################
+## Orphan Pool Benchmark
+def recursive_tree_class():
+    """Reference blockchain tree connecting and deleting dangling blocks recursively, without a size cap (previous BlockchainTree)."""
+    from blockchainTree import BlockchainTree
+
+    class RecursiveTree(BlockchainTree):
+        def __init__(self, genesisBlock):
+            super().__init__(genesisBlock)
+            self.danglingBlocksList = defaultdict(list)
+
+        def add_dangling_block(self, block):
+            if not self.verify_correctness(block):
+                self.recursive_deletion(block.blkId)
+                return
+            self.mark_verified(self.dag.index[block.blkId])
+            self.update_longest_chain(block)
+            if block.blkId in self.danglingBlocksList:
+                for childId in self.danglingBlocksList[block.blkId]:
+                    self.add_dangling_block(self.dag.get(childId))
+                del self.danglingBlocksList[block.blkId]
+
+        def add_block(self, block, arrTime):
+            if self.check_block(block.blkId):
+                return
+            index = self.dag.add(block)
+            self.mark_seen(index, arrTime)
+            if not self.is_verified(block.parentBlkID):
+                self.danglingBlocksList[block.parentBlkID].append(block.blkId)
+                return
+            if not self.verify_correctness(block):
+                self.recursive_deletion(block.blkId)
+                return
+            self.mark_verified(index)
+            self.prevChainTip = self.longestChainTip
+            self.update_longest_chain(block)
+            if block.blkId in self.danglingBlocksList:
+                for childId in self.danglingBlocksList[block.blkId]:
+                    self.add_dangling_block(self.dag.get(childId))
+                del self.danglingBlocksList[block.blkId]
+
+        def recursive_deletion(self, blockId):
+            if blockId in self.danglingBlocksList:
+                for childId in self.danglingBlocksList[blockId]:
+                    self.recursive_deletion(childId)
+                del self.danglingBlocksList[blockId]
+
+    return RecursiveTree
+
+
+def bench_orphans(max_length: int, capacity: int, seed: int):
+    """Delivers a released private chain to a fresh tree in reverse order (every block dangling until the first arrives),
+    with recursive connection and with the iterative orphan pool, then in random order to bounded pools of each eviction policy."""
+    from block import Block
+    from blockchainTree import BlockchainTree
+    from transaction import Transaction
+
+    Block.peerIds = list(range(10))
+    genesis = Block(creatorId=-1, txns=[], parentBlockId="-1", parentBlockBalance=None, depth=0, timestamp=0)
+    chain = [genesis]
+    while len(chain) <= max_length:
+        tip = chain[-1]
+        chain.append(Block(creatorId=0, txns=[Transaction.create(-1, 0, Block.miningReward)], parentBlockId=tip.blkId, parentBlockBalance=tip.peerBalance, depth=tip.depth + 1, timestamp=tip.timestamp + 1))
+
+    def deliver(tree, blocks):
+        start = time.perf_counter()
+        for block in blocks:
+            tree.add_block(block, block.timestamp)
+        return (time.perf_counter() - start) / len(blocks)
+
+    RecursiveTree = recursive_tree_class()
+    print(f"{'Chain length':>12}{'recursive (us/block)':>22}{'orphan pool (us/block)':>24}{'Height':>8}")
+    length = 100
+    while length <= max_length:
+        blocks = chain[length:0:-1]
+        try:
+            recursive_time = f"{deliver(RecursiveTree(genesis), blocks) * 1e6:.1f}"
+        except RecursionError:
+            recursive_time = "RecursionError"
+        tree = BlockchainTree(genesis)
+        pool_time = deliver(tree, blocks)
+        print(f"{length:>12}{recursive_time:>22}{pool_time * 1e6:>24.1f}{tree.height:>8}")
+        length *= 10
+
+    ## Random arrival order, the pool holds at most `capacity` dangling blocks
+    blocks = chain[1:]
+    random.Random(seed).shuffle(blocks)
+    print(f"\n{len(blocks)} blocks in random order, capacity {capacity}")
+    print(f"{'Eviction':>10}{'Peak':>8}{'Evicted':>10}{'Connected':>11}{'Height':>8}")
+    with preserved_config():
+        for policy in ["oldest", "deepest"]:
+            Config.orphan_capacity, Config.orphan_eviction = capacity, policy
+            tree = BlockchainTree(genesis)
+            deliver(tree, blocks)
+            pool = tree.orphanPool
+            print(f"{policy:>10}{pool.peak:>8}{pool.evicted:>10}{pool.connected:>11}{tree.height:>8}")
+## Orphan Pool Benchmark Ends
+#############################################
+
+
+#############################################
+## Validation Cache Benchmark
+def bench_validation(num_peers: int, num_blocks: int, num_txns: int):
+    """Every peer receives the same chain of blocks, validating each block on every peer against validating it once
+    (validation cache), and reports time per received block, validations, cache hits and whether all peers end on the same tip."""
+    from block import Block
+    from blockchainTree import BlockchainTree
+    from transaction import Transaction
+
+    Block.peerIds = list(range(num_peers))
+    rng = random.Random(1)
+    genesis = Block(creatorId=-1, txns=[], parentBlockId="-1", parentBlockBalance=None, depth=0, timestamp=0)
+    chain = [genesis]
+    for _ in range(num_blocks):
+        tip = chain[-1]
+        txns = [Transaction.create(-1, 0, Block.miningReward)] + [Transaction.create(rng.randrange(num_peers), rng.randrange(num_peers), 0) for _ in range(num_txns - 1)]
+        chain.append(Block(creatorId=0, txns=txns, parentBlockId=tip.blkId, parentBlockBalance=tip.peerBalance, depth=tip.depth + 1, timestamp=tip.timestamp + 1))
+
+    print(f"{num_peers} peers, {num_blocks} blocks of {num_txns} transactions")
+    print(f"{'Validation':<16}{'us/block/peer':>15}{'Validations':>13}{'Cache hits':>12}{'Same result':>13}")
+    results = []
+    with preserved_config():
+        for name, validation_cache in [("every peer", False), ("cache", True)]:
+            Config.validation_cache = validation_cache
+            BlockchainTree.dag = None
+            trees = [BlockchainTree(genesis) for _ in range(num_peers)]
+            start = time.perf_counter()
+            for block in chain[1:]:
+                for tree in trees:
+                    tree.add_block(block, block.timestamp)
+            elapsed = time.perf_counter() - start
+            tips = tuple(tree.longestChainTip for tree in trees)
+            results.append(tips)
+            validations = sum(tree.validations for tree in trees)
+            hits = sum(tree.validationHits for tree in trees)
+            print(f"{name:<16}{elapsed / (num_blocks * num_peers) * 1e6:>15.1f}{validations:>13}{hits:>12}{str(tips == results[0]):>13}")
+## Validation Cache Benchmark Ends
+#############################################
+
+
+#############################################
+## Pruning Benchmark
+def bench_pruning(num_peers: int, sim_time: float, seed: int, finality_depth: int):
+    """Runs the same seeded simulation keeping all blocks and pruning blocks below the finality depth, and reports wall clock time,
+    peak and final traced memory, pruned blocks and whether every peer ends on the same chain tip."""
+    from block import Block
+    from blockchainTree import BlockchainTree
+
+    results = []
+    run_seeded(num_peers, 1, seed, "heap")     # Warm up (imports) before timing
+    with preserved_config():
+        for name, depth in [("keep all", None), (f"finality {finality_depth}", finality_depth)]:
+            Config.finality_depth = depth
+            tracemalloc.start()
+            start = time.perf_counter()
+            simulator = run_seeded(num_peers, sim_time, seed, "heap")
+            elapsed = time.perf_counter() - start
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            dag = BlockchainTree.dag
+            tips = tuple(Block.hex_id(peer.get_lastBlk().blkId) for peer in simulator.peers)
+            results.append((name, elapsed, peak, current, dag.prunedBlocks, len(dag), tips))
+            del simulator, dag
+
+    print(f"{num_peers} peers, {sim_time}s simulated")
+    print(f"{'Blocks':<14}{'Time (s)':>10}{'Peak (MB)':>12}{'Final (MB)':>12}{'Pruned':>12}{'Same result':>14}")
+    for name, elapsed, peak, current, pruned, blocks, tips in results:
+        print(f"{name:<14}{elapsed:>10.2f}{peak / 2**20:>12.1f}{current / 2**20:>12.1f}{f'{pruned}/{blocks}':>12}{str(tips == results[0][6]):>14}")
+## Pruning Benchmark Ends
+#############################################
+
+
+#############################################
+## Block Store Benchmark
+def run_block_store(num_peers: int, sim_time: float, seed: int, txn_interarrival: float, block_store, block_cache: int, connection):
+    """Runs a seeded simulation in a child process with the given block store, sends back time, store counters, peak RSS and chain tips."""
+    from main import setup_peers
+    from eventSimulator import run_simulation, peak_rss_mb
+    from block import Block
+
+    Config.block_store, Config.block_cache = block_store, block_cache
+    random.seed(seed)
+    with tempfile.TemporaryDirectory() as folder:
+        peers, _, _ = setup_peers(num_peers, num_peers // 5, folder)
+    start = time.perf_counter()
+    run_simulation(peers, 10, txn_interarrival, 0.5, sim_time, engine="heap")
+    elapsed = time.perf_counter() - start
+    store = peers[0].blockchain.dag.store     # Closed at the end of the simulation
+    counters = (store.hits, store.misses, store.hit_rate()) if store is not None else None
+    connection.send((elapsed, counters, peak_rss_mb(), tuple(Block.hex_id(peer.blockchain.longestChainTip) for peer in peers)))
+
+
+def bench_block_store(num_peers: int, sim_time: float, seed: int, txn_interarrival: float):
+    """Runs the same seeded simulation (each in its own process, for peak RSS) with all blocks in memory and with the SQLite block store
+    for several cache sizes, and reports wall clock time, cache hit rate, peak RSS and whether every peer ends on the same chain tip."""
+    import multiprocessing
+
+    context = multiprocessing.get_context("fork")
+    results = []
+    with tempfile.TemporaryDirectory() as folder:
+        for name, block_store, block_cache in [("in memory", None, 0), ("store, 1024 cached", f"{folder}/blocks.db", 1024), ("store, 16 cached", f"{folder}/blocks.db", 16)]:
+            receiver, sender = context.Pipe(duplex=False)
+            process = context.Process(target=run_block_store, args=(num_peers, sim_time, seed, txn_interarrival, block_store, block_cache, sender))
+            process.start()
+            results.append((name, *receiver.recv()))
+            process.join()
+
+    print(f"{num_peers} peers, {sim_time}s simulated, transactions every {txn_interarrival}s per peer")
+    print(f"{'Blocks':<20}{'Time (s)':>10}{'Hit rate':>10}{'Loads':>8}{'Peak RSS (MB)':>15}{'Same result':>14}")
+    for name, elapsed, counters, rss, tips in results:
+        hit_rate, loads = (f"{counters[2]:.1%}", counters[1]) if counters is not None else ("-", "-")
+        print(f"{name:<20}{elapsed:>10.2f}{hit_rate:>10}{loads:>8}{rss:>15.0f}{str(tips == results[0][4]):>14}")
+## Block Store Benchmark Ends
+#############################################
+
+
+def add_benchmarks(subparsers):
+    """Adds the subcommands of these benchmarks to the benchmark.py parser."""
+    dag_parser = subparsers.add_parser("dag", help="Memory per peer and block of per-peer dict trees and of the shared block DAG")
+    dag_parser.add_argument("-n", "--num_peers", type=int, default=200, help="Total Number of Peers")
+    dag_parser.add_argument("--blocks", type=int, default=1000, help="Number of blocks in the chain")
+    dag_parser.set_defaults(run=lambda args: bench_dag(args.num_peers, args.blocks))
+
+    tree_parser = subparsers.add_parser("tree", help="Cost per add_block as the blockchain tree grows")
+    tree_parser.add_argument("--blocks", type=int, default=100000, help="Largest tree size")
+    tree_parser.add_argument("--batch", type=int, default=200, help="Number of blocks timed at each size")
+    tree_parser.set_defaults(run=lambda args: bench_tree(args.blocks, args.batch))
+
+    lca_parser = subparsers.add_parser("lca", help="LCA queries walking parent links and with skip pointers")
+    lca_parser.add_argument("--depth", type=int, default=20000, help="Depth of the chain")
+    lca_parser.add_argument("--count", type=int, default=200, help="Number of queries per case")
+    lca_parser.set_defaults(run=lambda args: bench_lca(args.depth, args.count))
+
+    blockids_parser = subparsers.add_parser("blockids", help="Time and memory of a simulation with hex digest and compact block IDs")
+    blockids_parser.add_argument("-n", "--num_peers", type=int, default=100, help="Total Number of Peers")
+    blockids_parser.add_argument("-s", "--sim_time", type=float, default=300, help="Simulation Time (seconds)")
+    blockids_parser.add_argument("--seed", type=int, default=1, help="Seed for random number generation")
+    blockids_parser.set_defaults(run=lambda args: bench_blockids(args.num_peers, args.sim_time, args.seed))
+
+    orphans_parser = subparsers.add_parser("orphans", help="Dangling blocks of a private chain arriving out of order, recursive and with the bounded orphan pool")
+    orphans_parser.add_argument("--length", type=int, default=100000, help="Longest chain delivered in reverse order")
+    orphans_parser.add_argument("--capacity", type=int, default=100, help="Orphan pool capacity for the random order runs")
+    orphans_parser.add_argument("--seed", type=int, default=1, help="Seed of the random arrival order")
+    orphans_parser.set_defaults(run=lambda args: bench_orphans(args.length, args.capacity, args.seed))
+
+    validation_parser = subparsers.add_parser("validation", help="Block validation on every peer and with the shared validation cache")
+    validation_parser.add_argument("-n", "--num_peers", type=int, default=100, help="Number of peers receiving the chain")
+    validation_parser.add_argument("--blocks", type=int, default=50, help="Number of blocks in the chain")
+    validation_parser.add_argument("--txns", type=int, default=1000, help="Transactions per block (coinbase included)")
+    validation_parser.set_defaults(run=lambda args: bench_validation(args.num_peers, args.blocks, args.txns))
+
+    pruning_parser = subparsers.add_parser("pruning", help="Time and memory of a long simulation keeping all blocks and with finality depth pruning")
+    pruning_parser.add_argument("-n", "--num_peers", type=int, default=20, help="Total Number of Peers")
+    pruning_parser.add_argument("-s", "--sim_time", type=float, default=3000, help="Simulation Time (seconds)")
+    pruning_parser.add_argument("--seed", type=int, default=1, help="Seed for random number generation")
+    pruning_parser.add_argument("-k", "--finality_depth", type=int, default=20, help="Finality depth of the pruned run")
+    pruning_parser.set_defaults(run=lambda args: bench_pruning(args.num_peers, args.sim_time, args.seed, args.finality_depth))
+
+    blockstore_parser = subparsers.add_parser("blockstore", help="Time, cache hit rate and peak RSS of a simulation with blocks in memory and in the SQLite block store")
+    blockstore_parser.add_argument("-n", "--num_peers", type=int, default=20, help="Total Number of Peers")
+    blockstore_parser.add_argument("-s", "--sim_time", type=float, default=1000, help="Simulation Time (seconds)")
+    blockstore_parser.add_argument("--seed", type=int, default=1, help="Seed for random number generation")
+    blockstore_parser.add_argument("-t", "--transaction_interarrival", type=float, default=0.5, help="Mean Interarrival Time for Transaction Generation (seconds)")
+    blockstore_parser.set_defaults(run=lambda args: bench_block_store(args.num_peers, args.sim_time, args.seed, args.transaction_interarrival))
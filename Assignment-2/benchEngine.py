@@ -0,0 +1,157 @@
+import random
+import time
+from enum import Enum, auto
+from event import EventType, Event
+from config import Config
+from benchUtils import measure_memory, measure_time, run_seeded, preserved_config
+
+
+#############################################
+## Event Layout Benchmark
+class DictEventType(Enum):
+    """Reference Enum based event types (layout before slots/integer codes)."""
+    HASH_PROPAGATE = auto()
+    BLOCK_PROPAGATE = auto()
+
+
+class DictEvent:
+    """Reference __dict__ based event (layout before slots/integer codes)."""
+    def __init__(self, etype, channel, timestamp, senderPeerId, peerId, timeoutTargetId=None, blkId=None, block=None, transaction=None):
+        self.etype = etype
+        self.channel = channel
+        self.timestamp = timestamp
+        self.senderPeerId = senderPeerId
+        self.peerId = peerId
+        self.timeoutTargetId = timeoutTargetId
+        self.blkId = blkId
+        self.block = block
+        self.transaction = transaction
+
+
+def bench_event(count: int):
+    """Compares memory per pending event and dispatch cost of the dict/Enum layout against the slot/integer layout."""
+    blkId = "0" * 64
+    dict_memory = measure_memory(lambda n: [DictEvent(DictEventType.HASH_PROPAGATE, 1, float(i), 0, 1, blkId=blkId) for i in range(n)], count)
+    slot_memory = measure_memory(lambda n: [Event(EventType.HASH_PROPAGATE, 1, float(i), 0, 1, blkId=blkId) for i in range(n)], count)
+
+    handled = [0]
+    def handler(event):
+        handled[0] += 1
+
+    dict_handlers = {etype: handler for etype in DictEventType}
+    dict_events = [DictEvent(DictEventType.HASH_PROPAGATE, 1, float(i), 0, 1, blkId=blkId) for i in range(count)]
+    def dict_dispatch():
+        for event in dict_events:
+            dict_handlers.get(event.etype, None)(event)
+
+    slot_handlers = [handler] * len(EventType)
+    slot_events = [Event(EventType.HASH_PROPAGATE, 1, float(i), 0, 1, blkId=blkId) for i in range(count)]
+    def slot_dispatch():
+        for event in slot_events:
+            slot_handlers[event.etype](event)
+
+    dict_time = measure_time(dict_dispatch)
+    slot_time = measure_time(slot_dispatch)
+
+    print(f"{'Layout':<20}{'Bytes/event':>15}{'ns/dispatch':>15}")
+    print(f"{'dict + Enum':<20}{dict_memory:>15.1f}{dict_time / count * 1e9:>15.1f}")
+    print(f"{'slots + int codes':<20}{slot_memory:>15.1f}{slot_time / count * 1e9:>15.1f}")
+## Event Layout Benchmark Ends
+#############################################
+
+
+#############################################
+## Engine Benchmark
+def bench_engine(num_peers: int, sim_time: float, seed: int):
+    """Runs the same seeded simulation on each engine and reports events per second and event queue operations."""
+    results = []
+    with preserved_config():
+        for name, engine, fanout in [("simpy", "simpy", False), ("heap", "heap", False), ("heap + fanout", "heap", True)]:
+            Config.fanout = fanout
+            start = time.perf_counter()
+            simulator = run_seeded(num_peers, sim_time, seed, engine)
+            elapsed = time.perf_counter() - start
+            env = simulator.env
+            operations = (env.pushes + env.pops + env.replaces, env.peakSize) if engine == "heap" else ("-", "-")
+            results.append((name, simulator.processedEvents, elapsed) + operations)
+
+    print(f"{'Engine':<15}{'Events':>12}{'Time (s)':>12}{'Events/s':>12}{'Heap ops':>12}{'Peak queue':>12}")
+    for name, events, elapsed, operations, peak in results:
+        print(f"{name:<15}{events:>12}{elapsed:>12.2f}{events / elapsed:>12.0f}{operations:>12}{peak:>12}")
+## Engine Benchmark Ends
+#############################################
+
+
+#############################################
+## Link Delay Benchmark
+def bench_delay(count: int):
+    """Compares the cost of drawing link queuing delays with random.expovariate against the pre-sampled delay pool."""
+    from linkDelay import LinkDelaySampler
+
+    speeds = [5, 100] * (count // 2)
+    def expovariate():
+        for cij in speeds:
+            random.expovariate(lambd=cij/96)
+
+    sampler = LinkDelaySampler(seed=1)
+    def pool():
+        sample = sampler.sample
+        for cij in speeds:
+            sample(cij)
+
+    expovariate_time = measure_time(expovariate)
+    pool_time = measure_time(pool)
+
+    print(f"{'Sampler':<20}{'ns/delay':>15}")
+    print(f"{'random.expovariate':<20}{expovariate_time / len(speeds) * 1e9:>15.1f}")
+    print(f"{'delay pool':<20}{pool_time / len(speeds) * 1e9:>15.1f}")
+## Link Delay Benchmark Ends
+#############################################
+
+
+#############################################
+## Mining Clock Benchmark
+def bench_mining(num_peers: int, sim_time: float, seeds: int):
+    """Compares fork statistics and mining events of per-peer mining events against the global mining clock, over several seeds."""
+    from peer import PeerNode
+
+    print(f"{'Mining':<12}{'Blocks':>10}{'Main chain':>12}{'Fork ratio':>12}{'Mining events':>15}{'Time (s)':>10}")
+    with preserved_config():
+        for name, global_mining in [("per-peer", False), ("global", True)]:
+            Config.global_mining = global_mining
+            blocks, mainChain, miningEvents, elapsed = 0, 0, 0, 0
+            for seed in range(seeds):
+                start = time.perf_counter()
+                simulator = run_seeded(num_peers, sim_time, seed, "heap")
+                elapsed += time.perf_counter() - start
+                honest = next(peer for peer in simulator.peers if type(peer) is PeerNode)
+                blocks += honest.blockchain.verifiedCount - 1
+                mainChain += honest.get_lastBlk().depth
+                miningEvents += simulator.miningEvents
+            print(f"{name:<12}{blocks / seeds:>10.1f}{mainChain / seeds:>12.1f}{1 - mainChain / blocks:>12.3f}{miningEvents / seeds:>15.1f}{elapsed / seeds:>10.2f}")
+## Mining Clock Benchmark Ends
+#############################################
+
+
+
+def add_benchmarks(subparsers):
+    """Adds the subcommands of these benchmarks to the benchmark.py parser."""
+    event_parser = subparsers.add_parser("event", help="Memory and dispatch cost of Event layouts")
+    event_parser.add_argument("--count", type=int, default=200000, help="Number of events")
+    event_parser.set_defaults(run=lambda args: bench_event(args.count))
+
+    engine_parser = subparsers.add_parser("engine", help="Events per second and queue operations of simpy, heap and fan-out engines")
+    engine_parser.add_argument("-n", "--num_peers", type=int, default=100, help="Total Number of Peers")
+    engine_parser.add_argument("-s", "--sim_time", type=float, default=100, help="Simulation Time (seconds)")
+    engine_parser.add_argument("--seed", type=int, default=1, help="Seed for random number generation")
+    engine_parser.set_defaults(run=lambda args: bench_engine(args.num_peers, args.sim_time, args.seed))
+
+    delay_parser = subparsers.add_parser("delay", help="Cost of sampling link queuing delays")
+    delay_parser.add_argument("--count", type=int, default=1000000, help="Number of delays")
+    delay_parser.set_defaults(run=lambda args: bench_delay(args.count))
+
+    mining_parser = subparsers.add_parser("mining", help="Fork statistics of per-peer mining events and of the global mining clock")
+    mining_parser.add_argument("-n", "--num_peers", type=int, default=30, help="Total Number of Peers")
+    mining_parser.add_argument("-s", "--sim_time", type=float, default=500, help="Simulation Time (seconds)")
+    mining_parser.add_argument("--seeds", type=int, default=10, help="Number of seeds to average over")
+    mining_parser.set_defaults(run=lambda args: bench_mining(args.num_peers, args.sim_time, args.seeds))
@@ -0,0 +1,218 @@
+import os
+import random
+import numpy as np
+from config import Config
+from benchUtils import measure_memory, measure_time, preserved_config
+
+
+#############################################
+## Balance Ledger Benchmark
+def random_block_txns(num_peers: int, num_blocks: int, num_txns: int) -> list:
+    """Returns the senders, receivers and amounts of the transactions (coinbase first) of a chain of blocks, None for the genesis block."""
+    from balanceLedger import transaction_arrays
+    from transaction import Transaction
+
+    rng = random.Random(1)
+    return [None] + [transaction_arrays(np.array([Transaction.create(-1, rng.randrange(num_peers), 50)] + [Transaction.create(rng.randrange(num_peers), rng.randrange(num_peers), 1) for _ in range(num_txns)])) for _ in range(num_blocks - 1)]
+
+
+def build_balances(num_peers: int, blockTxns: list, snapshot: bool) -> list:
+    """Builds the balances after each block of a chain, as full dict snapshots (previous layout) or as delta ledgers."""
+    from balanceLedger import BalanceLedger
+
+    peerIds = list(range(num_peers))
+    chain = []
+    parent = None
+    for depth, txnArrays in enumerate(blockTxns):
+        if snapshot:
+            balance = {peerId: 0 for peerId in peerIds} if parent is None else dict(parent)
+            if txnArrays is not None:
+                for senderId, receiverId, amount in zip(*(column.tolist() for column in txnArrays)):
+                    if senderId != -1:
+                        balance[senderId] -= amount
+                    balance[receiverId] += amount
+        else:
+            balance = BalanceLedger(parent, txnArrays, depth, peerIds)
+        chain.append(balance)
+        parent = balance
+    return chain
+
+
+def bench_ledger(num_blocks: int, num_txns: int):
+    """Compares memory per block and balance lookup cost of full dict snapshots against the delta ledger, for growing peer counts."""
+    from balanceLedger import BalanceLedger
+
+    print(f"Checkpoint interval: {BalanceLedger.checkpointInterval} blocks, {num_txns} transactions per block")
+    print(f"{'Peers':>8}{'Snapshot B/block':>20}{'Ledger B/block':>18}{'Snapshot ns/get':>18}{'Ledger ns/get':>16}")
+    for num_peers in [100, 1000, 5000]:
+        blockTxns = random_block_txns(num_peers, num_blocks, num_txns)
+        memory, lookups = [], []
+        for snapshot in [True, False]:
+            memory.append(measure_memory(lambda n: build_balances(num_peers, blockTxns, snapshot), num_blocks))
+
+            chain = build_balances(num_peers, blockTxns, snapshot)
+            queries = [(chain[random.randrange(num_blocks)], random.randrange(num_peers)) for _ in range(100000)]
+            def lookup():
+                for balance, peerId in queries:
+                    balance[peerId]
+            lookups.append(measure_time(lookup) / len(queries) * 1e9)
+        print(f"{num_peers:>8}{memory[0]:>20.0f}{memory[1]:>18.0f}{lookups[0]:>18.1f}{lookups[1]:>16.1f}")
+## Balance Ledger Benchmark Ends
+#############################################
+
+
+#############################################
+## Array Balances Benchmark
+def bench_balances(num_peers: int, num_txns: int, count: int):
+    """Compares block creation, validation and transaction sampling with dict ledger balances against NumPy array balances."""
+    from block import Block
+    from peer import PeerNode, NetworkType, CPUType
+    from transaction import Transaction
+
+    Block.peerIds = list(range(num_peers))
+    rng = random.Random(1)
+    funding = [Transaction.create(-1, peerId, 1000) for peerId in range(num_peers)]
+    txns = [Transaction.create(-1, 0, Block.miningReward)] + [Transaction.create(rng.randrange(num_peers), rng.randrange(num_peers), rng.randint(1, 5)) for _ in range(num_txns - 1)]
+    mempool = [Transaction.create(rng.randrange(num_peers), rng.randrange(num_peers), rng.randint(1, 5)) for _ in range(2 * num_txns)]
+
+    results = []
+    with preserved_config():
+        for name, array_balances in [("dict ledger", False), ("numpy arrays", True)]:
+            Config.array_balances = array_balances
+            genesis = Block(creatorId=-1, txns=[], parentBlockId="-1", parentBlockBalance=None, depth=0, timestamp=0)
+            peer = PeerNode(0, NetworkType.FAST, CPUType.HIGH, 0, genesis)
+            parent = Block(creatorId=0, txns=funding, parentBlockId=genesis.blkId, parentBlockBalance=genesis.peerBalance, depth=1, timestamp=0)
+            peer.add_block(parent, 0)
+            for txn in mempool:
+                peer.add_txn_in_mempool(txn)
+
+            block = Block(creatorId=0, txns=txns, parentBlockId=parent.blkId, parentBlockBalance=parent.peerBalance, depth=2, timestamp=0)
+            assert peer.blockchain.validate(block)
+            create = measure_time(lambda: [Block(creatorId=0, txns=txns, parentBlockId=parent.blkId, parentBlockBalance=parent.peerBalance, depth=2, timestamp=0) for _ in range(count)])
+            verify = measure_time(lambda: [peer.blockchain.validate(block) for _ in range(count)])
+            sample = measure_time(lambda: [peer.sample_transactions() for _ in range(count)])
+            results.append((name, create, verify, sample))
+
+    print(f"{num_peers} peers, {num_txns} transactions per block, {2 * num_txns} in mempool")
+    print(f"{'Balances':<15}{'Create (ms)':>14}{'Verify (ms)':>14}{'Sample (ms)':>14}")
+    for name, create, verify, sample in results:
+        print(f"{name:<15}{create / count * 1e3:>14.3f}{verify / count * 1e3:>14.3f}{sample / count * 1e3:>14.3f}")
+## Array Balances Benchmark Ends
+#############################################
+
+
+#############################################
+## Merkle Root Benchmark
+def bench_merkle(num_txns: int, count: int, churn: int):
+    """Compares merkle roots of successive blocks (sampled from a slowly changing mempool) hashing every transaction,
+    from cached transaction digests, and from cached digests with the incremental merkle builder."""
+    from hashlib import sha256
+    from merkleTree import merkle_root, MerkleBuilder
+    from transaction import Transaction
+
+    store = Transaction.store
+    rng = random.Random(1)
+    mempool = {Transaction.create(rng.randrange(100), rng.randrange(100), 1) for _ in range(3 * num_txns)}
+    blocks = []
+    for _ in range(count):
+        for txnID in rng.sample(sorted(mempool), churn):
+            mempool.remove(txnID)
+        mempool.update(Transaction.create(rng.randrange(100), rng.randrange(100), 1) for _ in range(churn))
+        blocks.append(np.array([Transaction.create(-1, 0, 50)] + list(mempool)[:num_txns - 1]))
+
+    builder = MerkleBuilder()
+    rehash_time = measure_time(lambda: [merkle_root([sha256(text.encode()).hexdigest() for text in store.texts(txns)]) for txns in blocks], repeat=1)
+    cached_time = measure_time(lambda: [merkle_root(store.hex_digests(txns)) for txns in blocks], repeat=1)
+    incremental_time = measure_time(lambda: [builder.merkle_root(store.digests[txns].tobytes()) for txns in blocks], repeat=1)
+    assert all(builder.merkle_root(store.digests[txns].tobytes()) == merkle_root([sha256(text.encode()).hexdigest() for text in store.texts(txns)]) for txns in blocks[:5])
+    def fill_cache(n):
+        full = MerkleBuilder(n)
+        full.merkle_root(os.urandom(32 * (n + 1)))     # n distinct internal nodes
+        return full
+    cache_memory = measure_memory(fill_cache, builder.capacity) * builder.capacity
+
+    print(f"{count} successive blocks of {num_txns} transactions, {churn} mempool transactions replaced between blocks")
+    print(f"{'Merkle root':<25}{'ms/block':>12}")
+    print(f"{'hash every transaction':<25}{rehash_time / count * 1e3:>12.3f}")
+    print(f"{'cached digests':<25}{cached_time / count * 1e3:>12.3f}")
+    print(f"{'incremental builder':<25}{incremental_time / count * 1e3:>12.3f}")
+    print(f"Internal nodes reused: {builder.hits / (builder.hits + builder.misses):.1%}, full cache of {builder.capacity} nodes {cache_memory / 2 ** 20:.1f} MB")
+## Merkle Root Benchmark Ends
+#############################################
+
+
+#############################################
+## Transaction Store Benchmark
+class ObjectTransaction:
+    """Reference object based transaction (layout before the columnar transaction store)."""
+    def __init__(self, txnID, senderId, receiverId, amount):
+        from hashlib import sha256
+
+        self.txnID = txnID
+        self.senID = senderId
+        self.recID = receiverId
+        self.amt = amount
+        self.digest = sha256(f"TxnID: {senderId} pays {receiverId} {amount} coins".encode()).hexdigest()
+
+    def __hash__(self):
+        return self.txnID
+
+    def __eq__(self, other):
+        return self.txnID == other.txnID
+
+
+def bench_txnstore(count: int, num_peers: int):
+    """Compares memory per transaction and the mempool/chain difference of transaction objects against the columnar store with integer IDs."""
+    from transaction import TransactionStore
+
+    rng = random.Random(1)
+    rows = [(txnID, rng.randrange(num_peers), rng.randrange(num_peers), rng.randint(1, 50)) for txnID in range(count)]
+    def create_store(n):
+        store = TransactionStore(capacity=1)
+        for row in rows[:n]:
+            store.add(*row)
+        return [store]
+    object_memory = measure_memory(lambda n: [ObjectTransaction(*row) for row in rows[:n]], count)
+    store_memory = measure_memory(create_store, count)
+
+    ## Mempool of half the transactions, chain (blocks since the common ancestor) of a quarter of them
+    objects = [ObjectTransaction(*row) for row in rows]
+    mempool_objects, chain_objects = set(objects[::2]), set(objects[::4])
+    mempool_ids, chain_ids = np.arange(0, count, 2), np.arange(0, count, 4)
+    mempool_set, chain_set = set(mempool_ids.tolist()), set(chain_ids.tolist())
+    object_diff = measure_time(lambda: mempool_objects.difference(chain_objects))
+    set_diff = measure_time(lambda: mempool_set.difference(chain_set))
+    array_diff = measure_time(lambda: np.setdiff1d(mempool_ids, chain_ids, assume_unique=True))
+
+    print(f"{count} transactions, {num_peers} peers")
+    print(f"{'Transactions':<22}{'B/txn':>10}{'Diff (ms)':>12}")
+    print(f"{'objects':<22}{object_memory:>10.0f}{object_diff * 1e3:>12.2f}")
+    print(f"{'store, ID sets':<22}{store_memory:>10.0f}{set_diff * 1e3:>12.2f}")
+    print(f"{'store, ID arrays':<22}{store_memory:>10.0f}{array_diff * 1e3:>12.2f}")
+## Transaction Store Benchmark Ends
+#############################################
+
+
+def add_benchmarks(subparsers):
+    """Adds the subcommands of these benchmarks to the benchmark.py parser."""
+    ledger_parser = subparsers.add_parser("ledger", help="Memory per block and lookup cost of balance snapshots and the delta ledger")
+    ledger_parser.add_argument("--blocks", type=int, default=500, help="Number of blocks in the chain")
+    ledger_parser.add_argument("--txns", type=int, default=20, help="Number of transactions per block")
+    ledger_parser.set_defaults(run=lambda args: bench_ledger(args.blocks, args.txns))
+
+    balances_parser = subparsers.add_parser("balances", help="Block creation, validation and sampling with dict and NumPy array balances")
+    balances_parser.add_argument("-n", "--num_peers", type=int, default=1000, help="Total Number of Peers")
+    balances_parser.add_argument("--txns", type=int, default=1000, help="Number of transactions per block (including coinbase)")
+    balances_parser.add_argument("--count", type=int, default=20, help="Number of repetitions")
+    balances_parser.set_defaults(run=lambda args: bench_balances(args.num_peers, args.txns, args.count))
+
+    merkle_parser = subparsers.add_parser("merkle", help="Merkle root cost with and without cached digests and the incremental builder")
+    merkle_parser.add_argument("--txns", type=int, default=1000, help="Number of transactions per block (including coinbase)")
+    merkle_parser.add_argument("--count", type=int, default=100, help="Number of successive blocks")
+    merkle_parser.add_argument("--churn", type=int, default=5, help="Mempool transactions replaced between blocks")
+    merkle_parser.set_defaults(run=lambda args: bench_merkle(args.txns, args.count, args.churn))
+
+    txnstore_parser = subparsers.add_parser("txnstore", help="Memory per transaction and mempool difference of transaction objects and the columnar store")
+    txnstore_parser.add_argument("--count", type=int, default=200000, help="Number of transactions")
+    txnstore_parser.add_argument("-n", "--num_peers", type=int, default=1000, help="Total Number of Peers")
+    txnstore_parser.set_defaults(run=lambda args: bench_txnstore(args.count, args.num_peers))
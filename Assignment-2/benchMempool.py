@@ -0,0 +1,187 @@
+import random
+import time
+import tracemalloc
+import numpy as np
+from config import Config
+from benchUtils import measure_time, preserved_config
+
+
+#############################################
+## Mempool Update Benchmark
+def bench_mempool(mempool_size: int, block_txns: int, count: int):
+    """Compares the mempool update per received block rebuilding the mempool from transaction sets against the incremental mempool,
+    for tip extensions and for a reorg of `count` blocks."""
+    from block import Block
+    from peer import PeerNode, NetworkType, CPUType
+    from transaction import Transaction
+
+    Block.peerIds = list(range(100))
+    rng = random.Random(1)
+    genesis = Block(creatorId=-1, txns=[], parentBlockId="-1", parentBlockBalance=None, depth=0, timestamp=0)
+    txns = [Transaction.create(rng.randrange(100), rng.randrange(100), 0) for _ in range(mempool_size)]   # Always affordable
+
+    def chain(parent, creatorId, offset):
+        blocks = []
+        for i in range(count):
+            parent = Block(creatorId=creatorId, txns=[Transaction.create(-1, creatorId, Block.miningReward)] + txns[offset + i * block_txns:offset + (i + 1) * block_txns], parentBlockId=parent.blkId, parentBlockBalance=parent.peerBalance, depth=parent.depth + 1, timestamp=parent.timestamp + 1)
+            blocks.append(parent)
+        return blocks
+    main = chain(genesis, 1, 0)
+    branch = chain(genesis, 2, count * block_txns)
+    branch.append(chain(branch[-1], 2, 2 * count * block_txns)[0])      # One block longer, reorg to the branch
+
+    results = []
+    with preserved_config():
+        for name, incremental in [("rebuild (set unions)", False), ("incremental", True)]:
+            Config.incremental_mempool = incremental
+            peer = PeerNode(0, NetworkType.FAST, CPUType.HIGH, 0, genesis)
+            for txnID in txns:
+                peer.add_txn_in_mempool(txnID)
+            start = time.perf_counter()
+            for block in main:
+                peer.add_block(block, block.timestamp)
+            extend_time = (time.perf_counter() - start) / len(main)
+            for block in branch[:-1]:
+                peer.add_block(block, block.timestamp)
+            start = time.perf_counter()
+            peer.add_block(branch[-1], branch[-1].timestamp)
+            reorg_time = time.perf_counter() - start
+            assert peer.get_lastBlk() is branch[-1]
+            results.append((name, extend_time, reorg_time, set(peer.mempool)))
+    assert results[0][3] == results[1][3]
+
+    print(f"Mempool of {mempool_size} transactions, {block_txns} transactions per block, reorg of {count} blocks")
+    print(f"{'Mempool update':<24}{'Extend (ms)':>14}{'Reorg (ms)':>14}")
+    for name, extend_time, reorg_time, _ in results:
+        print(f"{name:<24}{extend_time * 1e3:>14.3f}{reorg_time * 1e3:>14.3f}")
+## Mempool Update Benchmark Ends
+#############################################
+
+
+#############################################
+## Indexed Mempool Benchmark
+def scan_template(mempool: set, ledger, limit: int) -> list:
+    """Reference block template scanning the whole mempool set against the tip balances (previous PeerNode.sample_transactions)."""
+    from transaction import Transaction
+
+    txnIDs = np.fromiter(mempool, dtype=np.int64, count=len(mempool))
+    senders = Transaction.store.senders[txnIDs].tolist()
+    amounts = Transaction.store.amounts[txnIDs].tolist()
+    remaining = ledger.get_balances(set(senders))
+    txns = []
+    for txnID, senderId, amount in zip(txnIDs.tolist(), senders, amounts):
+        if remaining[senderId] < amount:
+            continue
+        remaining[senderId] -= amount
+        txns.append(txnID)
+        if len(txns) == limit:
+            break
+    return txns
+
+
+def bench_template(num_peers: int, count: int):
+    """Compares choosing a 999 transaction block template by scanning the mempool set against the indexed mempool, for growing
+    mempools (every peer funded with 1000 coins, so senders of large mempools can no longer afford all their transactions),
+    with the indexed mempool's cost of adding a transaction and of moving to a new tip."""
+    from block import Block
+    from indexedMempool import IndexedMempool
+    from transaction import Transaction
+
+    Block.peerIds = list(range(num_peers))
+    rng = random.Random(1)
+    genesis = Block(creatorId=-1, txns=[], parentBlockId="-1", parentBlockBalance=None, depth=0, timestamp=0)
+    funded = Block(creatorId=0, txns=[Transaction.create(-1, peerId, 1000) for peerId in range(num_peers)], parentBlockId=genesis.blkId, parentBlockBalance=genesis.peerBalance, depth=1, timestamp=0)
+
+    print(f"{num_peers} peers, 999 transaction templates")
+    print(f"{'Mempool':>10}{'Affordable':>12}{'scan (ms)':>12}{'indexed (ms)':>14}{'add (us)':>10}{'retip (ms)':>12}")
+    size = 1000
+    while size <= 100000:
+        txnIDs = [Transaction.create(rng.randrange(num_peers), rng.randrange(num_peers), rng.randint(1, 5)) for _ in range(size)]
+        mempool = set(txnIDs)
+        start = time.perf_counter()
+        indexed = IndexedMempool(funded.peerBalance)
+        for txnID in txnIDs:
+            indexed.add(txnID)
+        add_time = (time.perf_counter() - start) / size
+        assert len(scan_template(mempool, funded.peerBalance, 999)) == len(indexed.select(999))
+
+        scan_time = measure_time(lambda: [scan_template(mempool, funded.peerBalance, 999) for _ in range(count)]) / count
+        indexed_time = measure_time(lambda: [indexed.select(999) for _ in range(count)]) / count
+        affordable = len(indexed.affordable)
+        tip = Block(creatorId=0, txns=[Transaction.create(-1, 0, Block.miningReward)] + indexed.select(999), parentBlockId=funded.blkId, parentBlockBalance=funded.peerBalance, depth=2, timestamp=0)
+        start = time.perf_counter()
+        indexed.difference_update(tip.Txns[1:].tolist())
+        indexed.retip(tip.peerBalance, tip.Txns)
+        retip_time = time.perf_counter() - start
+        print(f"{size:>10}{affordable:>12}{scan_time * 1e3:>12.3f}{indexed_time * 1e3:>14.3f}{add_time * 1e6:>10.2f}{retip_time * 1e3:>12.3f}")
+        size *= 10
+## Indexed Mempool Benchmark Ends
+#############################################
+
+
+#############################################
+## Duplicate Tracking Benchmark
+def bench_duplicates(num_txns: int, mining_restarts: float, jitter: int):
+    """Compares the out of sequence IDs a peer's transaction duplicate tracker keeps over a long run (gossiped transactions
+    interleaved with coinbases created on mining restarts, delivered slightly out of order), for the tracker tracking all IDs,
+    skipping coinbases, bounded by a window, and both."""
+    import heapq
+    from peer import RepeatChecker
+    from transaction import Transaction
+
+    rng = random.Random(1)
+    Transaction.transactionCounter = 1
+    Transaction.peerCounters = None
+    deliveries = []     # (delivery step, transaction ID), gossiped transactions only
+    for step in range(num_txns):
+        if rng.random() < mining_restarts:
+            Transaction.create(-1, 0, 50)
+        heapq.heappush(deliveries, (step + rng.uniform(0, jitter), Transaction.create(0, 1, 1)))
+    order = [txnID for _, txnID in sorted(deliveries)]
+
+    trackers = [("all IDs", lambda: RepeatChecker()),
+                ("coinbases skipped", lambda: RepeatChecker(None, Transaction.is_coinbase)),
+                (f"window {Config.txn_window}", lambda: RepeatChecker(Config.txn_window)),
+                ("both", lambda: RepeatChecker(Config.txn_window, Transaction.is_coinbase))]
+    checkpoints = [len(order) // 100, len(order) // 10, len(order)]
+    print(f"{len(order)} gossiped transactions, {mining_restarts} coinbases per transaction, delivery jitter {jitter}")
+    print(f"{'Tracker':<22}" + "".join(f"{f'kept @{checkpoint}':>16}" for checkpoint in checkpoints) + f"{'KB':>10}{'us/add':>8}")
+    for name, create in trackers:
+        checker = create()
+        start = time.perf_counter()
+        for txnID in order:
+            checker.add(txnID)
+        elapsed = time.perf_counter() - start
+
+        kept = []
+        tracemalloc.start()
+        checker = create()
+        for i, txnID in enumerate(order, 1):
+            checker.add(txnID)
+            if i in checkpoints:
+                kept.append(len(checker))
+        memory, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{name:<22}" + "".join(f"{count:>16}" for count in kept) + f"{memory / 1024:>10.0f}{elapsed / len(order) * 1e6:>8.2f}")
+## Duplicate Tracking Benchmark Ends
+#############################################
+
+
+def add_benchmarks(subparsers):
+    """Adds the subcommands of these benchmarks to the benchmark.py parser."""
+    mempool_parser = subparsers.add_parser("mempool", help="Mempool update per block rebuilding from transaction sets and incrementally")
+    mempool_parser.add_argument("--size", type=int, default=20000, help="Number of mempool transactions")
+    mempool_parser.add_argument("--txns", type=int, default=100, help="Number of transactions per block (excluding coinbase)")
+    mempool_parser.add_argument("--count", type=int, default=50, help="Number of tip extensions, and length of the reorg")
+    mempool_parser.set_defaults(run=lambda args: bench_mempool(args.size, args.txns, args.count))
+
+    template_parser = subparsers.add_parser("template", help="Block template selection scanning the mempool set and from the indexed mempool")
+    template_parser.add_argument("-n", "--num_peers", type=int, default=100, help="Number of peers (transaction senders)")
+    template_parser.add_argument("--count", type=int, default=20, help="Number of templates timed")
+    template_parser.set_defaults(run=lambda args: bench_template(args.num_peers, args.count))
+
+    duplicates_parser = subparsers.add_parser("duplicates", help="Out of sequence IDs kept by a transaction duplicate tracker over a long run")
+    duplicates_parser.add_argument("--num_txns", type=int, default=500000, help="Number of gossiped transactions")
+    duplicates_parser.add_argument("--mining_restarts", type=float, default=0.5, help="Coinbases created (mining restarts) per gossiped transaction")
+    duplicates_parser.add_argument("--jitter", type=int, default=50, help="Maximum delivery delay, in transactions")
+    duplicates_parser.set_defaults(run=lambda args: bench_duplicates(args.num_txns, args.mining_restarts, args.jitter))
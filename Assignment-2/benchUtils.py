@@ -0,0 +1,65 @@
+import contextlib
+import random
+import tempfile
+import time
+import tracemalloc
+from config import Config
+from typing import Callable
+
+
+def measure_memory(create: Callable[[int], list], count: int) -> float:
+    """Returns the memory (in bytes) per object of the list created by `create(count)`."""
+    tracemalloc.start()
+    objects = create(count)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objects
+    return current / count
+
+
+def measure_time(function: Callable[[], None], repeat: int = 3) -> float:
+    """Returns the best wall clock time (in seconds) of `repeat` calls of the function."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+@contextlib.contextmanager
+def preserved_config():
+    """Restores every Config option on exit, so options set by a benchmark do not leak into later runs in the same process."""
+    saved = {name: value for name, value in vars(Config).items() if not name.startswith("__")}
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            setattr(Config, name, value)
+
+
+def reset_state():
+    """Resets the class level state shared by simulations (transaction store and counters, block registry, merkle cache, block DAG)."""
+    from transaction import Transaction, TransactionStore
+    from block import Block, BlockRegistry
+    from merkleTree import MerkleBuilder
+    from blockchainTree import BlockchainTree
+
+    Transaction.transactionCounter = 1
+    Transaction.peerCounters = None
+    Transaction.store = TransactionStore()
+    Block.registry = BlockRegistry()
+    Block.merkleBuilder = MerkleBuilder()
+    BlockchainTree.dag = None
+
+
+def run_seeded(num_peers: int, sim_time: float, seed: int, engine: str):
+    """Runs a seeded simulation (20% malicious, 10s blocks, 2s transactions, 0.5s timeout) and returns the simulator."""
+    from main import setup_peers
+    from eventSimulator import run_simulation
+
+    reset_state()
+    random.seed(seed)
+    with tempfile.TemporaryDirectory() as folder:
+        peers, _, _ = setup_peers(num_peers, num_peers // 5, folder)
+    return run_simulation(peers, 10, 2, 0.5, sim_time, engine=engine)
@@ -0,0 +1,19 @@
+import argparse
+import benchEngine
+import benchLedger
+import benchChain
+import benchMempool
+
+
+## Benchmarks are grouped by area, each module adds the subcommands of its benchmarks
+BENCHMARK_MODULES = [benchEngine, benchLedger, benchChain, benchMempool]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for the simulator.")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+    for module in BENCHMARK_MODULES:
+        module.add_benchmarks(subparsers)
+
+    args = parser.parse_args()
+    args.run(args)
@@ -1,60 +1,101 @@
 from transaction import Transaction
-from typing import List, Dict
+from balanceLedger import BalanceLedger, ArrayBalanceLedger, transaction_arrays
+from config import Config
+from typing import Dict, List, Optional, Union
+from merkleTree import MerkleBuilder
 from hashlib import sha256
+import numpy as np
+
+BlockId = Union[str, int]     # Hex digest, or dense integer handle of the block registry (compact IDs); "-1" is the parent of the genesis block
+
+
+class BlockRegistry:
+    """
+    Global registry of block digests, handing out dense integer handles used as compact block IDs.
+    Raw 32 byte digests are stored once here, hex digests are only built at export time.
+    """
+
+    def __init__(self):
+        self.handles: Dict[bytes, int] = {}
+        self.digests: List[bytes] = []
+
+    def intern(self, digest: bytes) -> int:
+        """Returns the handle of the given block digest, registering it if new."""
+        handle = self.handles.get(digest)
+        if handle is None:
+            handle = len(self.digests)
+            self.handles[digest] = handle
+            self.digests.append(digest)
+        return handle
+
+    def hex(self, handle: int) -> str:
+        """Returns the hex digest of the given handle."""
+        return self.digests[handle].hex()
+
+    def __len__(self) -> int:
+        return len(self.digests)
+
 
 class Block:
     miningReward = 50
     hashSize = 0.512      # In Kilobits
     peerIds = []
+    merkleBuilder = MerkleBuilder()     # Shared by all blocks, reuses subtrees of previously built blocks
+    registry = BlockRegistry()          # Handles of compact block IDs
 
-    def __init__(self, creatorId: int, txns: List['Transaction'], parentBlockId: str, parentBlockBalance: Dict[int, int], depth: int, timestamp: float):
+    def __init__(self, creatorId: int, txns: Union[np.ndarray, List[int]], parentBlockId: BlockId, parentBlockBalance: Optional[Union[BalanceLedger, ArrayBalanceLedger]], depth: int, timestamp: float):
         """
         Initializes a new block.
 
         Args:
             creatorId (int): Miner ID who created this block.
-            txns (List[Transaction]): Transactions included in this block.
-            parentBlockId (str): Hash ID of the parent block.
-            parentBlockBalance (Dict[int, int]): Balance snapshot just before this block.
+            txns (Union[np.ndarray, List[int]]): IDs of the transactions included in this block (coinbase first).
+            parentBlockId (BlockId): Hash ID of the parent block.
+            parentBlockBalance (Optional[BalanceLedger]): Balances just before this block (ledger of the parent block), None for the genesis block.
             depth (int): Depth of this block in the blockchain.
             timestamp (float): Time when the miner started mining this block (not when it was mined).
         """
         self.creatorID = creatorId
-        self.Txns = txns
-        self.size = len(txns) * 8         # In Kilobits, including coinbase
+        self.Txns = np.asarray(txns, dtype=np.int64)     # Transaction IDs, rows of the transaction store
+        self.size = len(self.Txns) * 8         # In Kilobits, including coinbase
         self.parentBlkID = parentBlockId
         self.depth = depth
         self.timestamp = timestamp
 
-        ## Balance snapshot after this block (assuming block is valid)
-        self.peerBalance = {peerId: 0 for peerId in Block.peerIds}
-        if parentBlockBalance != None:
-            self.peerBalance = dict(parentBlockBalance)
-
-            for txn in self.Txns:
-                if txn.senID != -1:
-                    self.peerBalance[txn.senID] -= txn.amt
-                self.peerBalance[txn.recID] += txn.amt
+        ## Balances after this block (assuming block is valid), stored as deltas on top of the parent's ledger
+        txnArrays = transaction_arrays(self.Txns) if parentBlockBalance is not None else None   # Gathered from the transaction store, not kept
+        if Config.array_balances:
+            self.peerBalance = ArrayBalanceLedger(parentBlockBalance, txnArrays, depth, len(Block.peerIds))
+        else:
+            self.peerBalance = BalanceLedger(parentBlockBalance, txnArrays, depth, Block.peerIds)
 
         # Unique Block Id is set using proper hashing
-        self.blkId = sha256(str(self).encode()).hexdigest()
+        digest = sha256(str(self).encode()).digest()
+        self.blkId: BlockId = Block.registry.intern(digest) if Config.compact_ids else digest.hex()
 
-    def get_merkle_root(self) -> str:
-        """Returns the Merkle Root of the Transactions in block"""
-        if len(self.Txns) == 0:
-            return ""
-        txns_hash = [sha256(str(txn).encode()).hexdigest() for txn in self.Txns]
+    @staticmethod
+    def restore(blkId: BlockId, creatorId: int, txns: np.ndarray, parentBlockId: BlockId, peerBalance: Union[BalanceLedger, ArrayBalanceLedger], depth: int, timestamp: float) -> 'Block':
+        """Rebuilds a block from its stored fields (e.g. loaded from the block store), without hashing it again."""
+        block = Block.__new__(Block)
+        block.creatorID = creatorId
+        block.Txns = txns
+        block.size = len(txns) * 8
+        block.parentBlkID = parentBlockId
+        block.depth = depth
+        block.timestamp = timestamp
+        block.peerBalance = peerBalance
+        block.blkId = blkId
+        return block
 
-        while len(txns_hash) > 1:
-            if len(txns_hash) % 2 != 0:
-                txns_hash.append(sha256("".encode()).hexdigest())
-            txns_hash = [sha256((txns_hash[i] + txns_hash[i+1]).encode()).hexdigest() for i in range(0, len(txns_hash), 2)]
+    @staticmethod
+    def hex_id(blkId: BlockId) -> str:
+        """Returns the hex digest of the given block ID (for export and hashing), "-1" is returned as is."""
+        return blkId if isinstance(blkId, str) else Block.registry.hex(blkId)
 
-        return txns_hash[0]
+    def get_merkle_root(self) -> str:
+        """Returns the Merkle Root of the Transactions in block (from the cached transaction digests)"""
+        return Block.merkleBuilder.merkle_root(Transaction.store.digests[self.Txns].tobytes())
 
     def __str__(self):
         """Generates a string representation of the block, used for hashing."""
-        blockString = f"{self.parentBlkID}|{self.timestamp}|{self.get_merkle_root()}|"
-        for txn in self.Txns:
-            blockString += f"|{str(txn)}"
-        return blockString
+        return f"{Block.hex_id(self.parentBlkID)}|{self.timestamp}|{self.get_merkle_root()}|" + "".join([f"|{text}" for text in Transaction.store.texts(self.Txns)])
@@ -0,0 +1,189 @@
+from array import array
+from block import Block, BlockId
+from blockStore import BlockStore
+from config import Config
+import numpy as np
+from typing import Dict, List, Optional, Union
+
+
+def skip_depth(depth: int) -> int:
+    """
+    Depth of the skip pointer target of a block at the given depth (as in Bitcoin Core's GetSkipHeight).
+    Targets are spread so that any ancestor is reached in O(log depth) steps, using one skip pointer per block.
+    """
+    if depth < 2:
+        return 0
+    lowest = (depth - 1) & (depth - 2)
+    return (lowest & (lowest - 1)) + 1 if depth & 1 else depth & (depth - 1)
+
+
+class BlockRecord:
+    """
+    What is kept of a pruned block: the metadata written by print_tree (and needed to forward it), without its transactions and balances.
+    Chain walks reaching a pruned block (reorgs deeper than the finality depth) raise, instead of reading its transactions as empty.
+    """
+    __slots__ = ("blkId", "parentBlkID", "creatorID", "depth", "size", "timestamp")
+    Txns = np.empty(0, dtype=np.int64)
+    peerBalance = None
+
+    def __init__(self, block: Block):
+        self.blkId = block.blkId
+        self.parentBlkID = block.parentBlkID
+        self.creatorID = block.creatorID
+        self.depth = block.depth
+        self.size = block.size
+        self.timestamp = block.timestamp
+
+
+class BlockDAG:
+    """
+    Structure of the blocks seen by any peer, shared by the blockchain trees of all peers.
+    Every block (and its parent link) is stored once, under a dense index given in the order blocks are first added.
+    Blockchain trees keep only their own view of it (arrival times, seen and verified flags) in arrays indexed by it.
+    Blocks whose ancestry reaches the genesis block (rooted) also get a skip pointer, for O(log depth) ancestor and LCA queries.
+    Validity only depends on the block and its parent, so it is also recorded here once the first peer has validated the block.
+    With a finality depth (Config.finality_depth), blocks more than that many blocks below the tips of all blockchain trees
+    are pruned, replaced by their BlockRecord (the list of blocks is then a compact append-only log of print_tree metadata).
+    With a block store (Config.block_store), only BlockRecords are kept for all blocks, bodies are loaded from the store by get.
+    """
+    UNKNOWN, VALID, INVALID = 0, 1, 2
+
+    def __init__(self, genesisBlock: Block):
+        """
+        Args:
+            genesisBlock (Block): The genesis Block (index 0).
+        """
+        self.genesisBlock = genesisBlock
+        self.blocks: List[Union[Block, BlockRecord]] = []
+        self.index: Dict[BlockId, int] = {}
+        self.parents = array("l")               # Index of the parent block, -1 for the genesis block (or parent not added yet)
+        self.children: List[List[int]] = []     # Indices of the child blocks
+        self.orphans: Dict[BlockId, List[int]] = {}     # Blocks added before their parent, by parent ID
+        self.byDepth: List[List[int]] = []      # Indices of the blocks at each depth
+        self.depths = array("l")                # Depth of each block
+        self.skips = array("l")                 # Index of the skip pointer target, -1 if not rooted yet
+        self.validity = bytearray()             # UNKNOWN, VALID or INVALID (validation cache, balances after a valid block are block.peerBalance)
+        self.heightCounts: List[int] = []       # Number of blockchain trees with each height
+        self.minHeight = 0                      # Lowest height of a blockchain tree
+        self.prunedDepth = 0                    # Blocks below this depth are pruned
+        self.prunedBlocks = 0
+        self.store: Optional[BlockStore] = BlockStore(Config.block_store, Config.block_cache) if Config.block_store is not None else None
+        self.add(genesisBlock)
+
+    def add(self, block: Block) -> int:
+        """Adds the block (if new) and returns its index."""
+        index = self.index.get(block.blkId)
+        if index is not None:
+            return index
+
+        index = len(self.blocks)
+        parent = self.index.get(block.parentBlkID, -1)
+        self.index[block.blkId] = index
+        if self.store is not None:
+            ## Full balances if the parent's ledger cannot be loaded (parent not added yet or pruned)
+            self.store.put(index, block, checkpoint=parent == -1 or self.depths[parent] < self.prunedDepth)
+            self.blocks.append(BlockRecord(block))
+        else:
+            self.blocks.append(block)
+        self.children.append([])
+        self.depths.append(block.depth)
+        self.skips.append(-1)
+        self.validity.append(BlockDAG.VALID if block is self.genesisBlock else BlockDAG.UNKNOWN)
+        while len(self.byDepth) <= block.depth:
+            self.byDepth.append([])
+        self.byDepth[block.depth].append(index)
+        self.parents.append(parent)
+        if parent != -1:
+            self.children[parent].append(index)
+        elif block is not self.genesisBlock:
+            self.orphans.setdefault(block.parentBlkID, []).append(index)
+
+        ## Link children added before this block
+        for child in self.orphans.pop(block.blkId, []):
+            self.parents[child] = index
+            self.children[index].append(child)
+
+        if index == 0 or (parent != -1 and self.skips[parent] != -1):
+            self.root(index)
+        return index
+
+    def root(self, index: int):
+        """Sets the skip pointers of a block whose parent is rooted, and of its descendants already added."""
+        stack = [index]
+        while stack:
+            index = stack.pop()
+            parent = self.parents[index]
+            self.skips[index] = 0 if parent == -1 else self.ancestor(parent, skip_depth(self.depths[index]))
+            stack.extend(self.children[index])
+
+    def ancestor(self, index: int, depth: int) -> int:
+        """Returns the index of the ancestor at the given depth of a rooted block, following skip pointers where they do not overshoot."""
+        current = self.depths[index]
+        while current > depth:
+            skip = skip_depth(current)
+            skipPrevious = skip_depth(current - 1)
+            if skip == depth or (skip > depth and not (skipPrevious < skip - 2 and skipPrevious >= depth)):
+                index = self.skips[index]
+                current = skip
+            else:
+                index = self.parents[index]
+                current -= 1
+        return index
+
+    def lca(self, index1: int, index2: int) -> int:
+        """Returns the index of the lowest common ancestor of two rooted blocks."""
+        depth = min(self.depths[index1], self.depths[index2])
+        index1 = self.ancestor(index1, depth)
+        index2 = self.ancestor(index2, depth)
+        while index1 != index2:
+            ## Blocks at the same depth have skip pointers to the same depth, jump both unless it passes the common ancestor
+            skip1, skip2 = self.skips[index1], self.skips[index2]
+            if skip1 != skip2:
+                index1, index2 = skip1, skip2
+            else:
+                index1, index2 = self.parents[index1], self.parents[index2]
+        return index1
+
+    def track_height(self, oldHeight: int, newHeight: int):
+        """Records the height change of a blockchain tree (oldHeight -1 for a new tree), pruning blocks that became final."""
+        while len(self.heightCounts) <= newHeight:
+            self.heightCounts.append(0)
+        if oldHeight >= 0:
+            self.heightCounts[oldHeight] -= 1
+        self.heightCounts[newHeight] += 1
+        while self.heightCounts[self.minHeight] == 0:
+            self.minHeight += 1
+        if Config.finality_depth is not None and self.minHeight - Config.finality_depth > self.prunedDepth:
+            self.prune(self.minHeight - Config.finality_depth)
+
+    def prune(self, depth: int):
+        """Replaces the blocks below the given depth by their BlockRecord, dropping their transactions and balances
+        (balances still reached from the ledgers of unpruned blocks, up to their checkpoint, stay alive).
+        With a block store, blocks at the new lowest depth get full balances first, as their parents' ledgers are deleted."""
+        if self.store is not None and depth < len(self.byDepth):
+            for index in self.byDepth[depth]:
+                self.store.checkpoint(index, self.load(index))
+        for blockDepth in range(self.prunedDepth, min(depth, len(self.byDepth))):
+            if self.store is not None:
+                self.store.discard(self.byDepth[blockDepth])
+            else:
+                for index in self.byDepth[blockDepth]:
+                    self.blocks[index] = BlockRecord(self.blocks[index])
+            self.prunedBlocks += len(self.byDepth[blockDepth])
+        self.prunedDepth = depth
+
+    def get(self, blkId: BlockId) -> Union[Block, BlockRecord]:
+        """Returns the block with the given ID (loaded from the block store if needed, the BlockRecord of a pruned block)."""
+        index = self.index[blkId]
+        block = self.blocks[index]
+        if self.store is None or block.depth < self.prunedDepth:
+            return block
+        return self.load(index)
+
+    def load(self, index: int) -> Block:
+        """Returns the block with the given index from the block store (cached or loaded on top of its parent's ledger)."""
+        record = self.blocks[index]
+        return self.store.get(index, record, lambda: self.get(record.parentBlkID).peerBalance)
+
+    def __len__(self) -> int:
+        return len(self.blocks)
@@ -0,0 +1,120 @@
+import numpy as np
+import os
+import sqlite3
+from balanceLedger import BalanceLedger, ArrayBalanceLedger
+from block import Block
+from collections import OrderedDict
+from config import Config
+from typing import Callable, Iterable
+
+
+class BlockStore:
+    """
+    Out-of-core store of block bodies (transaction IDs and balance changes of the block), in a SQLite database.
+    Bodies are written once, when the block is added to the block DAG, and the most recently used blocks
+    are kept in memory in an LRU cache. Other blocks are loaded back on demand (e.g. old blocks walked by a deep reorg).
+    Balances are stored as the block ledger's delta, so a loaded ledger is rebuilt on top of its parent's ledger,
+    as when the block was created. Full balances are stored instead for ledger checkpoints, blocks whose parent cannot
+    be loaded, and blocks changing the balances of at least half of the peers (where the delta is no smaller).
+    """
+
+    def __init__(self, path: str, capacity: int):
+        """
+        Args:
+            path (str): Path of the SQLite database (recreated if it exists).
+            capacity (int): Maximum number of blocks kept in memory (LRU cache).
+        """
+        if os.path.exists(path):
+            os.remove(path)
+        self.path = path
+        self.capacity = capacity
+        self.connection = sqlite3.connect(path, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode = OFF")
+        self.connection.execute("PRAGMA synchronous = OFF")
+        self.connection.execute("CREATE TABLE bodies (idx INTEGER PRIMARY KEY, txns BLOB, balances BLOB, peers BLOB, amounts BLOB)")
+        self.cache: "OrderedDict[int, Block]" = OrderedDict()     # Block index -> block, least recently used first
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+
+    def put(self, index: int, block: Block, checkpoint: bool = False):
+        """Writes the body of a new block and caches the block.
+
+        Args:
+            index (int): Index of the block in the block DAG.
+            block (Block): The block.
+            checkpoint (bool): Also write the full balances (e.g. the parent is not in the block DAG yet).
+        """
+        peers, amounts = block.peerBalance.delta_arrays()
+        if checkpoint or block.peerBalance.checkpoint is not None or 2 * len(peers) >= len(Block.peerIds):
+            ## Full balances (no smaller than the delta when most peers' balances changed)
+            row = (index, block.Txns.tobytes(), balance_array(block.peerBalance).tobytes(), None, None)
+        else:
+            row = (index, block.Txns.tobytes(), None, peers.tobytes(), amounts.tobytes())
+        self.connection.execute("INSERT INTO bodies VALUES (?, ?, ?, ?, ?)", row)
+        self.writes += 1
+        self.cache_block(index, block)
+
+    def checkpoint(self, index: int, block: Block):
+        """Writes the full balances of a stored block (e.g. its ancestors are about to be pruned)."""
+        self.connection.execute("UPDATE bodies SET balances = ? WHERE idx = ? AND balances IS NULL", (balance_array(block.peerBalance).tobytes(), index))
+
+    def get(self, index: int, record, parentLedger: Callable[[], BalanceLedger]) -> Block:
+        """Returns the block with the given index, loading its body if not cached.
+
+        Args:
+            index (int): Index of the block in the block DAG.
+            record (BlockRecord): Metadata of the block (kept in the block DAG).
+            parentLedger (Callable): Returns the ledger of the parent block (for blocks stored as a delta).
+        """
+        block = self.cache.get(index)
+        if block is not None:
+            self.cache.move_to_end(index)
+            self.hits += 1
+            return block
+
+        self.misses += 1
+        txns, balances, peers, amounts = self.connection.execute("SELECT txns, balances, peers, amounts FROM bodies WHERE idx = ?", (index,)).fetchone()
+        ledgerClass = ArrayBalanceLedger if Config.array_balances else BalanceLedger
+        if balances is not None:
+            peerBalance = ledgerClass.restore(np.frombuffer(balances, dtype=np.int64), Block.peerIds)
+        else:
+            peerBalance = ledgerClass.restore_delta(parentLedger(), np.frombuffer(peers, dtype=np.int64), np.frombuffer(amounts, dtype=np.int64))
+        block = Block.restore(record.blkId, record.creatorID, np.frombuffer(txns, dtype=np.int64), record.parentBlkID, peerBalance, record.depth, record.timestamp)
+        self.cache_block(index, block)
+        return block
+
+    def cache_block(self, index: int, block: Block):
+        """Caches the block, evicting the least recently used one if full."""
+        self.cache[index] = block
+        self.cache.move_to_end(index)
+        if len(self.cache) > self.capacity:
+            self.cache.popitem(last=False)
+
+    def discard(self, indices: Iterable[int]):
+        """Deletes the bodies of the given blocks (pruned blocks)."""
+        indices = list(indices)
+        for index in indices:
+            self.cache.pop(index, None)
+        self.connection.executemany("DELETE FROM bodies WHERE idx = ?", [(index,) for index in indices])
+
+    def hit_rate(self) -> float:
+        """Fraction of block accesses served from the LRU cache."""
+        accesses = self.hits + self.misses
+        return self.hits / accesses if accesses else 1.0
+
+    def size(self) -> int:
+        """Size of the database file, in bytes."""
+        return os.path.getsize(self.path)
+
+    def close(self):
+        """Closes the database."""
+        self.connection.close()
+
+
+def balance_array(ledger: BalanceLedger) -> np.ndarray:
+    """Returns the balances of all peers of a ledger, as an array in the order of Block.peerIds."""
+    if isinstance(ledger, ArrayBalanceLedger):
+        return ledger.to_array()
+    balances = ledger.to_dict()
+    return np.array([balances[peerId] for peerId in Block.peerIds], dtype=np.int64)
@@ -1,47 +1,113 @@
-from transaction import Transaction
-from block import Block
+from block import Block, BlockId
 from config import Config
-from collections import defaultdict
-from typing import Set
+from balanceLedger import spend_totals, transaction_arrays
+from blockDag import BlockDAG
+from orphanPool import OrphanPool
+from array import array
+import numpy as np
+from typing import Iterator, List, Optional, Set
 
 class BlockchainTree:
+    dag: Optional[BlockDAG] = None      # Shared by the trees of all peers with the same genesis block
+
     def __init__(self, genesisBlock: Block):
         """
-        Initializes the blockchain tree with the genesis block
+        Initializes the blockchain tree with the genesis block.
+        Blocks are stored once in the shared block DAG, the tree keeps only this peer's view of it,
+        in arrays indexed by block index (grown as the DAG grows).
 
         Args:
             genesisBlock (Block): The genesis Block.
         """
+        if BlockchainTree.dag is None or BlockchainTree.dag.genesisBlock is not genesisBlock:
+            BlockchainTree.dag = BlockDAG(genesisBlock)
+        self.dag = BlockchainTree.dag
         self.genesisBlock = genesisBlock
-        self.seenBlocks = {genesisBlock.blkId: genesisBlock}
-        self.children = defaultdict(list)
+        self.arrTime = array("d")       # Arrival time of each block
+        self.seenOrder = array("l")     # Order in which blocks were seen (-1 if not seen), orders blocks arrived at the same time
+        self.verified = bytearray()     # 1 if block is verified (added to the tree)
+        self.seenCount = 0
+        self.verifiedCount = 0
+        self.leaves: Set[int] = set()   # Verified blocks without verified children (chain tips)
+        self.height = 0                 # Depth of the deepest verified block
         self.longestChainTip = genesisBlock.blkId
         self.prevChainTip = "-1"
-        self.danglingBlocksList = defaultdict(list)
-        self.VerifiedBlocks = [genesisBlock.blkId]
-        self.arrTime = {genesisBlock.blkId : 0}
-
-
-    def check_block(self, blockId: str) -> bool:
+        self.validations = 0            # Blocks validated by this peer
+        self.validationHits = 0         # Blocks whose validity was found in the validation cache
+        self.finalityRejections = 0     # Blocks rejected as forks below the finality depth (parent pruned before they were validated)
+        self.orphanPool = OrphanPool(Config.orphan_capacity, Config.orphan_eviction)  # Dangling blocks (evicted ones are forgotten, so fetched again if announced again)
+        self.mark_seen(0, 0)
+        self.mark_verified(0)
+        self.dag.track_height(-1, 0)
+
+
+    def grow(self, size: int):
+        """Grows the per block arrays to hold at least `size` blocks (geometrically)."""
+        missing = size - len(self.verified)
+        if missing > 0:
+            missing = max(missing, len(self.verified))
+            self.arrTime.extend([0.0] * missing)
+            self.seenOrder.extend([-1] * missing)
+            self.verified.extend(bytes(missing))
+
+    def mark_seen(self, index: int, arrTime: float):
+        """Records the arrival of the block with the given index."""
+        self.grow(index + 1)
+        self.arrTime[index] = arrTime
+        self.seenOrder[index] = self.seenCount
+        self.seenCount += 1
+
+    def mark_verified(self, index: int):
+        """Adds the block with the given index to the tree (its parent is verified, so no longer a tip)."""
+        self.verified[index] = 1
+        self.verifiedCount += 1
+        self.leaves.discard(self.dag.parents[index])
+        self.leaves.add(index)
+        depth = self.dag.depths[index]
+        if depth > self.height:
+            self.dag.track_height(self.height, depth)
+            self.height = depth
+
+    def check_block(self, blockId: BlockId) -> bool:
         """
         Checks if the block has been received before. (Mainly for loop less forwarding).
 
         Returns:
             bool: True if the block is seen/received before, False otherwise.
         """
-        return blockId in self.seenBlocks
-    
+        index = self.dag.index.get(blockId)
+        return index is not None and index < len(self.seenOrder) and self.seenOrder[index] >= 0
+
+    def is_verified(self, blockId: BlockId) -> bool:
+        """Checks if the block has been verified (added to the tree)."""
+        index = self.dag.index.get(blockId)
+        return index is not None and index < len(self.verified) and self.verified[index] == 1
+
+    def verified_blocks(self) -> List[BlockId]:
+        """IDs of the verified blocks (genesis first)."""
+        return [self.dag.blocks[index].blkId for index in range(len(self.verified)) if self.verified[index]]
+
+    def blocks_at_depth(self, depth: int) -> List[BlockId]:
+        """IDs of the verified blocks at the given depth (more than one if the tree forked above it)."""
+        if depth >= len(self.dag.byDepth):
+            return []
+        return [self.dag.blocks[index].blkId for index in self.dag.byDepth[depth] if index < len(self.verified) and self.verified[index]]
 
-    def lca(self, blk1: str = "-1", blk2: str = "-1") -> str:
+    def tips(self) -> List[BlockId]:
+        """IDs of the chain tips (verified blocks without verified children), the longest chain tip is one of them."""
+        return [self.dag.blocks[index].blkId for index in self.leaves]
+
+
+    def lca(self, blk1: BlockId = "-1", blk2: BlockId = "-1") -> BlockId:
         """
         Finds the Least Common Ancestor (LCA) of the two blocks in the blockchain.
 
         Args:
-            blk1 (str): The ID of the first block (default is the longest chain tip).
-            blk2 (str): The ID of the second block (default is the previous chain tip).
+            blk1 (BlockId): The ID of the first block (default is the longest chain tip).
+            blk2 (BlockId): The ID of the second block (default is the previous chain tip).
         
         Returns:
-            str: The ID of the lowest common ancestor block.
+            BlockId: The ID of the lowest common ancestor block.
         """
         if blk1 == "-1":
             blk1 = self.longestChainTip
@@ -50,46 +116,19 @@ class BlockchainTree:
         
         if blk1 == "-1" or blk2 == "-1":
             return self.genesisBlock.blkId
-        
-        block1 = self.seenBlocks[blk1]
-        block2 = self.seenBlocks[blk2]
-        
-        while block1.depth < block2.depth:
-            block2 = self.seenBlocks[block2.parentBlkID]
-        while block1.depth > block2.depth:
-            block1 = self.seenBlocks[block1.parentBlkID]
-        while block1.blkId != block2.blkId:
-            block2 = self.seenBlocks[block2.parentBlkID]
-            block1 = self.seenBlocks[block1.parentBlkID]
-        return block1.blkId
-    
 
-    def add_dangling_block(self, block: Block):
-        """
-        Verifies the correctness of the dangling block and Adds it to the blockchain. (recursively)
+        ## Fast path, the longest chain did not change or the new block extends the previous tip
+        if blk1 == blk2:
+            return blk1
+        if self.dag.get(blk1).parentBlkID == blk2:
+            return blk2
 
-        Args:
-            block (Block): The dangling block to add.
-        """
-        if not self.verify_correctness(block):
-            self.recursive_deletion(block.blkId)
-            return
-
-        ## Add blockId in self.VerifiedBlocks
-        self.VerifiedBlocks.append(block.blkId)
-
-        ## Add Node to BlockChainTree
-        self.children[block.parentBlkID].append(block.blkId)
-
-        ## Switch Longest Chain if applicable
-        self.update_longest_chain(block)
-
-        ## Recursive addition of Dangling Blocks
-        if block.blkId in self.danglingBlocksList:
-            for childId in self.danglingBlocksList[block.blkId]:
-                self.add_dangling_block(self.seenBlocks[childId])
-            del self.danglingBlocksList[block.blkId]
+        return self.dag.blocks[self.dag.lca(self.dag.index[blk1], self.dag.index[blk2])].blkId
 
+    def ancestor(self, blkId: BlockId, depth: int) -> BlockId:
+        """Returns the ID of the ancestor of the block at the given depth (O(log depth) using skip pointers)."""
+        return self.dag.blocks[self.dag.ancestor(self.dag.index[blkId], depth)].blkId
+    
 
     def add_block(self, block: Block, arrTime: float):
         """
@@ -103,57 +142,93 @@ class BlockchainTree:
         if self.check_block(block.blkId):
             return
         
-        self.arrTime[block.blkId] = arrTime
-        self.seenBlocks[block.blkId] = block
+        index = self.dag.add(block)
+        self.mark_seen(index, arrTime)
         ## if block parent not seen, add block to dangling blocks and return
-        if block.parentBlkID not in self.VerifiedBlocks:
-            self.danglingBlocksList[block.parentBlkID].append(block.blkId)
+        if not self.is_verified(block.parentBlkID):
+            for evictedId in self.orphanPool.add(block.blkId, block.parentBlkID, block.depth):
+                self.seenOrder[self.dag.index[evictedId]] = -1
             return
         
-        ## if block not verified, recursive deletion of subtree rooted 
+        ## if block not verified, delete the dangling subtree rooted at it
         if not self.verify_correctness(block):
-            self.recursive_deletion(block.blkId)
+            self.orphanPool.discard(block.blkId)
             return
 
-        ## Add blockId in self.VerifiedBlocks
-        self.VerifiedBlocks.append(block.blkId)
-
         # Add Node to BlockChainTree
-        self.children[block.parentBlkID].append(block.blkId)
+        self.mark_verified(index)
 
         ### TODO add code for branch switching->Done
         self.prevChainTip = self.longestChainTip
         self.update_longest_chain(block)
 
-        ## Recursive addition of Dangling Blocks
-        if block.blkId in self.danglingBlocksList:
-            for childId in self.danglingBlocksList[block.blkId]:
-                self.add_dangling_block(self.seenBlocks[childId])
-            del self.danglingBlocksList[block.blkId]
+        self.connect_orphans(block.blkId)
+
+
+    def connect_orphans(self, blkId: BlockId):
+        """
+        Verifies the dangling blocks descending from the (just verified) block and adds them to the blockchain.
+        Iterative depth first traversal, in the same order as adding each dangling child and then its own dangling children.
+
+        Args:
+            blkId (BlockId): The ID of the verified block.
+        """
+        stack = self.orphanPool.pop_children(blkId)[::-1]
+        while stack:
+            block = self.dag.get(stack.pop())
+            if not self.verify_correctness(block):
+                self.orphanPool.discard(block.blkId)
+                continue
+
+            ## Add Node to BlockChainTree
+            self.mark_verified(self.dag.index[block.blkId])
+
+            ## Switch Longest Chain if applicable
+            self.update_longest_chain(block)
+
+            stack += self.orphanPool.pop_children(block.blkId)[::-1]
 
 
     def update_longest_chain(self, block: Block):
         """Update the longest chain of blockchain tree."""
-        if self.seenBlocks[self.longestChainTip].depth < block.depth:
+        if self.dag.get(self.longestChainTip).depth < block.depth:
             self.longestChainTip = block.blkId
 
 
-    def recursive_deletion(self, blockId: str):
+    def verify_correctness(self, block: Block) -> bool:
         """
-        Recursively deletes dangling blocks (due to parent being invalid).
+        Verifies the correctness of a block based on its parent block.
+        With the validation cache (Config.validation_cache), only the first peer validates a block, later ones look its validity up in the shared DAG.
+        Pruned blocks, and blocks whose parent is pruned, can only be verified from their recorded validity (forks below the finality depth are rejected).
 
         Args:
-            blockId (str): The ID of the parent block, whose dangling children are to be deleted
+            block (Block): The block to verify.
+        
+        Returns:
+            bool: True if the block is correct, otherwise False.
         """
-        if blockId in self.danglingBlocksList:
-            for childId in self.danglingBlocksList[blockId]:
-                self.recursive_deletion(childId)
-            del self.danglingBlocksList[blockId]
+        index = self.dag.index.get(block.blkId)
+        if index is None:
+            self.validations += 1
+            return self.validate(block)
+
+        validity = self.dag.validity[index]
+        if block.depth <= self.dag.prunedDepth and validity == BlockDAG.UNKNOWN:
+            self.finalityRejections += 1
+            return False
+        if block.depth <= self.dag.prunedDepth or (Config.validation_cache and validity != BlockDAG.UNKNOWN):
+            self.validationHits += 1
+            return validity == BlockDAG.VALID
 
+        self.validations += 1
+        valid = self.validate(block)
+        self.dag.validity[index] = BlockDAG.VALID if valid else BlockDAG.INVALID
+        return valid
 
-    def verify_correctness(self, block: Block) -> bool:
+
+    def validate(self, block: Block) -> bool:
         """
-        Verifies the correctness of a block based on its parent block.
+        Validates the block against the balances of its parent block (coinbase first, no sender spends more than its balance).
 
         Args:
             block (Block): The block to verify.
@@ -161,58 +236,77 @@ class BlockchainTree:
         Returns:
             bool: True if the block is correct, otherwise False.
         """
-        parent =  self.seenBlocks[block.parentBlkID]
+        parent =  self.dag.get(block.parentBlkID)
         cur_amt = {}
 
-        if block.Txns[0].senID != -1 or block.Txns[0].amt != Block.miningReward:
+        senders, _, amounts = transaction_arrays(block.Txns)
+        if senders[0] != -1 or amounts[0] != Block.miningReward:
             return False
 
-        for txn in block.Txns[1:]:
-            if txn.senID not in cur_amt:
-                cur_amt[txn.senID] = 0
-            cur_amt[txn.senID] += txn.amt
+        if Config.array_balances:
+            ## Spend totals of all senders checked against parent balances at once
+            return not np.any(spend_totals(senders[1:], amounts[1:], len(Block.peerIds)) > parent.peerBalance.to_array())
+
+        for senderId, amount in zip(senders[1:].tolist(), amounts[1:].tolist()):
+            if senderId not in cur_amt:
+                cur_amt[senderId] = 0
+            cur_amt[senderId] += amount
 
+        balances = parent.peerBalance.get_balances(cur_amt.keys())
         for sen in cur_amt:
-            if cur_amt[sen] > parent.peerBalance[sen]:
+            if cur_amt[sen] > balances[sen]:
                 return False
         return True
     
     
-    def get_txn_set(self, blkId: str, ancestorId: str) -> Set['Transaction']:
+    def chain_blocks(self, blkId: BlockId, ancestorId: BlockId) -> Iterator[Block]:
+        """
+        Yields the blocks from the block (inclusive) up to its ancestor (exclusive), walking parent links.
+        Raises RuntimeError if the walk reaches a pruned block, whose transactions are dropped (reorg deeper than the finality depth).
+        """
+        currId = blkId
+        while currId != "-1" and currId != ancestorId:
+            block = self.dag.get(currId)
+            if block.depth < self.dag.prunedDepth:
+                raise RuntimeError(f"Chain walk from block {Block.hex_id(blkId)} reached pruned block {Block.hex_id(currId)} at depth {block.depth}, "
+                                   f"reorg deeper than the finality depth ({Config.finality_depth}), use a larger --finality_depth")
+            yield block
+            currId = block.parentBlkID
+
+    def get_txn_set(self, blkId: BlockId, ancestorId: BlockId) -> Set[int]:
         """
         Gets the set of transactions from the block (inclusive) to its ancestor (exclusive).
 
         Args:
-            blkId (str): The ID of the block.
-            ancestorId (str): The ID of ancestor.
+            blkId (BlockId): The ID of the block.
+            ancestorId (BlockId): The ID of ancestor.
         
         Returns:
-            Set[Transaction]: The set of transactions.
+            Set[int]: The set of transaction IDs.
         """
         txnSet = set()
-        currId = blkId
-        while currId != "-1" and currId != ancestorId:
-            block = self.seenBlocks[currId]
-            txnSet = txnSet | set(block.Txns[1:])
-            currId = block.parentBlkID
+        for block in self.chain_blocks(blkId, ancestorId):
+            txnSet = txnSet | set(block.Txns[1:].tolist())
         return txnSet
     
 
     def get_lastBlock(self) -> Block:
         """Gets the last block in the longest chain."""
-        return self.seenBlocks[self.longestChainTip]
+        return self.dag.get(self.longestChainTip)
     
-    def get_block_from_hash(self, blkId: str) -> Block:
+    def get_block_from_hash(self, blkId: BlockId) -> Block:
         """Gets the block with the given block Id."""
-        return self.seenBlocks[blkId]
+        return self.dag.get(blkId)
 
     def print_tree(self, filename: str):
-        """Prints the blockchain tree to a file."""
+        """Prints the blockchain tree to a file (blocks in order of arrival)."""
 
-        sortedIDs = sorted(self.arrTime, key = self.arrTime.get)
+        seen = [index for index in range(len(self.seenOrder)) if self.seenOrder[index] >= 0]
+        sortedIndices = sorted(seen, key = lambda index: (self.arrTime[index], self.seenOrder[index]))
 
         with open(filename, "w") as file:
             file.write(f"BlockId, ParentId, creatorId, Arrival Time, Depth, Block-Size\n")
-            for blockId in sortedIDs:
-                if blockId in self.VerifiedBlocks:
-                    file.write(f"{blockId}, {self.seenBlocks[blockId].parentBlkID}, {self.seenBlocks[blockId].creatorID}, {self.arrTime[blockId]:.2f}, {self.seenBlocks[blockId].depth}, {self.seenBlocks[blockId].size}\n")
+            for index in sortedIndices:
+                if self.verified[index]:
+                    block = self.dag.blocks[index]
+                    file.write(f"{Block.hex_id(block.blkId)}, {Block.hex_id(block.parentBlkID)}, {block.creatorID}, {self.arrTime[index]:.2f}, {block.depth}, {block.size}\n")
@@ -3,9 +3,63 @@
 class Config:
     remove_eclipse = False
     counter_measure = False
+    delay_pool = False  # Sample link queuing delays from pre-sampled NumPy batches (different random stream)
+    lazy_blocks = False # Assemble mined block only when mining succeeds (transactions sampled at mining time)
+    global_mining = False   # Single network-wide mining clock, winner picked by hashing power
+    peer_streams = False    # Separate random stream per peer (results do not depend on event interleaving)
+    incremental_mempool = False     # Update mempools in place on chain tip changes (different mempool order, so different sampling)
+    indexed_mempool = False     # Mempools index transactions by sender, block templates take affordable senders first (implies in place updates, different sampling)
+    orphan_capacity = None      # Max dangling blocks kept per peer (None for unbounded), evicted blocks are fetched again if announced again
+    orphan_eviction = "oldest"  # Dangling block evicted first once over capacity, "oldest" or "deepest"
+    finality_depth = None   # Prune transactions and balances of blocks this many blocks below the tips of all peers (None to keep all)
+
+    ## Engine options (do not change simulation results)
+    compact_ids = False     # Blocks identified by dense integer handles of the block registry instead of hex digests (hex only on export)
+    validation_cache = True     # Blocks validated once for all peers, validity shared through the block DAG (False to re-validate on every peer)
+    block_store = None      # Path of a SQLite database holding block bodies, loaded back on demand (None to keep all blocks in memory)
+    block_cache = 1024      # Blocks kept in memory (LRU cache) with a block store
+    txn_window = 1 << 16    # Transactions with IDs this far below the newest one a peer received are treated as seen (bounds duplicate tracking)
+    array_balances = False  # Balances as NumPy arrays indexed by peer ID, transactions applied and checked as batched array operations
+    fanout = True       # Heap engine keeps one queue entry per broadcast instead of one per neighbor
+    compact_ratio = None    # Heap engine rebuilds queue without stale events once they exceed this fraction (None to disable)
+
+    ## Options that change simulation results, added to the default results folder name when not at their default
+    result_options = ["delay_pool", "lazy_blocks", "global_mining", "peer_streams", "incremental_mempool", "indexed_mempool",
+                      "orphan_capacity", "orphan_eviction", "finality_depth", "txn_window"]
+
+    @staticmethod
+    def folder_suffix() -> str:
+        """Returns the result changing options set to other than their default, as a folder name suffix (empty if none)."""
+        suffix = ""
+        for option in Config.result_options:
+            value = getattr(Config, option)
+            if value != DEFAULTS[option]:
+                suffix += f"_{option}" if value is True else f"_{option}{value}"
+        return suffix
 
     @staticmethod
     def log(folder_to_store: str):
         with open(f"{folder_to_store}/config.txt", "w") as f:
             f.write(f"Remove Eclipse Attack -> {Config.remove_eclipse}\n")
-            f.write(f"Counter Measure -> {Config.counter_measure}\n")
\ No newline at end of file
+            f.write(f"Counter Measure -> {Config.counter_measure}\n")
+            f.write(f"Delay Pool -> {Config.delay_pool}\n")
+            f.write(f"Lazy Blocks -> {Config.lazy_blocks}\n")
+            f.write(f"Global Mining Clock -> {Config.global_mining}\n")
+            f.write(f"Peer Random Streams -> {Config.peer_streams}\n")
+            f.write(f"Incremental Mempool -> {Config.incremental_mempool}\n")
+            f.write(f"Indexed Mempool -> {Config.indexed_mempool}\n")
+            f.write(f"Orphan Pool Capacity -> {Config.orphan_capacity}\n")
+            f.write(f"Orphan Eviction -> {Config.orphan_eviction}\n")
+            f.write(f"Finality Depth -> {Config.finality_depth}\n")
+            f.write(f"Transaction Window -> {Config.txn_window}\n")
+            f.write(f"Array Balances -> {Config.array_balances}\n")
+            f.write(f"Compact Block IDs -> {Config.compact_ids}\n")
+            f.write(f"Validation Cache -> {Config.validation_cache}\n")
+            f.write(f"Block Store -> {Config.block_store}\n")
+            f.write(f"Block Cache -> {Config.block_cache}\n")
+            f.write(f"Broadcast Fan-out -> {Config.fanout}\n")
+            f.write(f"Compaction Ratio -> {Config.compact_ratio}\n")
+
+
+## Default values of the result changing options (Config attributes are set from the command line)
+DEFAULTS = {option: getattr(Config, option) for option in Config.result_options}
@@ -1,25 +1,29 @@
-from enum import Enum, auto
-from block import Block
-from transaction import Transaction
+from enum import IntEnum
+from block import Block, BlockId
 from typing import Optional
 
-class EventType(Enum):
-    # Types of events in the blockchain simulation
-    BLOCK_GENERATE = auto()
+class EventType(IntEnum):
+    # Types of events in the blockchain simulation (integer codes, used to index the handler list)
+    BLOCK_GENERATE = 0
 
-    HASH_PROPAGATE = auto()
-    GET_REQUEST = auto()
-    TIMEOUT_EVENT = auto()
-    BLOCK_PROPAGATE = auto()
-    BROADCAST_PRIVATECHAIN = auto()
-    FINALIZE_EVENT = auto()
+    HASH_PROPAGATE = 1
+    GET_REQUEST = 2
+    TIMEOUT_EVENT = 3
+    BLOCK_PROPAGATE = 4
+    BROADCAST_PRIVATECHAIN = 5
+    FINALIZE_EVENT = 6
 
-    TRANSACTION_GENERATE = auto()
-    TRANSACTION_PROPAGATE = auto()
+    TRANSACTION_GENERATE = 7
+    TRANSACTION_PROPAGATE = 8
+
+    MINING_CLOCK = 9
 
 
 class Event:
-    def __init__(self, etype: EventType, channel: int, timestamp: int, senderPeerId: int, peerId: int, timeoutTargetId: Optional[int] = None, blkId: Optional[str] = None, block: Optional[Block] = None, transaction: Optional[Transaction] = None):
+    # Fixed slot layout, no per-event __dict__ (millions of events can be pending at once)
+    __slots__ = ("etype", "channel", "timestamp", "senderPeerId", "peerId", "timeoutTargetId", "blkId", "block", "transaction", "cancelled")
+
+    def __init__(self, etype: EventType, channel: int, timestamp: int, senderPeerId: int, peerId: int, timeoutTargetId: Optional[int] = None, blkId: Optional[BlockId] = None, block: Optional[Block] = None, transaction: Optional[int] = None):
         """
         Event representing a specific action in the simulation (block or transaction related).
         
@@ -32,7 +36,7 @@ class Event:
             timeoutTargetId (Optional[int]): peerId which timed out on get request (if applicable).
             blkId (Optional[str]): Hash of block associated with the event (if applicable).
             block (Optional[Block]): Block associated with the event (if applicable).
-            transaction (Optional[Transaction]): Transaction associated with the event (if applicable).
+            transaction (Optional[int]): ID of the transaction associated with the event (if applicable).
         """
 
         self.etype = etype
@@ -43,4 +47,5 @@ class Event:
         self.timeoutTargetId = timeoutTargetId
         self.blkId = blkId
         self.block = block
-        self.transaction = transaction
\ No newline at end of file
+        self.transaction = transaction
+        self.cancelled = False      # Cancelled events are dropped by the engine without being dispatched
\ No newline at end of file
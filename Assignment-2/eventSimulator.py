@@ -1,17 +1,23 @@
 import simpy
+from heapEnvironment import HeapEnvironment
 from event import EventType, Event
 from peer import PeerNode
 from malicious import MaliciousNode, RingMasterNode
 from transaction import Transaction
-from block import Block
+from block import Block, BlockId
 from config import Config
+from linkDelay import LinkDelaySampler
 import random
+import resource
+import time
 from tqdm import tqdm
-from typing import List, Union
+from typing import List, Dict, Tuple, Union
 
 
 class EventSimulator:
-    def __init__(self, env: simpy.Environment, peers: List[Union[PeerNode, MaliciousNode, RingMasterNode]], block_interarrival_time: float, transaction_mean_time: float, timeout_time: float, sim_time: float):
+    showProgress = True
+
+    def __init__(self, env: Union[simpy.Environment, HeapEnvironment], peers: List[Union[PeerNode, MaliciousNode, RingMasterNode]], block_interarrival_time: float, transaction_mean_time: float, timeout_time: float, sim_time: float):
         """Initialize the event-driven blockchain simulator."""
         self.env = env
         self.peers = peers
@@ -20,9 +26,27 @@ class EventSimulator:
         self.timeout_time = timeout_time
         self.sim_time = sim_time
         self.soft_termination = False
-
-        self.eventHandler = {}
+        self.processedEvents = 0
+        self.miningEvents = 0       # Mining (BLOCK_GENERATE or MINING_CLOCK) events scheduled
+        self.blocksAssembled = 0
+        self.blocksNotAssembled = 0     # Lazy block assembly, mining events discarded before a block was built
+
+        ## Pending timeout handles of each (peerId, blkId), cancelled when the block arrives
+        self.pendingTimeouts: Dict[Tuple[int, str], List[Event]] = {}
+        self.timeoutsCancelled = 0
+        self.timeoutsFired = 0
+        self.timeoutsDead = 0       # Timeouts reaching dispatch after block was seen (by other means than GET)
+
+        ## Stale event tracking (for queue compaction), pending hash announcements of each (peerId, blkId) and mining event of each peer
+        self.trackStale = isinstance(env, HeapEnvironment) and env.compactRatio is not None
+        ## Hash announcements of seen blocks are stale only if blocks stay seen (evicted dangling blocks are fetched again), otherwise checked at dispatch
+        self.trackStaleHashes = self.trackStale and Config.orphan_capacity is None
+        self.pendingHashes: Dict[Tuple[int, str], List[Event]] = {}
+        self.pendingMining: Dict[int, Event] = {}
+
+        self.eventHandler = [None] * len(EventType)
         self.eventHandler[EventType.BLOCK_GENERATE] = self.process_block_generation
+        self.eventHandler[EventType.MINING_CLOCK] = self.process_mining_clock
         self.eventHandler[EventType.BLOCK_PROPAGATE] = self.process_block_propagation
         self.eventHandler[EventType.HASH_PROPAGATE] = self.process_hash_propagation
         self.eventHandler[EventType.GET_REQUEST] = self.process_get_request
@@ -32,42 +56,99 @@ class EventSimulator:
         self.eventHandler[EventType.TRANSACTION_PROPAGATE] = self.process_transaction_propagation
         self.eventHandler[EventType.FINALIZE_EVENT] = self.finalize_event
 
-        self.validEventsAfterSimEnd = [EventType.BLOCK_PROPAGATE, EventType.HASH_PROPAGATE, EventType.GET_REQUEST, EventType.TIMEOUT_EVENT, EventType.BROADCAST_PRIVATECHAIN, EventType.FINALIZE_EVENT]
+        self.validEventsAfterSimEnd = [False] * len(EventType)
+        for eventType in [EventType.BLOCK_PROPAGATE, EventType.HASH_PROPAGATE, EventType.GET_REQUEST, EventType.TIMEOUT_EVENT, EventType.BROADCAST_PRIVATECHAIN, EventType.FINALIZE_EVENT]:
+            self.validEventsAfterSimEnd[eventType] = True
+
+        ## Random stream of each peer, the shared `random` module unless each peer has its own stream (results then do not depend on event interleaving)
+        if Config.peer_streams:
+            streamSeed = random.getrandbits(64)
+            self.peerRandom = [random.Random(f"{streamSeed}-{peer.peerId}") for peer in peers]
+            Transaction.peerCounters = [0] * len(peers)
+        else:
+            self.peerRandom = [random] * len(peers)
+            Transaction.peerCounters = None
+
+        if Config.delay_pool:
+            self.delaySampler = LinkDelaySampler(random.getrandbits(64))
+            self.sample_queuing_delay = self.sample_pooled_queuing_delay
+
+        self.bind_engine()
+
+        ## Global mining clock, one network-wide mining event with rate sum(hashingPower) / block_interarrival_time
+        self.miners = [peer.peerId for peer in peers if peer.hashingPower > 0]
+        self.minersCumulativePower = []
+        for peerId in self.miners:
+            self.minersCumulativePower.append(self.peers[peerId].hashingPower + (self.minersCumulativePower[-1] if self.minersCumulativePower else 0))
 
         for peer in peers:
             self.schedule_transaction_generation(peer.peerId)
             self.schedule_block_generation(peer.peerId)
+
+        if Config.global_mining:
+            self.schedule_mining_clock()
         
-        self.progress_bar = tqdm(total=self.sim_time, desc="Simulation Progress", position=0, leave=True)
+        self.progress_bar = tqdm(total=self.sim_time, desc="Simulation Progress", position=0, leave=True, disable=not self.showProgress)
         self.last_update = 0
 
         final_event = Event(EventType.FINALIZE_EVENT, None, None, None, MaliciousNode.RingmasterId)
-        self.env.process(self.schedule_event(final_event, delay=self.sim_time))
+        self.push_event(final_event, self.sim_time)
+
+
+    def bind_engine(self):
+        """Binds the scheduling functions to the engine. Heap engine dispatches events directly, simpy engine needs a process per event."""
+        if isinstance(self.env, HeapEnvironment):
+            self.env.handler = self.process_event
+            self.push_event = self.env.schedule
+            self.push_broadcast = self.env.schedule_fanout if Config.fanout else self.push_events
+            self.cancel_event = self.env.cancel
+        else:
+            self.push_event = self.push_simpy_event
+            self.push_broadcast = self.push_events
+            self.cancel_event = self.cancel_simpy_event
 
 
     def process_event(self, event: Event):
         """Dispatch event to the appropriate handler."""
+        self.processedEvents += 1
 
         if not self.soft_termination and self.last_update < self.env.now:
             self.progress_bar.update(self.env.now - self.last_update)
             self.last_update = self.env.now
 
         eventType = event.etype
-        handler = self.eventHandler.get(event.etype, None)
-        
-        if self.soft_termination and eventType not in self.validEventsAfterSimEnd:
+        if self.soft_termination and not self.validEventsAfterSimEnd[eventType]:
             return
 
-        if handler:
-            handler(event)
-        else:
-            print(f"Unkown Event Type {eventType}")
+        self.eventHandler[eventType](event)
 
 
     def schedule_event(self, event: Event, delay: float):
         """Schedule the given event at the given delay"""
         yield self.env.timeout(delay)
-        self.process_event(event)
+        if not event.cancelled:
+            self.process_event(event)
+
+    def push_simpy_event(self, event: Event, delay: float):
+        """Schedule the given event at the given delay, as a simpy process."""
+        self.env.process(self.schedule_event(event, delay=delay))
+
+    def sample_queuing_delay(self, senderId: int, cij: float) -> float:
+        """Returns the queuing delay (in ms) of a message sent by senderId on a link with given speed."""
+        return self.peerRandom[senderId].expovariate(lambd=cij/96)
+
+    def sample_pooled_queuing_delay(self, senderId: int, cij: float) -> float:
+        """Returns the queuing delay (in ms) of a message on a link with given speed, from the pre-sampled delay pool."""
+        return self.delaySampler.sample(cij)
+
+    def cancel_simpy_event(self, event: Event):
+        """Cancels the given pending event, it is not processed when its timeout is reached."""
+        event.cancelled = True
+
+    def push_events(self, deliveries: List[Tuple[Event, float]]):
+        """Schedule each of the given (event, delay) deliveries separately."""
+        for event, delay in deliveries:
+            self.push_event(event, delay)
 
 
     #############################################
@@ -76,61 +157,123 @@ class EventSimulator:
         """Schedules the generation of a new block for the given peerId."""
         if self.peers[peerId].hashingPower == 0:
             return
-        delay = random.expovariate(lambd= self.peers[peerId].hashingPower / self.block_interarrival_time)
+        parentBlkId = self.peers[peerId].get_lastBlk().blkId
+        self.peers[peerId].set_miningBlk(parentBlkId, self.env.now)
+        if Config.global_mining:
+            return  # Mining event is scheduled by the global mining clock
+
+        delay = self.peerRandom[peerId].expovariate(lambd= self.peers[peerId].hashingPower / self.block_interarrival_time)
 
+        if Config.lazy_blocks:
+            ## Only parent is recorded, block is assembled if mining succeeds
+            event = Event(EventType.BLOCK_GENERATE, None, self.env.now + delay, None, peerId, blkId=parentBlkId)
+        else:
+            block = self.build_block(peerId, timestamp=self.env.now)
+            event = Event(EventType.BLOCK_GENERATE, None, self.env.now + delay, None, peerId, block=block)
+        self.push_event(event, delay)
+        self.miningEvents += 1
+
+        if self.trackStale:
+            ## Previous mining event of this peer (on an older chain tip) is superseded
+            previous = self.pendingMining.get(peerId)
+            if previous is not None:
+                self.cancel_event(previous)
+            self.pendingMining[peerId] = event
+
+    def build_block(self, peerId: int, timestamp: float) -> Block:
+        """Assembles a new block of the given peer on top of its longest chain, with transactions sampled from its mempool."""
         lastBlock = self.peers[peerId].get_lastBlk()
-    
+
         txnList = self.peers[peerId].sample_transactions()
         parentBlkId = lastBlock.blkId
         parentBlkBalance = lastBlock.peerBalance
         depth = lastBlock.depth + 1
 
-        block = Block(creatorId=peerId, txns=txnList, parentBlockId=parentBlkId, parentBlockBalance=parentBlkBalance, depth=depth, timestamp=self.env.now)
-        self.peers[peerId].set_miningBlk(parentBlkId)
-
-        event = Event(EventType.BLOCK_GENERATE, None, self.env.now + delay, None, peerId, block=block)
-        self.env.process(self.schedule_event(event, delay=delay))
+        self.blocksAssembled += 1
+        return Block(creatorId=peerId, txns=txnList, parentBlockId=parentBlkId, parentBlockBalance=parentBlkBalance, depth=depth, timestamp=timestamp)
 
     def process_block_generation(self, event: Event):
         """
         Process the block generation event.
         Steps:
         - Check if the longest chain has changed since scheduling; if so, discard the event.
+        - (Lazy block assembly) Assemble the block on the unchanged longest chain.
         - Add the newly generated block to the blockchain.
         - Propagate the block hash to connected peers.
         - Schedule the next block generation for this peer.
         """
         peerId = event.peerId
         block = event.block
+        parentBlkId = event.blkId if block is None else block.parentBlkID
+        if self.trackStale:
+            del self.pendingMining[peerId]
 
-        if self.peers[peerId].get_lastBlk().blkId != block.parentBlkID:
+        if self.peers[peerId].get_lastBlk().blkId != parentBlkId:
+            if block is None:
+                self.blocksNotAssembled += 1
             return
 
+        if block is None:
+            block = self.build_block(peerId, timestamp=self.peers[peerId].miningStartTime)
+
+        self.publish_mined_block(peerId, block)
+
+        self.schedule_block_generation(peerId)
+
+    def publish_mined_block(self, peerId: int, block: Block):
+        """Adds the block mined by the peer to its blockchain, and propagates the block hash to connected peers."""
         broadcast_blkId = self.peers[peerId].add_block(block, self.env.now)
         if broadcast_blkId is not None:
             self_broadcast = Event(EventType.BROADCAST_PRIVATECHAIN, None, self.env.now, peerId, peerId, blkId=broadcast_blkId)
             self.process_broadcast_privatechain(self_broadcast)
 
+        self.schedule_hash_propagation(peerId, self.peers[peerId].get_connected_list(block.creatorID), block.blkId)
 
-        for connectedPeerId, channel in self.peers[peerId].get_connected_list(block.creatorID):
-            self.schedule_hash_propagation(channel, peerId, connectedPeerId, block.blkId)
+    def schedule_mining_clock(self):
+        """Schedules the next block mined in the whole network (superposition of the exponential mining of all peers)."""
+        totalHashingPower = self.minersCumulativePower[-1]
+        delay = random.expovariate(lambd=totalHashingPower / self.block_interarrival_time)
+        event = Event(EventType.MINING_CLOCK, None, self.env.now + delay, None, None)
+        self.push_event(event, delay)
+        self.miningEvents += 1
 
+    def process_mining_clock(self, event: Event):
+        """
+        Process the global mining clock event.
+        Steps:
+        - Pick the winning miner with probability proportional to its hashing power.
+        - Winner assembles a block on top of its current longest chain, and publishes it.
+        - Schedule the next global mining clock event.
+        """
+        peerId = random.choices(self.miners, cum_weights=self.minersCumulativePower)[0]
+        block = self.build_block(peerId, timestamp=self.peers[peerId].miningStartTime)
+        self.publish_mined_block(peerId, block)
         self.schedule_block_generation(peerId)
+
+        self.schedule_mining_clock()
     ## BLOCK Generation Ends
     ##############################################
 
 
     ###############################################
     ## HASH Propagation Starts
-    def schedule_hash_propagation(self, channel: int, senderId: int, receiverId: int, blkId: str):
-        """Schedules the propagation of the block hash from sender to receiver."""
-        pij, cij = self.peers[senderId].get_channel_details(receiverId, channel)
-        dij = random.expovariate(lambd=cij/96)
-        delay = pij + Block.hashSize / cij  + dij
-        delay = delay / 1000 ## delay in seconds
-
-        event = Event(EventType.HASH_PROPAGATE, channel, self.env.now + delay, senderId, receiverId, blkId=blkId)
-        self.env.process(self.schedule_event(event, delay=delay))
+    def schedule_hash_propagation(self, senderId: int, connections: List[Tuple[int, int]], blkId: BlockId):
+        """Schedules the propagation of the block hash from sender to each (receiver, channel) connection."""
+        deliveries = []
+        for receiverId, channel in connections:
+            pij, cij = self.peers[senderId].get_channel_details(receiverId, channel)
+            dij = self.sample_queuing_delay(senderId, cij)
+            delay = pij + Block.hashSize / cij  + dij
+            delay = delay / 1000 ## delay in seconds
+
+            event = Event(EventType.HASH_PROPAGATE, channel, self.env.now + delay, senderId, receiverId, blkId=blkId)
+            deliveries.append((event, delay))
+            if self.trackStaleHashes:
+                if self.peers[receiverId].block_seen(blkId):
+                    self.cancel_event(event)
+                else:
+                    self.pendingHashes.setdefault((receiverId, blkId), []).append(event)
+        self.push_broadcast(deliveries)
 
     def process_hash_propagation(self, event: Event):
         """
@@ -141,6 +284,12 @@ class EventSimulator:
         - On Response, from the Protocol logic for hash processing, schedule a GET request to retrieve the full block.
         """
         peerId = event.peerId
+        if self.trackStaleHashes:
+            hashes = self.pendingHashes[(peerId, event.blkId)]
+            hashes.remove(event)
+            if len(hashes) == 0:
+                del self.pendingHashes[(peerId, event.blkId)]
+
         if self.peers[peerId].block_seen(event.blkId):
             return
         
@@ -152,15 +301,15 @@ class EventSimulator:
 
     ###############################################
     ## GET Propagation Starts
-    def schedule_get_request(self, channel: int, senderId: int, receiverId: int, blkId: str):
+    def schedule_get_request(self, channel: int, senderId: int, receiverId: int, blkId: BlockId):
         """Schedules the get request for the block hash from sender to receiver."""
         pij, cij = self.peers[senderId].get_channel_details(receiverId, channel)
-        dij = random.expovariate(lambd=cij/96)
+        dij = self.sample_queuing_delay(senderId, cij)
         delay = pij + Block.hashSize / cij  + dij ## Size considered same as hash size
         delay = delay / 1000 ## delay in seconds
 
         event = Event(EventType.GET_REQUEST, channel, self.env.now + delay, senderId, receiverId, blkId=blkId)
-        self.env.process(self.schedule_event(event, delay=delay))
+        self.push_event(event, delay)
         self.schedule_timeout_event(channel, senderId, receiverId, blkId)
         self.peers[senderId].scheduled_get(receiverId, channel, blkId)
 
@@ -182,10 +331,25 @@ class EventSimulator:
 
     ###############################################
     ## TIMEOUT Event Starts
-    def schedule_timeout_event(self, channel: int, peerId: int, targetId: int, blkId: str):
+    def schedule_timeout_event(self, channel: int, peerId: int, targetId: int, blkId: BlockId):
         """Schedules the timeout event of the block hash for peerId."""
         event = Event(EventType.TIMEOUT_EVENT, channel, self.env.now + self.timeout_time, None, peerId, timeoutTargetId=targetId, blkId=blkId)
-        self.env.process(self.schedule_event(event, delay=self.timeout_time))
+        self.push_event(event, self.timeout_time)
+        self.pendingTimeouts.setdefault((peerId, blkId), []).append(event)
+
+    def cancel_timeouts(self, peerId: int, blkId: BlockId):
+        """Cancels all pending timeouts of peerId for the given block (block has been received)."""
+        timeouts = self.pendingTimeouts.pop((peerId, blkId), None)
+        if timeouts is None:
+            return
+        for event in timeouts:
+            self.cancel_event(event)
+        self.timeoutsCancelled += len(timeouts)
+
+    def cancel_hash_announcements(self, peerId: int, blkId: BlockId):
+        """Cancels all pending hash announcements of the given block to peerId (block has been received)."""
+        for event in self.pendingHashes.pop((peerId, blkId), []):
+            self.cancel_event(event)
 
     def process_timeout_event(self, event: Event):
         """
@@ -196,8 +360,15 @@ class EventSimulator:
         - Schedule a GET request to retrieve the block from the next peer.
         """
         peerId = event.peerId
+        timeouts = self.pendingTimeouts[(peerId, event.blkId)]
+        timeouts.remove(event)
+        if len(timeouts) == 0:
+            del self.pendingTimeouts[(peerId, event.blkId)]
+
         if self.peers[peerId].block_seen(event.blkId):
+            self.timeoutsDead += 1
             return
+        self.timeoutsFired += 1
         nextPeerDetails = self.peers[peerId].hash_timeout(event.timeoutTargetId, event.channel, event.blkId)
         if nextPeerDetails is not None:
             nextPeerId, nextChannel = nextPeerDetails
@@ -208,15 +379,18 @@ class EventSimulator:
 
     ###############################################
     ## BROADCAST Event Starts
-    def schedule_broadcast_privatechain(self, channel: int, senderId: int, receiverId: int, blkId: str):
-        """Schedules the broadcast privatechain event for the block id for given peer."""
-        pij, cij = self.peers[senderId].get_channel_details(receiverId, channel)
-        dij = random.expovariate(lambd=cij/96)
-        delay = pij + Block.hashSize / cij  + dij ## Size considered same as hash size
-        delay = delay / 1000 ## delay in seconds
-
-        event = Event(EventType.BROADCAST_PRIVATECHAIN, None, self.env.now + delay, senderId, receiverId, blkId=blkId)
-        self.env.process(self.schedule_event(event, delay=delay))
+    def schedule_broadcast_privatechain(self, senderId: int, connections: List[Tuple[int, int]], blkId: BlockId):
+        """Schedules the broadcast privatechain event for the block id for each (receiver, channel) connection."""
+        deliveries = []
+        for receiverId, channel in connections:
+            pij, cij = self.peers[senderId].get_channel_details(receiverId, channel)
+            dij = self.sample_queuing_delay(senderId, cij)
+            delay = pij + Block.hashSize / cij  + dij ## Size considered same as hash size
+            delay = delay / 1000 ## delay in seconds
+
+            event = Event(EventType.BROADCAST_PRIVATECHAIN, None, self.env.now + delay, senderId, receiverId, blkId=blkId)
+            deliveries.append((event, delay))
+        self.push_broadcast(deliveries)
 
     def process_broadcast_privatechain(self, event: Event):
         """
@@ -233,14 +407,11 @@ class EventSimulator:
 
         privateblkIds = self.peers[peerId].get_private_chain(event.blkId)
 
-        for connectedPeerId, channel in self.peers[peerId].get_overlay_connections():
-            if connectedPeerId == event.senderPeerId:
-                continue
-            self.schedule_broadcast_privatechain(channel, peerId, connectedPeerId, event.blkId)
+        overlayConnections = [(connectedPeerId, channel) for connectedPeerId, channel in self.peers[peerId].get_overlay_connections() if connectedPeerId != event.senderPeerId]
+        self.schedule_broadcast_privatechain(peerId, overlayConnections, event.blkId)
 
         for privateblkId in privateblkIds:
-            for connectedPeerId, channel in self.peers[peerId].get_public_connections():
-                self.schedule_hash_propagation(channel, peerId, connectedPeerId, privateblkId)
+            self.schedule_hash_propagation(peerId, self.peers[peerId].get_public_connections(), privateblkId)
     ## BROADCAST Event Ends
     ##############################################
 
@@ -250,12 +421,12 @@ class EventSimulator:
     def schedule_block_propagation(self, channel: int, senderId: int, receiverId: int, block: Block):
         """Schedules the propagation of the block from sender to receiver."""
         pij, cij = self.peers[senderId].get_channel_details(receiverId, channel)
-        dij = random.expovariate(lambd=cij/96)
+        dij = self.sample_queuing_delay(senderId, cij)
         delay = pij + block.size / cij  + dij
         delay = delay / 1000 ## delay in seconds
 
         event = Event(EventType.BLOCK_PROPAGATE, channel, self.env.now + delay, senderId, receiverId, block=block)
-        self.env.process(self.schedule_event(event, delay=delay))
+        self.push_event(event, delay)
 
 
     def process_block_propagation(self, event: Event):
@@ -277,6 +448,9 @@ class EventSimulator:
             return
         
         block = event.block
+        self.cancel_timeouts(peerId, block.blkId)
+        if self.trackStaleHashes:
+            self.cancel_hash_announcements(peerId, block.blkId)
         senderPeerIds = self.peers[peerId].get_all_senders(block.blkId)
 
         broadcast_blkId = self.peers[peerId].add_block(block, self.env.now)
@@ -287,10 +461,8 @@ class EventSimulator:
         if self.peers[peerId].mining_check():
             self.schedule_block_generation(peerId)
         
-        for connectedPeerId, channel in self.peers[peerId].get_connected_list(block.creatorID):
-            if connectedPeerId in senderPeerIds:
-                continue
-            self.schedule_hash_propagation(channel, peerId, connectedPeerId, block.blkId)
+        connections = [(connectedPeerId, channel) for connectedPeerId, channel in self.peers[peerId].get_connected_list(block.creatorID) if connectedPeerId not in senderPeerIds]
+        self.schedule_hash_propagation(peerId, connections, block.blkId)
     ## BLOCK Propagation Ends
     ##############################################
 
@@ -299,9 +471,9 @@ class EventSimulator:
     ## Transaction Generation Starts
     def schedule_transaction_generation(self, peerId: int):
         """Schedules the generation of a new transaction for the given peerId."""
-        delay = random.expovariate(lambd=1/self.transaction_mean_time)
+        delay = self.peerRandom[peerId].expovariate(lambd=1/self.transaction_mean_time)
         event = Event(EventType.TRANSACTION_GENERATE, None, self.env.now + delay, None, peerId)
-        self.env.process(self.schedule_event(event, delay=delay))
+        self.push_event(event, delay)
 
     def process_transaction_generation(self, event: Event):
         """
@@ -318,15 +490,14 @@ class EventSimulator:
         if currentBalance <= 0:
             self.schedule_transaction_generation(peerId)
             return
-        amt = random.randint(1, currentBalance)
-        receiverId = random.choice([id for id in range(len(self.peers)) if id != peerId])
+        amt = self.peerRandom[peerId].randint(1, currentBalance)
+        receiverId = self.peerRandom[peerId].choice([id for id in range(len(self.peers)) if id != peerId])
 
-        txn = Transaction(peerId, receiverId, amt)
+        txn = Transaction.create(peerId, receiverId, amt)
 
         self.peers[peerId].add_txn_in_mempool(txn)
 
-        for connectedPeerId, channel in self.peers[peerId].get_connected_list(-1):
-            self.schedule_transaction_propagation(channel, peerId, connectedPeerId, txn)
+        self.schedule_transaction_propagation(peerId, self.peers[peerId].get_connected_list(-1), txn)
 
         self.schedule_transaction_generation(peerId)
     ## Transaction Generation Ends
@@ -335,15 +506,18 @@ class EventSimulator:
 
     ################################################
     ## Transaction Propogation Begins
-    def schedule_transaction_propagation(self, channel: int, senderId: int, receiverId: int, txn: Transaction):
-        """Schedules the propagation of the transaction from sender to receiver."""
-        pij, cij = self.peers[senderId].get_channel_details(receiverId, channel)
-        dij = random.expovariate(lambd=cij/96)
-        delay = pij + Transaction.size / cij  + dij
-        delay = delay / 1000 ## delay in seconds
-
-        event = Event(EventType.TRANSACTION_PROPAGATE, channel, self.env.now + delay, senderId, receiverId, transaction=txn)
-        self.env.process(self.schedule_event(event, delay=delay))
+    def schedule_transaction_propagation(self, senderId: int, connections: List[Tuple[int, int]], txn: int):
+        """Schedules the propagation of the transaction from sender to each (receiver, channel) connection."""
+        deliveries = []
+        for receiverId, channel in connections:
+            pij, cij = self.peers[senderId].get_channel_details(receiverId, channel)
+            dij = self.sample_queuing_delay(senderId, cij)
+            delay = pij + Transaction.size / cij  + dij
+            delay = delay / 1000 ## delay in seconds
+
+            event = Event(EventType.TRANSACTION_PROPAGATE, channel, self.env.now + delay, senderId, receiverId, transaction=txn)
+            deliveries.append((event, delay))
+        self.push_broadcast(deliveries)
 
     def process_transaction_propagation(self, event: Event):
         """
@@ -362,10 +536,8 @@ class EventSimulator:
 
         self.peers[peerId].add_txn_in_mempool(txn)
         
-        for connectedPeerId, channel in self.peers[peerId].get_connected_list(-1):
-            if connectedPeerId == event.senderPeerId:
-                continue
-            self.schedule_transaction_propagation(channel, peerId, connectedPeerId, txn)
+        connections = [(connectedPeerId, channel) for connectedPeerId, channel in self.peers[peerId].get_connected_list(-1) if connectedPeerId != event.senderPeerId]
+        self.schedule_transaction_propagation(peerId, connections, txn)
     ## Transaction Propogation Ends
     ############################################
 
@@ -387,14 +559,72 @@ class EventSimulator:
         self.process_broadcast_privatechain(self_broadcast)
 
 
-def run_simulation(peers, block_interarrival_time: float, transaction_interarrival_time: float, timeout_time: float, sim_time: float):
-    env = simpy.Environment()
+def peak_rss_mb() -> float:
+    """Peak resident set size of the process, in MB."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def validation_statistics(peers) -> str:
+    """Summary of the block validations of all peers."""
+    validations = sum(peer.blockchain.validations for peer in peers)
+    hits = sum(peer.blockchain.validationHits for peer in peers)
+    return f"Block validation: {validations} blocks validated, {hits} validation cache hits."
+
+
+def orphan_statistics(peers) -> str:
+    """Summary of the orphan pools (dangling blocks) of all peers."""
+    pools = [peer.blockchain.orphanPool for peer in peers]
+    added, connected, invalid, evicted = (sum(getattr(pool, key) for pool in pools) for key in ("added", "connected", "invalid", "evicted"))
+    return f"Orphan blocks: {added} added, {connected} connected, {invalid} dropped (invalid ancestor), {evicted} evicted, {sum(len(pool) for pool in pools)} left, peak {max(pool.peak for pool in pools)} per peer."
+
+
+def duplicate_statistics(peers) -> str:
+    """Summary of the transaction duplicate trackers (out of sequence IDs kept) of all peers."""
+    kept = [len(peer.txnPropagationChecker) for peer in peers]
+    return f"Transaction duplicate tracking: {sum(kept) / len(kept):.1f} out of sequence IDs kept per peer (max {max(kept)})."
+
+
+def run_simulation(peers, block_interarrival_time: float, transaction_interarrival_time: float, timeout_time: float, sim_time: float, engine: str = "simpy"):
+    """
+    Runs the simulation on the given peers.
+
+    Args:
+        engine (str): "simpy" to run each event as a simpy process, "heap" to use the native priority-queue engine.
+    """
+    if engine == "heap":
+        env = HeapEnvironment(compactRatio=Config.compact_ratio)
+    else:
+        env = simpy.Environment()
     simulator = EventSimulator(env, peers, block_interarrival_time, transaction_interarrival_time, timeout_time, sim_time)
+    start = time.perf_counter()
 
     env.run(until=sim_time)
 
     print("Simulation ended. Final Block Propagation.")
-    while len(env._queue) > 0:
-        env.step()
+    if engine == "heap":
+        env.run()
+    else:
+        while len(env._queue) > 0:
+            env.step()
 
     print("Final Broadcast completed.")
+    elapsed = time.perf_counter() - start
+    print(f"Processed {simulator.processedEvents} events in {elapsed:.2f}s ({simulator.processedEvents / elapsed:.0f} events/s, {engine} engine).")
+    if engine == "heap":
+        print(f"Event queue: {env.pushes} pushes, {env.pops} pops, {env.replaces} replaces, peak size {env.peakSize}.")
+        print(f"Pending events: peak {env.peakPending}, peak stale {env.peakStale}, {env.compactions} compactions removed {env.compactedEvents} stale events.")
+    if Config.lazy_blocks:
+        print(f"Lazy block assembly: {simulator.blocksAssembled} blocks assembled, {simulator.blocksNotAssembled} discarded mining events built no block.")
+    print(f"Timeouts: {simulator.timeoutsCancelled} cancelled, {simulator.timeoutsFired} fired, {simulator.timeoutsDead} dropped on dispatch (block already seen).")
+    print(validation_statistics(peers))
+    print(orphan_statistics(peers))
+    print(duplicate_statistics(peers))
+    if Config.finality_depth is not None:
+        dag = peers[0].blockchain.dag
+        rejections = sum(peer.blockchain.finalityRejections for peer in peers)
+        print(f"Pruning: {dag.prunedBlocks} of {len(dag)} blocks pruned (below depth {dag.prunedDepth}, finality depth {Config.finality_depth}), {rejections} blocks rejected as forks below the finality depth.")
+    store = peers[0].blockchain.dag.store
+    if store is not None:
+        print(f"Block store: {store.writes} bodies written ({store.size() / 2 ** 20:.1f} MB), {store.hits} cache hits, {store.misses} loads ({store.hit_rate():.1%} hit rate, {Config.block_cache} cached blocks), peak RSS {peak_rss_mb():.0f} MB.")
+        store.close()
+    return simulator
@@ -0,0 +1,170 @@
+import heapq
+from typing import Callable, Optional, Any, List, Tuple
+
+
+class FanOut:
+    """
+    Broadcast record, a single queue entry standing for the deliveries of one message to many receivers.
+    Deliveries are sorted by arrival time and expanded lazily, one at a time, as simulated time reaches them.
+    """
+    __slots__ = ("times", "events", "next")
+
+    def __init__(self, times: List[float], events: List[Any]):
+        self.times = times
+        self.events = events
+        self.next = 0       # Index of next delivery
+
+
+class HeapEnvironment:
+    """
+    Light-weight discrete-event engine, alternative to simpy.Environment.
+    Events are kept in a plain priority queue of (time, seq, event) entries and handed directly to a single handler,
+    instead of wrapping every event in a generator, a simpy Process and a Timeout.
+    Events with their `cancelled` flag set are dropped when reached, without being dispatched.
+    """
+
+    def __init__(self, compactRatio: Optional[float] = None, compactMinimum: int = 1000):
+        """
+        Args:
+            compactRatio (Optional[float]): Rebuild the queue without cancelled (stale) events once they exceed
+                this fraction of pending events. None disables compaction.
+            compactMinimum (int): Minimum number of pending events before compaction is considered.
+        """
+        self.now = 0
+        self.handler: Optional[Callable[[Any], None]] = None   # Called with each event when its time is reached
+        self._queue = []
+        self._seq = 0           # Tie breaker, events at same time are processed in scheduling order (as in simpy)
+        self.compactRatio = compactRatio
+        self.compactMinimum = compactMinimum
+
+        ## Queue statistics
+        self.pushes = 0
+        self.pops = 0
+        self.replaces = 0       # Broadcast records moved down the heap to their next delivery
+        self.peakSize = 0
+        self.pending = 0        # Events in the queue (including each delivery of broadcast records)
+        self.peakPending = 0
+        self.stale = 0          # Cancelled events still in the queue
+        self.peakStale = 0
+        self.compactions = 0
+        self.compactedEvents = 0
+
+    def schedule(self, event: Any, delay: float):
+        """Schedules the given event at the given delay."""
+        heapq.heappush(self._queue, (self.now + delay, self._seq, event))
+        self._seq += 1
+        self.pushes += 1
+        if len(self._queue) > self.peakSize:
+            self.peakSize = len(self._queue)
+        self.pending += 1 if event.__class__ is not FanOut else len(event.events)
+        if self.pending > self.peakPending:
+            self.peakPending = self.pending
+
+    def schedule_fanout(self, deliveries: List[Tuple[Any, float]]):
+        """Schedules the given (event, delay) deliveries of a broadcast as a single queue entry."""
+        if len(deliveries) == 0:
+            return
+        if len(deliveries) == 1:
+            self.schedule(*deliveries[0])
+            return
+        deliveries = sorted(deliveries, key=lambda x: x[1])
+        now = self.now
+        self.schedule(FanOut([now + delay for _, delay in deliveries], [event for event, _ in deliveries]), deliveries[0][1])
+
+    def cancel(self, event: Any):
+        """Cancels a pending event, it becomes stale and is dropped when reached (or on compaction)."""
+        if not event.cancelled:
+            event.cancelled = True
+            self.stale += 1
+            if self.stale > self.peakStale:
+                self.peakStale = self.stale
+
+    def stale_ratio(self) -> float:
+        """Fraction of pending events in the queue that are stale."""
+        return self.stale / self.pending if self.pending > 0 else 0
+
+    def compact(self):
+        """Rebuilds the heap without stale events (broadcast records are pruned of their stale deliveries)."""
+        live = []
+        for entry in self._queue:
+            event = entry[2]
+            if event.__class__ is FanOut:
+                remaining = [(time, delivery) for time, delivery in zip(event.times[event.next:], event.events[event.next:]) if not delivery.cancelled]
+                if len(remaining) == 0:
+                    continue
+                event.times = [time for time, _ in remaining]
+                event.events = [delivery for _, delivery in remaining]
+                event.next = 0
+                entry = (event.times[0], entry[1], event)
+            elif event.cancelled:
+                continue
+            live.append(entry)
+        heapq.heapify(live)
+        self._queue[:] = live       # In place, run loop holds a reference to the queue
+        self.compactions += 1
+        self.compactedEvents += self.stale
+        self.pending -= self.stale
+        self.stale = 0
+
+    def step(self, until: Optional[float] = None):
+        """
+        Processes the next entry in the queue.
+        A broadcast record stays at the top of the heap while its deliveries are dispatched. Its key is updated in place
+        while it remains the earliest entry (before `until`), and sifted down (one heap operation) otherwise.
+        """
+        queue = self._queue
+        time, seq, event = queue[0]
+        if event.__class__ is not FanOut:
+            heapq.heappop(queue)
+            self.pops += 1
+            self.pending -= 1
+            self.now = time
+            if not event.cancelled:
+                self.handler(event)
+            else:
+                self.stale -= 1
+            return
+
+        fanout = event
+        times = fanout.times
+        events = fanout.events
+        while True:
+            self.now = time
+            event = events[fanout.next]
+            events[fanout.next] = None
+            fanout.next += 1
+            self.pending -= 1
+            if not event.cancelled:
+                self.handler(event)     # Only pushes entries at or after now, so the record stays at queue[0]
+            else:
+                self.stale -= 1
+            if fanout.next == len(events):
+                heapq.heappop(queue)
+                self.pops += 1
+                return
+            time = times[fanout.next]
+            entry = (time, seq, fanout)
+            if (until is not None and time >= until) or (len(queue) > 1 and queue[1] < entry) or (len(queue) > 2 and queue[2] < entry):
+                heapq.heapreplace(queue, entry)
+                self.replaces += 1
+                return
+            queue[0] = entry
+
+    def run(self, until: Optional[float] = None):
+        """
+        Processes events until the queue is empty, or until the given time is reached.
+        Events scheduled exactly at `until` are left in the queue (same as simpy).
+        Compaction is done between steps, when stale events exceed the compaction ratio of pending events.
+        """
+        queue = self._queue
+        step = self.step
+        compactRatio = self.compactRatio
+        while queue:
+            if until is not None and queue[0][0] >= until:
+                break
+            if compactRatio is not None and self.stale > compactRatio * self.pending and self.pending >= self.compactMinimum:
+                self.compact()
+                continue
+            step(until)
+        if until is not None:
+            self.now = until
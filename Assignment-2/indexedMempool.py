@@ -0,0 +1,149 @@
+import numpy as np
+from balanceLedger import BalanceLedger
+from transaction import Transaction
+from typing import Dict, Iterable, Iterator, List
+
+
+class IndexedMempool:
+    """
+    Mempool indexing pending transactions by sender, with the running pending total of each sender
+    checked against its balance at the current chain tip.
+    Senders whose pending total fits their balance (affordable) have all their transactions valid, so a block template
+    takes them as they are, only senders who cannot afford all their pending transactions are checked one by one.
+    Updated in place on transaction arrival and on tip changes (only senders whose balance changed are re-checked),
+    so choosing a block template costs about the template size plus one step per sender who cannot afford all of its
+    pending transactions, not the mempool size.
+    """
+
+    def __init__(self, ledger: BalanceLedger):
+        """
+        Args:
+            ledger (BalanceLedger): Balances at the current chain tip.
+        """
+        self.ledger = ledger
+        self.bySender: Dict[int, Dict[int, int]] = {}   # Sender -> pending transaction IDs and amounts (in order of arrival)
+        self.pending: Dict[int, int] = {}       # Sender -> total amount of its pending transactions
+        self.balances: Dict[int, int] = {}      # Sender -> balance at the current tip (senders with pending transactions)
+        self.affordable: Dict[int, None] = {}   # Senders whose pending total fits their balance (ordered set)
+        self.strained: Dict[int, None] = {}     # Senders whose pending total exceeds their balance (ordered set)
+        self.size = 0
+
+    def add(self, txnID: int):
+        """Adds a transaction (by ID)."""
+        self.add_transaction(txnID, int(Transaction.store.senders[txnID]), int(Transaction.store.amounts[txnID]))
+
+    def add_transaction(self, txnID: int, senderId: int, amount: int):
+        """Adds a transaction given its sender and amount."""
+        queue = self.bySender.get(senderId)
+        if queue is None:
+            queue = self.bySender[senderId] = {}
+            self.pending[senderId] = 0
+            self.balances[senderId] = self.ledger[senderId]
+        elif txnID in queue:
+            return
+        queue[txnID] = amount
+        self.pending[senderId] += amount
+        self.size += 1
+        self.classify(senderId)
+
+    def update(self, txnIDs: Iterable[int]):
+        """Adds the given transactions (e.g. of blocks disconnected by a reorg)."""
+        txnIDs = np.fromiter(txnIDs, dtype=np.int64)
+        for txnID, senderId, amount in zip(txnIDs.tolist(), Transaction.store.senders[txnIDs].tolist(), Transaction.store.amounts[txnIDs].tolist()):
+            self.add_transaction(txnID, senderId, amount)
+
+    def difference_update(self, txnIDs: Iterable[int]):
+        """Removes the given transactions if pending (e.g. included in a block connected to the chain)."""
+        txnIDs = np.fromiter(txnIDs, dtype=np.int64)
+        for txnID, senderId in zip(txnIDs.tolist(), Transaction.store.senders[txnIDs].tolist()):
+            queue = self.bySender.get(senderId)
+            if queue is None or txnID not in queue:
+                continue
+            self.pending[senderId] -= queue.pop(txnID)
+            self.size -= 1
+            if queue:
+                self.classify(senderId)
+            else:
+                del self.bySender[senderId], self.pending[senderId], self.balances[senderId]
+                self.affordable.pop(senderId, None)
+                self.strained.pop(senderId, None)
+
+    def retip(self, ledger: BalanceLedger, txnIDs: np.ndarray):
+        """
+        Moves to a new chain tip, re-checking only the senders whose balance changed.
+
+        Args:
+            ledger (BalanceLedger): Balances at the new tip.
+            txnIDs (np.ndarray): Transactions of the blocks connected and disconnected by the tip change (coinbases included).
+        """
+        self.ledger = ledger
+        changed = set(Transaction.store.senders[txnIDs].tolist()) | set(Transaction.store.receivers[txnIDs].tolist())
+        changed = [peerId for peerId in changed if peerId in self.bySender]
+        for senderId, balance in ledger.get_balances(changed).items():
+            self.balances[senderId] = balance
+            self.classify(senderId)
+
+    def classify(self, senderId: int):
+        """Updates whether the sender can afford all of its pending transactions."""
+        if self.pending[senderId] <= self.balances[senderId]:
+            self.affordable[senderId] = None
+            self.strained.pop(senderId, None)
+        else:
+            self.strained[senderId] = None
+            self.affordable.pop(senderId, None)
+
+    def select(self, limit: int) -> List[int]:
+        """
+        Selects up to `limit` valid transactions for a block template.
+        Steps:
+        - Take all pending transactions of affordable senders.
+        - Then, for the other senders, take their transactions in order of arrival while their balance covers them.
+        """
+        txns = []
+        for senderId in self.affordable:
+            for txnID in self.bySender[senderId]:
+                txns.append(txnID)
+                if len(txns) == limit:
+                    return txns
+
+        for senderId in self.strained:
+            remaining = self.balances[senderId]
+            for txnID, amount in self.bySender[senderId].items():
+                if amount > remaining:
+                    continue
+                remaining -= amount
+                txns.append(txnID)
+                if len(txns) == limit:
+                    return txns
+        return txns
+
+    def select_for(self, ledger: BalanceLedger, limit: int) -> List[int]:
+        """
+        Selects up to `limit` valid transactions for a block template on a block other than the current tip
+        (e.g. the tip of a private chain), checking every sender against the balances of that block.
+        Costs one step per sender with pending transactions, plus the template size.
+
+        Args:
+            ledger (BalanceLedger): Balances at the block mined on.
+            limit (int): Maximum number of transactions.
+        """
+        txns = []
+        for senderId, remaining in ledger.get_balances(self.bySender.keys()).items():
+            for txnID, amount in self.bySender[senderId].items():
+                if amount > remaining:
+                    continue
+                remaining -= amount
+                txns.append(txnID)
+                if len(txns) == limit:
+                    return txns
+        return txns
+
+    def __contains__(self, txnID: int) -> bool:
+        return txnID in self.bySender.get(int(Transaction.store.senders[txnID]), ())
+
+    def __iter__(self) -> Iterator[int]:
+        for queue in self.bySender.values():
+            yield from queue
+
+    def __len__(self) -> int:
+        return self.size
@@ -0,0 +1,35 @@
+import numpy as np
+from typing import Dict, List
+
+
+class LinkDelaySampler:
+    """
+    Serves queuing delays of links from pre-sampled NumPy batches.
+    Queuing delay on a link with speed cij is exponential with mean 96/cij ms, so one buffer is kept per link speed,
+    filled with a large batch of samples at once and refilled when empty.
+    """
+
+    def __init__(self, seed: int, batchSize: int = 65536):
+        """
+        Args:
+            seed (int): Seed of the NumPy generator (draw it from `random` to stay reproducible under a fixed seed).
+            batchSize (int): Number of delays sampled per refill.
+        """
+        self.rng = np.random.default_rng(seed)
+        self.batchSize = batchSize
+        self.buffers: Dict[float, List[float]] = {}
+        self.refills = 0
+
+    def refill(self, cij: float) -> List[float]:
+        """Samples a new batch of queuing delays (in ms) for the given link speed."""
+        buffer = (self.rng.standard_exponential(self.batchSize) * (96 / cij)).tolist()
+        self.buffers[cij] = buffer
+        self.refills += 1
+        return buffer
+
+    def sample(self, cij: float) -> float:
+        """Returns the queuing delay (in ms) of a message on a link with given speed."""
+        buffer = self.buffers.get(cij)
+        if not buffer:
+            buffer = self.refill(cij)
+        return buffer.pop()
@@ -8,7 +8,7 @@ from block import Block
 from eventSimulator import run_simulation
 from config import Config
 import os
-from typing import List, Union
+from typing import List, Tuple, Union
 
 def logger(peers: List[Union[PeerNode, MaliciousNode, RingMasterNode]], graph: ntxGraph, overlay_graph: ntxGraph, folder: str):
     """
@@ -39,36 +39,23 @@ def logger(peers: List[Union[PeerNode, MaliciousNode, RingMasterNode]], graph: n
         peer.log_tree(folder)
 
 
-if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description="Process CLI Inputs.")
-    
-    parser.add_argument("-n", "--num_peers", type=int, required=True, help="Total Number of Peers")
-    parser.add_argument("-m", "--ratio_malicious", type=float, required=True, help="Fraction of Malicious Peers")
-    parser.add_argument("-o", "--timeout", type=float, required=True, help="Timeout Time (seconds)")
-    parser.add_argument("-t", "--transaction_interarrival", type=float, required=True, help="Mean Interarrival Time for Transaction Generation (seconds)")
-    parser.add_argument("-b", "--block_interarrival", type=float, required=True, help="Mean Interarrival Time of Blocks (seconds)")
-    parser.add_argument("-s", "--sim_time", type=float, required=True, help="Simulation Time (seconds)")
-    parser.add_argument("-f", "--folder", type = str, required=False, help="Folder to store results")
-    parser.add_argument("-r", "--remove_eclipse", action="store_true", help="Remove Eclipse Attack from Malicous Nodes (only selfish mining)")
-    parser.add_argument("-c", "--counter_measure", action="store_true", help="Add counter measure in Honest Nodes against eclipse attack.")
-    args = parser.parse_args()
+def default_folder(num_honest: int, num_malicious: int, timeout_time: float, transaction_interarrival_time: float, block_interarrival_time: float, sim_time: float, remove_eclipse: bool, counter_measure: bool, engine: str) -> str:
+    """Returns the default name of the results folder of a configuration (with the engine and the result changing options set in Config)."""
+    return f"logs_{num_honest}_{num_malicious}_{int(timeout_time * 1000)}_{int(transaction_interarrival_time * 1000)}_{int(block_interarrival_time * 1000)}_{int(sim_time)}_{remove_eclipse}_{counter_measure}_{engine}{Config.folder_suffix()}"
 
-    num_peers = args.num_peers
-    num_malicious = int(num_peers * args.ratio_malicious)
-    num_honest = num_peers - num_malicious
-    timeout_time = args.timeout
-    transaction_interarrival_time = args.transaction_interarrival
-    block_interarrival_time = args.block_interarrival
-    sim_time = args.sim_time
-    folder_to_store = args.folder
-    Config.remove_eclipse = args.remove_eclipse
-    Config.counter_measure = args.counter_measure
 
-    if folder_to_store is None:
-        folder_to_store = f"logs_{num_honest}_{num_malicious}_{int(timeout_time * 1000)}_{int(transaction_interarrival_time * 1000)}_{int(block_interarrival_time * 1000)}_{int(sim_time)}_{Config.remove_eclipse}_{Config.counter_measure}"
+def setup_peers(num_peers: int, num_malicious: int, folder_to_store: str) -> Tuple[List[Union[PeerNode, MaliciousNode, RingMasterNode]], ntxGraph, ntxGraph]:
+    """
+    Creates the peers (honest, malicious and ringmaster), the public network and the overlay network.
 
-    os.makedirs(folder_to_store, exist_ok=True)
+    Args:
+        num_peers (int): Total Number of Peers.
+        num_malicious (int): Number of Malicious Peers (including ringmaster).
+        folder_to_store (str): Folder where the network graphs are saved.
 
+    Returns:
+        Tuple: List of peers sorted by peer ID, Network Topology Graph, Overlay Network Topology Graph.
+    """
     peer_ids = list(range(num_peers))
     random.shuffle(peer_ids)
 
@@ -128,8 +115,95 @@ if __name__ == "__main__":
         peers[u].add_overlay_link_speed(v, cij)
         peers[v].add_overlay_link_speed(u, cij)
 
+    return peers, Graph, Overlay_Graph
+
+
+## Options each engine does not support (argument names), rejected by check_options when set
+UNSUPPORTED_OPTIONS = {
+    "simpy": ["compact_ratio"],     # Stale events are only tracked by the heap engine
+}
+
+
+def check_options(parser: argparse.ArgumentParser, args: argparse.Namespace):
+    """Rejects options not supported by the selected engine (set to other than their default)."""
+    unsupported = [option for option in UNSUPPORTED_OPTIONS.get(args.engine, []) if getattr(args, option) != parser.get_default(option)]
+    if unsupported:
+        parser.error(f"{', '.join(f'--{option}' for option in unsupported)} not supported by the {args.engine} engine")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Process CLI Inputs.")
+    
+    parser.add_argument("-n", "--num_peers", type=int, required=True, help="Total Number of Peers")
+    parser.add_argument("-m", "--ratio_malicious", type=float, required=True, help="Fraction of Malicious Peers")
+    parser.add_argument("-o", "--timeout", type=float, required=True, help="Timeout Time (seconds)")
+    parser.add_argument("-t", "--transaction_interarrival", type=float, required=True, help="Mean Interarrival Time for Transaction Generation (seconds)")
+    parser.add_argument("-b", "--block_interarrival", type=float, required=True, help="Mean Interarrival Time of Blocks (seconds)")
+    parser.add_argument("-s", "--sim_time", type=float, required=True, help="Simulation Time (seconds)")
+    parser.add_argument("-f", "--folder", type = str, required=False, help="Folder to store results")
+    parser.add_argument("-r", "--remove_eclipse", action="store_true", help="Remove Eclipse Attack from Malicous Nodes (only selfish mining)")
+    parser.add_argument("-c", "--counter_measure", action="store_true", help="Add counter measure in Honest Nodes against eclipse attack.")
+    parser.add_argument("-e", "--engine", type=str, choices=["simpy", "heap"], default="simpy", help="Event engine, simpy processes or native heap based queue")
+    parser.add_argument("-d", "--delay_pool", action="store_true", help="Sample link queuing delays from pre-sampled NumPy batches")
+    parser.add_argument("-l", "--lazy_blocks", action="store_true", help="Assemble mined blocks only when mining succeeds")
+    parser.add_argument("-g", "--global_mining", action="store_true", help="Single network-wide mining clock, winning miner picked by hashing power")
+    parser.add_argument("-a", "--array_balances", action="store_true", help="Store balances as NumPy arrays, apply and check transactions as batched array operations")
+    parser.add_argument("-i", "--compact_ids", action="store_true", help="Identify blocks by integer handles of a global block registry instead of hex digests")
+    parser.add_argument("--compact_ratio", type=float, required=False, help="Heap engine rebuilds its queue without stale events once they exceed this fraction of pending events")
+    parser.add_argument("-p", "--peer_streams", action="store_true", help="Separate random stream per peer, results do not depend on the interleaving of events of different peers")
+    parser.add_argument("-u", "--incremental_mempool", action="store_true", help="Update mempools in place when the longest chain changes, instead of rebuilding them")
+    parser.add_argument("--indexed_mempool", action="store_true", help="Index mempools by sender and build block templates from senders who can afford all their pending transactions first (implies --incremental_mempool updates)")
+    parser.add_argument("--revalidate", action="store_true", help="Validate every block on every peer receiving it, instead of once for all peers (validation cache)")
+    parser.add_argument("--orphan_capacity", type=int, required=False, help="Maximum number of dangling blocks (parent not received yet) kept per peer, unbounded if not given")
+    parser.add_argument("--orphan_eviction", type=str, choices=["oldest", "deepest"], default="oldest", help="Dangling block evicted first once the orphan pool is over capacity")
+    parser.add_argument("-k", "--finality_depth", type=int, required=False, help="Prune transactions and balances of blocks more than this many blocks below the tips of all peers (keeps all blocks if not given)")
+    parser.add_argument("--block_store", type=str, required=False, help="Path of a SQLite database holding block bodies, loaded back on demand (keeps all blocks in memory if not given)")
+    parser.add_argument("--block_cache", type=int, default=1024, help="Number of blocks kept in memory (LRU cache) with a block store")
+    parser.add_argument("--txn_window", type=int, default=1 << 16, help="Transactions with IDs this far below the newest one a peer received are treated as seen (bounds duplicate tracking)")
+    parser.add_argument("--seed", type=int, required=False, help="Seed for random number generation (for reproducible runs)")
+    args = parser.parse_args()
+
+    check_options(parser, args)
+
+    num_peers = args.num_peers
+    num_malicious = int(num_peers * args.ratio_malicious)
+    num_honest = num_peers - num_malicious
+    timeout_time = args.timeout
+    transaction_interarrival_time = args.transaction_interarrival
+    block_interarrival_time = args.block_interarrival
+    sim_time = args.sim_time
+    folder_to_store = args.folder
+    Config.remove_eclipse = args.remove_eclipse
+    Config.counter_measure = args.counter_measure
+    Config.delay_pool = args.delay_pool
+    Config.lazy_blocks = args.lazy_blocks
+    Config.global_mining = args.global_mining
+    Config.compact_ratio = args.compact_ratio
+    Config.array_balances = args.array_balances
+    Config.compact_ids = args.compact_ids
+    Config.incremental_mempool = args.incremental_mempool
+    Config.indexed_mempool = args.indexed_mempool
+    Config.validation_cache = not args.revalidate
+    Config.orphan_capacity = args.orphan_capacity
+    Config.orphan_eviction = args.orphan_eviction
+    Config.finality_depth = args.finality_depth
+    Config.block_store = args.block_store
+    Config.block_cache = args.block_cache
+    Config.txn_window = args.txn_window
+    Config.peer_streams = args.peer_streams
+
+    if folder_to_store is None:
+        folder_to_store = default_folder(num_honest, num_malicious, timeout_time, transaction_interarrival_time, block_interarrival_time, sim_time, Config.remove_eclipse, Config.counter_measure, args.engine)
+
+    os.makedirs(folder_to_store, exist_ok=True)
+
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    peers, Graph, Overlay_Graph = setup_peers(num_peers, num_malicious, folder_to_store)
+
     # Run the simulation with the provided parameters
-    run_simulation(peers, block_interarrival_time, transaction_interarrival_time, timeout_time, sim_time)
+    run_simulation(peers, block_interarrival_time, transaction_interarrival_time, timeout_time, sim_time, engine=args.engine)
 
     Config.log(folder_to_store)
     # Log required Information
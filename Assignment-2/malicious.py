@@ -1,4 +1,4 @@
-from block import Block
+from block import Block, BlockId
 from maliciousBlockchainTree import MaliciousBlockchainTree
 from config import Config
 from typing import List, Tuple, Optional
@@ -21,11 +21,14 @@ class MaliciousNode(PeerNode):
         """
         super().__init__(peerId, netType, cpuType, hashingPower, genesisBlock)
 
-        self.blockchain = MaliciousBlockchainTree(genesisBlock, MaliciousNode.RingmasterId)
         self.overlay_connectedPeers = []
         self.overlay_pij = {}
         self.overlay_cij = {}
 
+    def create_blockchain(self, genesisBlock: Block) -> MaliciousBlockchainTree:
+        """Creates the blockchain tree of the peer, with a private chain."""
+        return MaliciousBlockchainTree(genesisBlock, MaliciousNode.RingmasterId)
+
     def add_overlay_connected_peer(self, connectedPeerId: int):
         """Add a overlay connected peer."""
         self.overlay_connectedPeers.append(connectedPeerId)
@@ -60,7 +63,7 @@ class MaliciousNode(PeerNode):
         else:
             return self.overlay_pij[connectedPeerId], self.overlay_cij[connectedPeerId]
 
-    def get_block_for_get_request(self, channel: int, blkId: str) -> Optional[Block]:
+    def get_block_for_get_request(self, channel: int, blkId: BlockId) -> Optional[Block]:
         """Returns the block corresponding to given block Id (used only when needing to forward block due to get request).
         May with-hold block based on block creator and channel which asked for block."""
         block = self.blockchain.get_block_from_hash(blkId)
@@ -68,11 +71,11 @@ class MaliciousNode(PeerNode):
             return block
         return None
     
-    def broadcast_seen(self, blkId: str) -> bool:
+    def broadcast_seen(self, blkId: BlockId) -> bool:
         """Checks if broadcast event was seen."""
         return self.blockchain.check_broadcast(blkId)
 
-    def get_private_chain(self, blkId: str) -> List[str]:
+    def get_private_chain(self, blkId: BlockId) -> List[BlockId]:
         """Get Private chain ending with given block id. Also adds them to public chain."""
         private_chain = self.blockchain.get_private_chain(blkId)
         ret = []
@@ -1,4 +1,4 @@
-from block import Block
+from block import Block, BlockId
 from blockchainTree import BlockchainTree
 from typing import List, Tuple, Optional
 
@@ -23,23 +23,23 @@ class MaliciousBlockchainTree(BlockchainTree):
         self.privateChain.append((block, arrTime))
         self.privateChain.sort(key=lambda x: x[0].depth)
 
-    def check_broadcast(self, blkId: str) -> bool:
+    def check_broadcast(self, blkId: BlockId) -> bool:
         """Checks if broadcast message has been seen."""
         return blkId in self.seenBroadcasts
     
-    def check_block(self, blkId: str) -> bool:
+    def check_block(self, blkId: BlockId) -> bool:
         """Checks if block with given id has been seen."""
         return super().check_block(blkId) or (blkId in map(lambda x: x[0].blkId, self.privateChain))
 
     def update_longest_chain(self, block: Block):
         """Update the longest chain of blockchain tree."""
-        if self.seenBlocks[self.longestChainTip].depth < block.depth:
+        if self.dag.get(self.longestChainTip).depth < block.depth:
             self.longestChainTip = block.blkId
-        elif self.seenBlocks[self.longestChainTip].depth == block.depth:
+        elif self.dag.get(self.longestChainTip).depth == block.depth:
             if block.creatorID == self.ringMasterId:
                 self.longestChainTip = block.blkId
 
-    def get_block_from_hash(self, blkId: str) -> Block:
+    def get_block_from_hash(self, blkId: BlockId) -> Block:
         """Get block from hash. (No with-holding)."""
         block = next((block for block, _ in self.privateChain if block.blkId == blkId), None)
         if block is None:
@@ -52,7 +52,7 @@ class MaliciousBlockchainTree(BlockchainTree):
             return None
         return self.privateChain[-1][0]
 
-    def get_private_chain(self, blkId: str) -> List[Tuple[Block, float]]:
+    def get_private_chain(self, blkId: BlockId) -> List[Tuple[Block, float]]:
         """Return complete private chain ending in given block Id."""
         self.seenBroadcasts.add(blkId)
 
@@ -0,0 +1,63 @@
+from hashlib import sha256
+from typing import Dict, List
+
+
+EMPTY_DIGEST = sha256("".encode()).hexdigest()     # Padding of levels with an odd number of nodes
+EMPTY_RAW_DIGEST = bytes.fromhex(EMPTY_DIGEST)
+
+
+def merkle_root(digests: List[str]) -> str:
+    """Returns the merkle root of the given (hex) leaf digests, "" if there are none (reference for MerkleBuilder, which block IDs use)."""
+    if len(digests) == 0:
+        return ""
+    level = list(digests)
+    while len(level) > 1:
+        if len(level) % 2 != 0:
+            level.append(EMPTY_DIGEST)
+        level = [sha256((level[i] + level[i+1]).encode()).hexdigest() for i in range(0, len(level), 2)]
+    return level[0]
+
+
+class MerkleBuilder:
+    """
+    Incremental merkle root computation.
+    Digests of internal nodes are cached by their pair of children (raw 32 byte digests, hashed as hex as in merkle_root),
+    so blocks sharing aligned runs of transactions (successive blocks sampled from a mostly unchanged mempool) reuse
+    the shared subtrees instead of hashing them again. The cache is bounded, oldest entries are evicted first
+    (about 200 bytes per entry).
+    """
+
+    def __init__(self, capacity: int = 1 << 14):
+        """
+        Args:
+            capacity (int): Maximum number of cached internal nodes.
+        """
+        self.capacity = capacity
+        self.cache: Dict[bytes, bytes] = {}     # Concatenated raw children digests -> raw parent digest
+        self.hits = 0
+        self.misses = 0
+
+    def merkle_root(self, digests: bytes) -> str:
+        """Returns the merkle root (hex) of the given concatenated raw leaf digests, "" if there are none (same as merkle_root)."""
+        if len(digests) == 0:
+            return ""
+        cache = self.cache
+        level = [digests[i:i+32] for i in range(0, len(digests), 32)]
+        while len(level) > 1:
+            if len(level) % 2 != 0:
+                level.append(EMPTY_RAW_DIGEST)
+            parents = []
+            for i in range(0, len(level), 2):
+                children = level[i] + level[i+1]
+                parent = cache.get(children)
+                if parent is None:
+                    parent = sha256((level[i].hex() + level[i+1].hex()).encode()).digest()
+                    if len(cache) >= self.capacity:
+                        del cache[next(iter(cache))]
+                    cache[children] = parent
+                    self.misses += 1
+                else:
+                    self.hits += 1
+                parents.append(parent)
+            level = parents
+        return level[0].hex()
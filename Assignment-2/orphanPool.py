@@ -0,0 +1,97 @@
+import heapq
+from block import BlockId
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+
+class OrphanPool:
+    """
+    Dangling blocks of a blockchain tree (seen, but their parent is not verified yet), by parent ID.
+    Optionally bounded: once more than `capacity` blocks wait, blocks are evicted (with the dangling blocks waiting on them)
+    following the eviction policy, "oldest" (first arrived) or "deepest" (farthest from the verified tree).
+    All operations are iterative, so chains of any length are handled without recursion.
+    """
+    policies = ("oldest", "deepest")
+
+    def __init__(self, capacity: Optional[int] = None, policy: str = "oldest"):
+        """
+        Args:
+            capacity (Optional[int]): Maximum number of dangling blocks kept (None for unbounded).
+            policy (str): Eviction policy, "oldest" or "deepest".
+        """
+        if policy not in OrphanPool.policies:
+            raise ValueError(f"Unknown orphan eviction policy {policy}, expected one of {OrphanPool.policies}")
+        self.capacity = capacity
+        self.policy = policy
+        self.children: Dict[BlockId, List[BlockId]] = {}        # Dangling blocks by parent ID (in order of arrival)
+        self.parents: "OrderedDict[BlockId, BlockId]" = OrderedDict()  # Parent ID of each dangling block (in order of arrival)
+        self.byDepth: List[Tuple[int, int, BlockId]] = []       # Max-heap of (-depth, arrival, ID), for "deepest" (stale entries skipped)
+        self.arrivals = 0
+        self.added = 0
+        self.connected = 0
+        self.invalid = 0
+        self.evicted = 0
+        self.peak = 0
+
+    def add(self, blkId: BlockId, parentId: BlockId, depth: int) -> List[BlockId]:
+        """
+        Adds a dangling block, evicting blocks if the pool is over capacity.
+
+        Returns:
+            List[BlockId]: The IDs of the evicted blocks (possibly including the added one).
+        """
+        self.children.setdefault(parentId, []).append(blkId)
+        self.parents[blkId] = parentId
+        if self.policy == "deepest":
+            heapq.heappush(self.byDepth, (-depth, self.arrivals, blkId))
+        self.arrivals += 1
+        self.added += 1
+
+        evicted = []
+        while self.capacity is not None and len(self.parents) > self.capacity:
+            evicted += self.remove(self.victim())
+        self.evicted += len(evicted)
+        self.peak = max(self.peak, len(self.parents))
+        return evicted
+
+    def victim(self) -> BlockId:
+        """ID of the next block to evict."""
+        if self.policy == "oldest":
+            return next(iter(self.parents))
+        while self.byDepth[0][2] not in self.parents:
+            heapq.heappop(self.byDepth)
+        return heapq.heappop(self.byDepth)[2]
+
+    def pop_children(self, parentId: BlockId) -> List[BlockId]:
+        """Removes and returns the dangling blocks waiting on the (now verified) parent, in order of arrival."""
+        children = self.children.pop(parentId, [])
+        for childId in children:
+            del self.parents[childId]
+        self.connected += len(children)
+        return children
+
+    def discard(self, blkId: BlockId):
+        """Removes the dangling blocks descending from an invalid block (which can never be verified)."""
+        self.invalid += len(self.remove(blkId)) - 1
+
+    def remove(self, blkId: BlockId) -> List[BlockId]:
+        """Removes the block (if dangling) and the dangling blocks descending from it, returns their IDs."""
+        parentId = self.parents.pop(blkId, None)
+        if parentId is not None:
+            siblings = self.children[parentId]
+            siblings.remove(blkId)
+            if not siblings:
+                del self.children[parentId]
+
+        removed = []
+        stack = [blkId]
+        while stack:
+            currId = stack.pop()
+            removed.append(currId)
+            for childId in self.children.pop(currId, []):
+                del self.parents[childId]
+                stack.append(childId)
+        return removed
+
+    def __len__(self) -> int:
+        return len(self.parents)
@@ -1,10 +1,14 @@
 from enum import Enum, auto
-from block import Block
+from block import Block, BlockId
 from transaction import Transaction
 from blockchainTree import BlockchainTree
 from dataclasses import dataclass, field
+from functools import partial
 from config import Config
-from typing import List, Dict, Set, Tuple, Optional
+from balanceLedger import spend_totals
+from indexedMempool import IndexedMempool
+import numpy as np
+from typing import Callable, List, Dict, Set, Tuple, Optional, Union
 
 
 class NetworkType(Enum):
@@ -18,17 +22,32 @@ class CPUType(Enum):
     HIGH = auto()
 
 class RepeatChecker:
-    """Efficiently tracks received messages to detect duplicates."""
-
-    def __init__(self):
+    """
+    Efficiently tracks received messages to detect duplicates.
+    IDs that will never be received (e.g. coinbases, which are not gossiped) can be skipped, so that they do not hold
+    the threshold back, and IDs more than `window` below the highest received ID are treated as seen, so that
+    the out of sequence IDs kept stay bounded.
+    """
+
+    def __init__(self, window: Optional[int] = None, unsent: Optional[Callable[[int], bool]] = None):
+        """
+        Args:
+            window (Optional[int]): IDs this far below the highest received ID are treated as seen (None to track all IDs).
+            unsent (Optional[Callable[[int], bool]]): Returns True for IDs that are never sent (skipped by the threshold).
+        """
         self.threshold = 0  # The Highest ID such that all IDs below this are seen.
         self.seen = set()   # Stores out of sequence IDs
+        self.window = window
+        self.unsent = unsent
 
     def updateThreshold(self):
-        """Advancing Threshold by removing consequetive IDs"""
-        while self.threshold + 1 in self.seen:
+        """Advancing Threshold by removing consequetive IDs (and skipping IDs never sent)"""
+        while True:
+            if self.threshold + 1 in self.seen:
+                self.seen.remove(self.threshold + 1)
+            elif self.unsent is None or not self.unsent(self.threshold + 1):
+                return
             self.threshold += 1
-            self.seen.remove(self.threshold)
 
     def check(self, id: int) -> bool:
         """Returns True if ID has been received before."""
@@ -45,10 +64,58 @@ class RepeatChecker:
             return False
         
         self.seen.add(id)
-        if id == self.threshold + 1:
-            self.updateThreshold()
+        if self.window is not None and id - self.threshold > 2 * self.window:
+            ## Slide the window (every `window` IDs at most, so amortized O(1) per ID)
+            self.threshold = id - self.window
+            self.seen = {seenId for seenId in self.seen if seenId > self.threshold}
+        if id == self.threshold + 1 or self.unsent is not None:
+            self.updateThreshold()  # IDs never sent may have been created since the last message
         return True
 
+    def __len__(self) -> int:
+        """Number of out of sequence IDs kept."""
+        return len(self.seen)
+
+class StreamRepeatChecker:
+    """
+    Tracks received messages whose IDs interleave the sequences of several streams (ID = sequence * streams + stream + 1,
+    e.g. transactions with per creator counters), with one RepeatChecker per stream, so that a stream lagging behind
+    (e.g. a peer creating fewer transactions) does not hold back the thresholds of the others.
+    """
+
+    def __init__(self, streams: int, window: Optional[int] = None, unsent: Optional[Callable[[int], bool]] = None):
+        """
+        Args:
+            streams (int): Number of streams.
+            window (Optional[int]): IDs this far below the highest received ID of their stream are treated as seen (None to track all IDs).
+            unsent (Optional[Callable[[int], bool]]): Returns True for IDs that are never sent (skipped by the thresholds).
+        """
+        self.streams = streams
+        self.unsent = unsent
+        streamWindow = max(1, window // streams) if window is not None else None   # Same span of IDs as a single checker
+        self.checkers = [RepeatChecker(streamWindow, partial(self.position_unsent, stream) if unsent is not None else None) for stream in range(streams)]
+
+    def position_unsent(self, stream: int, position: int) -> bool:
+        """Returns True if the message at the given position of the stream (starting at 1) is never sent."""
+        return self.unsent((position - 1) * self.streams + stream + 1)
+
+    def check(self, id: int) -> bool:
+        """Returns True if ID has been received before."""
+        return self.checkers[(id - 1) % self.streams].check((id - 1) // self.streams + 1)
+
+    def add(self, id: int) -> bool:
+        """
+        Adds a new message if not seen before
+
+        Returns:
+            bool: True if the id was added, False if id was duplicate.
+        """
+        return self.checkers[(id - 1) % self.streams].add((id - 1) // self.streams + 1)
+
+    def __len__(self) -> int:
+        """Number of out of sequence IDs kept."""
+        return sum(len(checker) for checker in self.checkers)
+
 @dataclass
 class BlockHashMetadata:
     """Metadata for tracking block hash propagation and handling."""
@@ -79,16 +146,26 @@ class PeerNode:
         self.pij = {}
         self.cij = {}
 
-        self.mempool = set()
-        self.txnPropagationChecker = RepeatChecker()    # For loopless forwarding of transactions
+        self.mempool: Union[Set[int], IndexedMempool] = IndexedMempool(genesisBlock.peerBalance) if Config.indexed_mempool else set()     # Transaction IDs (rows of the transaction store)
+        self.mempoolTip = genesisBlock.blkId    # Chain tip the mempool was last updated for (incremental mempool)
+        ## For loopless forwarding of transactions, coinbases (never gossiped) skipped, one sequence per creator with per creator transaction counters
+        if Config.peer_streams:
+            self.txnPropagationChecker = StreamRepeatChecker(len(Block.peerIds), Config.txn_window, Transaction.is_coinbase)
+        else:
+            self.txnPropagationChecker = RepeatChecker(Config.txn_window, Transaction.is_coinbase)
 
         self.receivedHashes: dict[str, BlockHashMetadata] = {} 
 
         self.miningBlkId = None
-        self.blockchain = BlockchainTree(genesisBlock)
+        self.miningStartTime = 0
+        self.blockchain = self.create_blockchain(genesisBlock)
 
         ## Counter Measure for eclipse attack
-        self.peerPendingRequests: Dict[int, Set[str]] = {}  # For each connected peer, the set of blkIds for which get request is sent, but block not received
+        self.peerPendingRequests: Dict[int, Set[BlockId]] = {}  # For each connected peer, the set of blkIds for which get request is sent, but block not received
+
+    def create_blockchain(self, genesisBlock: Block) -> BlockchainTree:
+        """Creates the blockchain tree of the peer (trees report their height to the shared block DAG, so only one is created per peer)."""
+        return BlockchainTree(genesisBlock)
 
     def add_connected_peer(self, connectedPeerId: int):
         """Add a connected peer."""
@@ -103,20 +180,20 @@ class PeerNode:
         """Sets the link speed for a connection to a peer."""
         self.cij[connectedPeerId] = cij
 
-    def add_txn_in_mempool(self, txn: Transaction):
-        """Adds a transaction to the mempool and marks it as seen."""
-        self.mempool.add(txn)
-        self.txnPropagationChecker.add(txn.txnID)
+    def add_txn_in_mempool(self, txnID: int):
+        """Adds a transaction (by ID) to the mempool and marks it as seen."""
+        self.mempool.add(txnID)
+        self.txnPropagationChecker.add(txnID)
 
-    def transaction_seen(self, txn: Transaction) -> bool:
+    def transaction_seen(self, txnID: int) -> bool:
         """Checks if a transaction has been received before."""
-        return self.txnPropagationChecker.check(txn.txnID)
+        return self.txnPropagationChecker.check(txnID)
 
-    def block_seen(self, blkId: str) -> bool:
+    def block_seen(self, blkId: BlockId) -> bool:
         """Checks if a block has been received before."""
         return self.blockchain.check_block(blkId)
 
-    def respond_to_get_received(self, blkId: str, senderId: int, channel: int):
+    def respond_to_get_received(self, blkId: BlockId, senderId: int, channel: int):
         """Handles the response when a requested block is received."""
         if channel == 1:
             self.peerPendingRequests[senderId].discard(blkId)
@@ -135,7 +212,7 @@ class PeerNode:
                 break
         return trust_active_peer
 
-    def add_hash(self, blkId: str, senderId: int, channel: int) -> bool:
+    def add_hash(self, blkId: BlockId, senderId: int, channel: int) -> bool:
         """
         Adds a block hash to the received Hashes.
         Returns:
@@ -155,7 +232,7 @@ class PeerNode:
 
         return len(self.receivedHashes[blkId].active_senders) == 0
     
-    def scheduled_get(self, peerId: int, channel: int, blkId: str):
+    def scheduled_get(self, peerId: int, channel: int, blkId: BlockId):
         """Updates meta data to indicate that a get request has been scheduled corresponding to given connection and block id."""
         self.receivedHashes[blkId].passive_senders.remove((peerId, channel))
         self.receivedHashes[blkId].active_senders.append((peerId, channel))
@@ -163,11 +240,11 @@ class PeerNode:
         if channel == 1:
             self.peerPendingRequests[peerId].add(blkId)
 
-    def get_block_for_get_request(self, channel: int, blkId: str) -> Optional[Block]:
+    def get_block_for_get_request(self, channel: int, blkId: BlockId) -> Optional[Block]:
         """Returns the block corresponding to given block Id (used only when needing to forward block due to get request)."""
         return self.blockchain.get_block_from_hash(blkId)
 
-    def hash_timeout(self, targetId: int, channel: int, blkId: str) -> Optional[Tuple[int, int]]:
+    def hash_timeout(self, targetId: int, channel: int, blkId: BlockId) -> Optional[Tuple[int, int]]:
         """Process Timeout event and return which connection new get request should be scheduled to."""
         self.receivedHashes[blkId].active_senders.remove((targetId, channel))
 
@@ -187,8 +264,10 @@ class PeerNode:
             return None
         return self.receivedHashes[blkId].passive_senders[0]
 
-    def get_all_senders(self, blkId: str) -> List[Tuple[int, int]]:
+    def get_all_senders(self, blkId: BlockId) -> List[Tuple[int, int]]:
         """Return all peers who sent given hash."""
+        if blkId not in self.receivedHashes:
+            return []   # Block evicted from the orphan pool and received again, its hash metadata was already dropped
         return map(lambda x: x[0], self.receivedHashes[blkId].all_senders)
     
     def get_connected_list(self, creatorId: int) -> List[Tuple[int, int]]:
@@ -208,6 +287,10 @@ class PeerNode:
         self.receivedHashes.pop(block.blkId, None)
 
         self.blockchain.add_block(block, arrTime)
+
+        if Config.incremental_mempool or Config.indexed_mempool:
+            self.update_mempool()
+            return None
         
         # Update mempool for the longest chain
         lca = self.blockchain.lca()
@@ -216,9 +299,40 @@ class PeerNode:
         self.mempool = self.mempool | insert_set
         self.mempool = self.mempool.difference(del_set)
 
-    def set_miningBlk(self, blkId: str):
-        """Updates the block ID currently being mined."""
+    def update_mempool(self):
+        """
+        Updates the mempool in place for the current longest chain (incremental and indexed mempools).
+        Steps:
+        - Nothing to do if the longest chain tip did not change.
+        - If the new tip extends the previous one, remove the transactions of the new block.
+        - Otherwise (reorg), walk from the previous tip to the LCA re-adding transactions of disconnected blocks,
+          then from the new tip to the LCA removing transactions of connected blocks.
+        - Indexed mempool: re-check the senders whose balance changed against the new tip.
+        """
+        tip = self.blockchain.get_lastBlock()
+        if tip.blkId == self.mempoolTip:
+            return
+
+        if tip.parentBlkID == self.mempoolTip:
+            blocks = [tip]
+            self.mempool.difference_update(tip.Txns[1:].tolist())
+        else:
+            lca = self.blockchain.lca(tip.blkId, self.mempoolTip)
+            blocks = list(self.blockchain.chain_blocks(self.mempoolTip, lca))
+            for block in blocks:
+                self.mempool.update(block.Txns[1:].tolist())
+            connected = list(self.blockchain.chain_blocks(tip.blkId, lca))
+            for block in connected:
+                self.mempool.difference_update(block.Txns[1:].tolist())
+            blocks += connected
+        if Config.indexed_mempool:
+            self.mempool.retip(tip.peerBalance, np.concatenate([block.Txns for block in blocks]))
+        self.mempoolTip = tip.blkId
+
+    def set_miningBlk(self, blkId: BlockId, startTime: float):
+        """Updates the block ID currently being mined (on top of), and the time mining on it started."""
         self.miningBlkId = blkId
+        self.miningStartTime = startTime
 
     def mining_check(self) -> bool:
         """
@@ -235,28 +349,69 @@ class PeerNode:
         """Returns the last block in the longest chain."""
         return self.blockchain.get_lastBlock()
     
-    def sample_transactions(self) -> List['Transaction']:
+    def sample_transactions(self) -> List[int]:
         """
         Selects valid transactions from the mempool based on account balances.
         Returns:
-            List[Transaction]: A list of transactions that can be included in a new block.
+            List[int]: IDs of the transactions that can be included in a new block (coinbase first).
         """
 
-        currentBalance = self.get_lastBlk().peerBalance
-        peerSpent = {peerId: 0 for peerId in currentBalance.keys()}
         txns = []
-        txns.append(Transaction(-1, self.peerId, Block.miningReward)) # Coinbase
-
-        for txn in self.mempool:
-            if currentBalance[txn.senID] < peerSpent[txn.senID] + txn.amt:
+        txns.append(Transaction.create(-1, self.peerId, Block.miningReward)) # Coinbase
+        if Config.indexed_mempool:
+            parent = self.get_lastBlk()
+            if parent.blkId == self.mempoolTip:
+                return txns + self.mempool.select(999)
+            return txns + self.mempool.select_for(parent.peerBalance, 999)     # Mining on a block the index does not track (private chain)
+
+        mempool = np.fromiter(self.mempool, dtype=np.int64, count=len(self.mempool))
+        senders = Transaction.store.senders[mempool]
+        amounts = Transaction.store.amounts[mempool]
+        if Config.array_balances:
+            return txns + self.sample_transactions_array(mempool, senders, amounts)
+
+        senders = senders.tolist()
+        amounts = amounts.tolist()
+        remaining = self.get_lastBlk().peerBalance.get_balances(set(senders))  # Balance left of each sender
+        for txnID, senderId, amount in zip(mempool.tolist(), senders, amounts):
+            if remaining[senderId] < amount:
                 continue
-            peerSpent[txn.senID] += txn.amt
-            txns.append(txn)
+            remaining[senderId] -= amount
+            txns.append(txnID)
             if len(txns) == 1000:
                 break
         return txns
 
 
+    def sample_transactions_array(self, mempool: np.ndarray, senders: np.ndarray, amounts: np.ndarray) -> List[int]:
+        """
+        Selects valid transactions from the mempool (same as sample_transactions), with array balances.
+        Spend totals of all senders are checked against their balances at once, only transactions of senders
+        who cannot afford all of their mempool transactions are checked one by one.
+
+        Args:
+            mempool (np.ndarray): IDs of the mempool transactions, in mempool order.
+            senders (np.ndarray): Sender of each mempool transaction.
+            amounts (np.ndarray): Amount of each mempool transaction.
+        """
+        balances = self.get_lastBlk().peerBalance.to_array()
+        overdrawn = spend_totals(senders, amounts, len(balances)) > balances
+        if not overdrawn.any():
+            return mempool[:999].tolist()
+
+        overdrawn = overdrawn.tolist()
+        remaining = balances.tolist()
+        txns = []
+        for txnID, senderId, amount in zip(mempool.tolist(), senders.tolist(), amounts.tolist()):
+            if overdrawn[senderId]:
+                if remaining[senderId] < amount:
+                    continue
+                remaining[senderId] -= amount
+            txns.append(txnID)
+            if len(txns) == 999:
+                break
+        return txns
+
     def log_tree(self, folder: str):
         """Logs the blockchain tree to a file."""
         self.blockchain.print_tree(filename=f"{folder}/Peer_{self.peerId}.csv")
\ No newline at end of file
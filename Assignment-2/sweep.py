@@ -0,0 +1,212 @@
+import argparse
+import contextlib
+import csv
+import itertools
+import multiprocessing
+import os
+import random
+import time
+from dataclasses import dataclass, fields
+from config import Config
+from malicious import MaliciousNode
+from typing import List, Dict, Union
+
+
+@dataclass(frozen=True)
+class SweepConfig:
+    """One configuration (and seed) of a parameter sweep."""
+    num_peers: int
+    ratio_malicious: float
+    timeout: float
+    transaction_interarrival: float
+    block_interarrival: float
+    sim_time: float
+    remove_eclipse: bool
+    counter_measure: bool
+    engine: str
+    seed: int
+
+    def folder(self, root: str) -> str:
+        """Results folder of this configuration (default folder name of main.py, with the seed)."""
+        from main import default_folder
+
+        num_malicious = int(self.num_peers * self.ratio_malicious)
+        name = default_folder(self.num_peers - num_malicious, num_malicious, self.timeout, self.transaction_interarrival, self.block_interarrival, self.sim_time, self.remove_eclipse, self.counter_measure, self.engine)
+        return f"{root}/{name}_seed{self.seed}"
+
+
+STATS_FILE = "stats.csv"
+METRICS = ["chain_length", "malicious_in_chain", "malicious_blocks", "total_blocks", "malicious_chain_ratio", "malicious_success_ratio", "events", "elapsed"]
+
+
+def chain_statistics(peers) -> Dict[str, float]:
+    """
+    Statistics of the blockchain tree of the ringmaster (same as visualization.py).
+
+    Returns:
+        Dict[str, float]: Longest chain length, malicious blocks in the longest chain, malicious and total blocks in the tree,
+            fraction of the longest chain mined by malicious peers, fraction of malicious blocks that ended in the longest chain.
+    """
+    tree = peers[MaliciousNode.RingmasterId].blockchain
+    malicious = {peer.peerId for peer in peers if isinstance(peer, MaliciousNode)}
+
+    chain_length, malicious_in_chain = 0, 0
+    block = tree.get_lastBlock()
+    while block.depth > 0:
+        chain_length += 1
+        malicious_in_chain += block.creatorID in malicious
+        block = tree.get_block_from_hash(block.parentBlkID)
+
+    creators = [tree.get_block_from_hash(blkId).creatorID for blkId in tree.verified_blocks() if blkId != tree.genesisBlock.blkId]
+    malicious_blocks = sum(creatorId in malicious for creatorId in creators)
+    return {
+        "chain_length": chain_length,
+        "malicious_in_chain": malicious_in_chain,
+        "malicious_blocks": malicious_blocks,
+        "total_blocks": len(creators),
+        "malicious_chain_ratio": malicious_in_chain / chain_length if chain_length > 0 else 0,
+        "malicious_success_ratio": malicious_in_chain / malicious_blocks if malicious_blocks > 0 else 0,
+    }
+
+
+def read_stats(folder: str) -> Union[Dict[str, float], None]:
+    """Returns the statistics of a finished configuration, None if its results do not exist."""
+    path = f"{folder}/{STATS_FILE}"
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as file:
+        row = next(csv.DictReader(file))
+    return {metric: float(row[metric]) for metric in METRICS}
+
+
+def fork_available() -> bool:
+    """Returns True if worker processes can be forked (they then inherit the imported modules instead of importing them again)."""
+    return "fork" in multiprocessing.get_all_start_methods()
+
+
+def run_configuration(config: SweepConfig, root: str) -> Dict[str, float]:
+    """
+    Runs one configuration in this process, and stores its results (same logs as main.py) in its folder.
+    Simulator output is written to `output.txt`, statistics are written last to `stats.csv`, marking the results as complete.
+    """
+    from main import setup_peers, logger
+    from eventSimulator import EventSimulator, run_simulation
+
+    folder = config.folder(root)
+    os.makedirs(folder, exist_ok=True)
+    Config.remove_eclipse = config.remove_eclipse
+    Config.counter_measure = config.counter_measure
+    EventSimulator.showProgress = False
+
+    with open(f"{folder}/output.txt", "w") as output, contextlib.redirect_stdout(output):
+        random.seed(config.seed)
+        peers, Graph, Overlay_Graph = setup_peers(config.num_peers, int(config.num_peers * config.ratio_malicious), folder)
+        start = time.perf_counter()
+        simulator = run_simulation(peers, config.block_interarrival, config.transaction_interarrival, config.timeout, config.sim_time, engine=config.engine)
+        elapsed = time.perf_counter() - start
+
+    Config.log(folder)
+    logger(peers, Graph, Overlay_Graph, folder)
+
+    stats = chain_statistics(peers)
+    stats["events"] = simulator.processedEvents
+    stats["elapsed"] = elapsed
+    with open(f"{folder}/{STATS_FILE}.tmp", "w", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=METRICS)
+        writer.writeheader()
+        writer.writerow(stats)
+    os.replace(f"{folder}/{STATS_FILE}.tmp", f"{folder}/{STATS_FILE}")
+    return stats
+
+
+def run_task(task):
+    """Pool entry point, runs one (config, root) task and returns the config with its statistics."""
+    config, root = task
+    return config, run_configuration(config, root)
+
+
+def write_summary(results: Dict[SweepConfig, Dict[str, float]], filename: str):
+    """Writes (and prints) the statistics of every configuration averaged over seeds, one row per configuration."""
+    parameters = [field.name for field in fields(SweepConfig) if field.name != "seed"]
+    groups: Dict[tuple, List[Dict[str, float]]] = {}
+    for config, stats in results.items():
+        groups.setdefault(tuple(getattr(config, parameter) for parameter in parameters), []).append(stats)
+
+    with open(filename, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(parameters + ["seeds"] + METRICS)
+        for key, runs in groups.items():
+            writer.writerow(list(key) + [len(runs)] + [f"{sum(stats[metric] for stats in runs) / len(runs):.4f}" for metric in METRICS])
+
+    header = ["n", "m", "o", "r", "c", "engine", "seeds", "chain", "mal/chain", "mal success", "time (s)"]
+    print("".join(f"{column:>12}" for column in header))
+    for key, runs in groups.items():
+        config = dict(zip(parameters, key))
+        mean = {metric: sum(stats[metric] for stats in runs) / len(runs) for metric in METRICS}
+        row = [config["num_peers"], config["ratio_malicious"], config["timeout"], int(config["remove_eclipse"]), int(config["counter_measure"]), config["engine"], len(runs),
+               f"{mean['chain_length']:.1f}", f"{mean['malicious_chain_ratio']:.3f}", f"{mean['malicious_success_ratio']:.3f}", f"{mean['elapsed']:.1f}"]
+        print("".join(f"{str(value):>12}" for value in row))
+
+
+def run_sweep(grid: Dict[str, list], seeds: List[int], root: str, workers: int):
+    """
+    Runs every configuration of the parameter grid for every seed, on a pool of worker processes.
+    Steps:
+    - Expand the grid (cartesian product of parameter values and seeds).
+    - Skip configurations whose results already exist in the root folder.
+    - Run the remaining configurations on the pool (one process per configuration, as simulator state is global).
+      Workers are forked where available, else spawned (each configuration sets up its own state in run_configuration).
+    - Write the summary table of all configurations, averaged over seeds.
+    """
+    configs = [SweepConfig(*values, seed=seed) for values in itertools.product(*grid.values()) for seed in seeds]
+    results = {}
+    tasks = []
+    for config in configs:
+        stats = read_stats(config.folder(root))
+        if stats is not None:
+            results[config] = stats
+        else:
+            tasks.append((config, root))
+    print(f"{len(configs)} configurations, {len(results)} with existing results, running {len(tasks)} on {workers} workers.")
+
+    start = time.perf_counter()
+    context = multiprocessing.get_context("fork" if fork_available() else None)
+    with context.Pool(workers, maxtasksperchild=1) as pool:
+        for done, (config, stats) in enumerate(pool.imap_unordered(run_task, tasks), start=1):
+            results[config] = stats
+            print(f"[{done}/{len(tasks)}] {config.folder(root)} ({stats['elapsed']:.1f}s)")
+    print(f"Sweep finished in {time.perf_counter() - start:.1f}s.")
+
+    write_summary({config: results[config] for config in configs}, f"{root}/summary.csv")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Runs a parameter grid of simulations on a process pool.")
+
+    parser.add_argument("-n", "--num_peers", type=int, nargs="+", required=True, help="Total Number of Peers")
+    parser.add_argument("-m", "--ratio_malicious", type=float, nargs="+", required=True, help="Fraction of Malicious Peers")
+    parser.add_argument("-o", "--timeout", type=float, nargs="+", required=True, help="Timeout Time (seconds)")
+    parser.add_argument("-t", "--transaction_interarrival", type=float, nargs="+", required=True, help="Mean Interarrival Time for Transaction Generation (seconds)")
+    parser.add_argument("-b", "--block_interarrival", type=float, nargs="+", required=True, help="Mean Interarrival Time of Blocks (seconds)")
+    parser.add_argument("-s", "--sim_time", type=float, nargs="+", required=True, help="Simulation Time (seconds)")
+    parser.add_argument("-r", "--remove_eclipse", type=int, nargs="+", choices=[0, 1], default=[0], help="Remove Eclipse Attack from Malicous Nodes (0, 1 or both)")
+    parser.add_argument("-c", "--counter_measure", type=int, nargs="+", choices=[0, 1], default=[0], help="Counter measure in Honest Nodes against eclipse attack (0, 1 or both)")
+    parser.add_argument("--seeds", type=int, nargs="+", default=[0], help="Seeds to run every configuration with")
+    parser.add_argument("-f", "--folder", type=str, default="sweep", help="Folder to store results of all configurations and the summary")
+    parser.add_argument("-j", "--workers", type=int, default=os.cpu_count() or 1, help="Number of worker processes")
+    parser.add_argument("-e", "--engine", type=str, nargs="+", choices=["simpy", "heap"], default=["heap"], help="Event engine (both give identical results, run separately)")
+    args = parser.parse_args()
+
+    grid = {
+        "num_peers": args.num_peers,
+        "ratio_malicious": args.ratio_malicious,
+        "timeout": args.timeout,
+        "transaction_interarrival": args.transaction_interarrival,
+        "block_interarrival": args.block_interarrival,
+        "sim_time": args.sim_time,
+        "remove_eclipse": [bool(value) for value in args.remove_eclipse],
+        "counter_measure": [bool(value) for value in args.counter_measure],
+        "engine": args.engine,
+    }
+    os.makedirs(args.folder, exist_ok=True)
+    run_sweep(grid, args.seeds, args.folder, args.workers)
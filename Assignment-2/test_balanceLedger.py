@@ -0,0 +1,69 @@
+import random
+import numpy as np
+from balanceLedger import ArrayBalanceLedger, BalanceLedger
+
+
+NUM_PEERS = 8
+
+
+def random_block(rng: random.Random, creatorId: int) -> tuple:
+    """Senders, receivers and amounts of a block with a coinbase and a few random transactions (balances may go negative)."""
+    senders, receivers, amounts = [-1], [creatorId], [50]
+    for _ in range(rng.randrange(6)):
+        senders.append(rng.randrange(NUM_PEERS))
+        receivers.append(rng.randrange(NUM_PEERS))
+        amounts.append(rng.randrange(1, 20))
+    return np.array(senders, dtype=np.int64), np.array(receivers, dtype=np.int64), np.array(amounts, dtype=np.int64)
+
+
+def apply_block(balances: dict, txnArrays: tuple) -> dict:
+    """Reference balances after a block, a full dict copy updated one transaction at a time."""
+    balances = dict(balances)
+    for senderId, receiverId, amount in zip(*(array.tolist() for array in txnArrays)):
+        if senderId != -1:
+            balances[senderId] -= amount
+        balances[receiverId] += amount
+    return balances
+
+
+def dict_ledger(parent, txnArrays, depth):
+    """Dict backed ledger of a block."""
+    return BalanceLedger(parent, txnArrays, depth, list(range(NUM_PEERS)))
+
+
+def array_ledger(parent, txnArrays, depth):
+    """Array backed ledger of a block."""
+    return ArrayBalanceLedger(parent, txnArrays, depth, NUM_PEERS)
+
+
+def check_chain_and_fork(new_ledger):
+    """Builds a chain crossing several checkpoints and a fork off its middle, and compares every ledger with the reference balances."""
+    rng = random.Random(4)
+    genesis = new_ledger(None, None, 0)
+    chain = [(genesis, {peerId: 0 for peerId in range(NUM_PEERS)})]
+    for depth in range(1, 3 * BalanceLedger.checkpointInterval + 5):
+        parent, expected = chain[-1]
+        txnArrays = random_block(rng, rng.randrange(NUM_PEERS))
+        chain.append((new_ledger(parent, txnArrays, depth), apply_block(expected, txnArrays)))
+
+    ## A fork from below a checkpoint, its ledgers must not change the ones of the chain they share deltas with
+    fork = [chain[BalanceLedger.checkpointInterval - 3]]
+    for depth in range(BalanceLedger.checkpointInterval - 2, BalanceLedger.checkpointInterval + 10):
+        parent, expected = fork[-1]
+        txnArrays = random_block(rng, rng.randrange(NUM_PEERS))
+        fork.append((new_ledger(parent, txnArrays, depth), apply_block(expected, txnArrays)))
+
+    for ledger, expected in chain + fork:
+        assert ledger.to_dict() == expected
+        assert all(ledger[peerId] == expected[peerId] for peerId in range(NUM_PEERS))
+        assert ledger.get_balances([1, 3, 6]) == {peerId: expected[peerId] for peerId in [1, 3, 6]}
+
+
+def test_ledger_matches_dict_balances():
+    """Delta-encoded ledgers give the balances of a full dict copy per block, on a chain and on a fork."""
+    check_chain_and_fork(dict_ledger)
+
+
+def test_array_ledger_matches_dict_balances():
+    """Array ledgers, applying a block's transactions as batched array operations, give the same balances."""
+    check_chain_and_fork(array_ledger)
@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+from balanceLedger import BalanceLedger
+from blockStore import BlockStore
+from config import Config
+from test_blockchainTree import extend, make_genesis
+
+
+@pytest.mark.parametrize("array_balances", [False, True])
+def test_loaded_blocks_match_originals(tmp_path, monkeypatch, array_balances):
+    """Blocks evicted from a small cache load back with the same transactions and balances, from deltas and from checkpoints."""
+    monkeypatch.setattr(Config, "array_balances", array_balances)
+    genesis = make_genesis()
+    blocks = [genesis] + extend(genesis, BalanceLedger.checkpointInterval + 8, 0)
+    blocks += extend(blocks[-1], 3, 1)
+
+    store = BlockStore(str(tmp_path / "blocks.db"), capacity=4)
+    for index, block in enumerate(blocks):
+        ## The last block is written with its full balances, as a block whose parent is not in the block DAG yet
+        store.put(index, block, checkpoint=index == len(blocks) - 1)
+    ## Genesis, the ledger checkpoint and the last block hold full balances, the others only their delta
+    deltas = store.connection.execute("SELECT COUNT(*) FROM bodies WHERE balances IS NULL").fetchone()[0]
+    assert deltas == len(blocks) - 3
+    store.cache.clear()
+
+    def load(index: int):
+        """Loads a block, rebuilding delta ledgers on top of the loaded parent."""
+        return store.get(index, blocks[index], lambda: load(index - 1).peerBalance)
+
+    def unreachable():
+        """Parent ledger of a block that must not need it."""
+        raise AssertionError("parent ledger loaded for a block stored with full balances")
+
+    assert store.get(len(blocks) - 1, blocks[-1], unreachable).peerBalance.to_dict() == blocks[-1].peerBalance.to_dict()
+    for index in reversed(range(len(blocks))):
+        loaded = load(index)
+        assert loaded.blkId == blocks[index].blkId and loaded.depth == blocks[index].depth
+        assert np.array_equal(loaded.Txns, blocks[index].Txns)
+        assert loaded.peerBalance.to_dict() == blocks[index].peerBalance.to_dict()
+    assert store.misses >= len(blocks)
+    store.close()
@@ -0,0 +1,81 @@
+import random
+import pytest
+from block import Block
+from blockchainTree import BlockchainTree
+from config import Config
+from transaction import Transaction
+
+
+def make_genesis(num_peers: int = 10) -> Block:
+    """Genesis block of a network of num_peers peers."""
+    Block.peerIds = list(range(num_peers))
+    return Block(creatorId=-1, txns=[], parentBlockId="-1", parentBlockBalance=None, depth=0, timestamp=0)
+
+
+def extend(parent: Block, length: int, creatorId: int) -> list:
+    """Chain of `length` coinbase only blocks mined by creatorId on top of parent."""
+    blocks = []
+    for _ in range(length):
+        parent = Block(creatorId=creatorId, txns=[Transaction.create(-1, creatorId, Block.miningReward)], parentBlockId=parent.blkId, parentBlockBalance=parent.peerBalance, depth=parent.depth + 1, timestamp=parent.timestamp + 1)
+        blocks.append(parent)
+    return blocks
+
+
+def walk_lca(blocks: dict, blk1, blk2):
+    """Reference LCA walking parent links one block at a time."""
+    block1, block2 = blocks[blk1], blocks[blk2]
+    while block1.depth < block2.depth:
+        block2 = blocks[block2.parentBlkID]
+    while block1.depth > block2.depth:
+        block1 = blocks[block1.parentBlkID]
+    while block1.blkId != block2.blkId:
+        block1, block2 = blocks[block1.parentBlkID], blocks[block2.parentBlkID]
+    return block1.blkId
+
+
+def test_lca_matches_parent_walk():
+    """Skip pointer LCA and ancestor queries agree with walking parent links, on a tree with forks of varying lengths."""
+    rng = random.Random(5)
+    genesis = make_genesis()
+    tree = BlockchainTree(genesis)
+    blocks = [genesis]
+    ## Parents among the newest blocks, so the tree is deep with forks branching at every depth
+    for _ in range(300):
+        parent = blocks[max(0, len(blocks) - 1 - rng.randrange(6))]
+        block = extend(parent, 1, rng.randrange(10))[0]
+        tree.add_block(block, block.timestamp)
+        blocks.append(block)
+    byId = {block.blkId: block for block in blocks}
+
+    for _ in range(500):
+        block1, block2 = rng.choice(blocks), rng.choice(blocks)
+        assert tree.lca(block1.blkId, block2.blkId) == walk_lca(byId, block1.blkId, block2.blkId)
+        depth = rng.randrange(block1.depth + 1)
+        ancestor = block1
+        while ancestor.depth > depth:
+            ancestor = byId[ancestor.parentBlkID]
+        assert tree.ancestor(block1.blkId, depth) == ancestor.blkId
+
+
+def test_reorg_below_finality_depth_raises(monkeypatch):
+    """A peer switching to a fork that branched below the pruned depth cannot re-add the pruned blocks' transactions, and says so."""
+    monkeypatch.setattr(Config, "finality_depth", 2)
+    genesis = make_genesis()
+    main = extend(genesis, 10, 0)
+    fork = extend(main[1], 12, 1)
+
+    ## The first peer validates the fork (recording its validity), the second only follows the main chain until pruning
+    first, second = BlockchainTree(genesis), BlockchainTree(genesis)
+    for block in main + fork:
+        first.add_block(block, block.timestamp)
+    for block in main:
+        second.add_block(block, block.timestamp)
+    assert first.dag.prunedDepth > main[1].depth
+
+    for block in fork:
+        second.add_block(block, block.timestamp)
+    assert second.longestChainTip == fork[-1].blkId
+    lca = second.lca(fork[-1].blkId, main[-1].blkId)
+    assert lca == main[1].blkId
+    with pytest.raises(RuntimeError, match="finality depth"):
+        second.get_txn_set(main[-1].blkId, lca)
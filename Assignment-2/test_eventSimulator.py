@@ -0,0 +1,71 @@
+import random
+import eventSimulator
+from benchUtils import reset_state
+from config import Config
+from eventSimulator import run_simulation
+from heapEnvironment import HeapEnvironment
+from main import setup_peers
+
+
+def simulate(folder, monkeypatch, engine: str = "heap", seed: int = 3, **options) -> dict:
+    """Runs a small seeded simulation with the given Config options, and returns the contents of its Peer_i.csv logs."""
+    for option, value in options.items():
+        monkeypatch.setattr(Config, option, value)
+    folder.mkdir()
+    random.seed(seed)
+    reset_state()
+    peers, _, _ = setup_peers(20, 4, str(folder))
+    run_simulation(peers, 10, 2, 0.5, 100, engine=engine)
+    for peer in peers:
+        peer.log_tree(str(folder))
+    return {path.name: path.read_text() for path in sorted(folder.glob("Peer_*.csv"))}
+
+
+def test_heap_matches_simpy(tmp_path, monkeypatch):
+    """The heap engine processes events in the same order as simpy, so every peer logs the same tree."""
+    heap = simulate(tmp_path / "heap", monkeypatch, engine="heap")
+    assert heap == simulate(tmp_path / "simpy", monkeypatch, engine="simpy")
+    assert len(heap) == 20 and all(log.count("\n") > 1 for log in heap.values())
+
+
+def test_fanout_matches_per_neighbor_entries(tmp_path, monkeypatch):
+    """Broadcast fan-out records deliver in the same order as one queue entry per neighbor."""
+    fanout = simulate(tmp_path / "fanout", monkeypatch, fanout=True)
+    assert fanout == simulate(tmp_path / "entries", monkeypatch, fanout=False)
+
+
+def test_compaction_matches_uncompacted_queue(tmp_path, monkeypatch):
+    """Rebuilding the queue without stale events (often, as the tiny network never reaches the default minimum queue size) does not change the processing order."""
+    compactions = []
+
+    class SmallQueueEnvironment(HeapEnvironment):
+        """Heap engine compacting queues of any size, counting compactions."""
+        def __init__(self, compactRatio):
+            super().__init__(compactRatio, compactMinimum=10)
+
+        def compact(self):
+            compactions.append(self.stale)
+            super().compact()
+
+    monkeypatch.setattr(eventSimulator, "HeapEnvironment", SmallQueueEnvironment)
+    compacted = simulate(tmp_path / "compacted", monkeypatch, compact_ratio=0.01)
+    assert len(compactions) > 0
+    assert compacted == simulate(tmp_path / "uncompacted", monkeypatch, compact_ratio=None)
+
+
+def test_compact_ids_match_hex_ids(tmp_path, monkeypatch):
+    """Registry handles are converted back to the same hex block IDs on export."""
+    compact = simulate(tmp_path / "compact", monkeypatch, compact_ids=True)
+    assert compact == simulate(tmp_path / "hex", monkeypatch, compact_ids=False)
+
+
+def test_validation_cache_matches_revalidation(tmp_path, monkeypatch):
+    """Sharing block validity through the DAG accepts and rejects the same blocks as validating on every peer."""
+    cached = simulate(tmp_path / "cached", monkeypatch, validation_cache=True)
+    assert cached == simulate(tmp_path / "revalidated", monkeypatch, validation_cache=False)
+
+
+def test_array_balances_match_dict_balances(tmp_path, monkeypatch):
+    """Batched array checks of block transactions accept and reject the same blocks as per transaction dict updates."""
+    arrays = simulate(tmp_path / "arrays", monkeypatch, array_balances=True)
+    assert arrays == simulate(tmp_path / "dicts", monkeypatch, array_balances=False)
@@ -0,0 +1,39 @@
+import random
+import tempfile
+import pytest
+from blockchainTree import BlockchainTree
+from config import Config
+from eventSimulator import run_simulation
+from main import setup_peers
+from malicious import MaliciousNode
+from transaction import Transaction
+
+
+@pytest.fixture
+def indexed_mempool():
+    Config.indexed_mempool = True
+    yield
+    Config.indexed_mempool = False
+
+
+def test_ringmaster_templates_valid(indexed_mempool, monkeypatch):
+    """Blocks mined by the ringmaster on its private chain (not tracked by its mempool index) spend only its parent's balances."""
+    validate = BlockchainTree.validate
+    invalid, mined = set(), set()
+    def counting_validate(self, block):
+        valid = validate(self, block)
+        if block.creatorID == MaliciousNode.RingmasterId:
+            mined.add(block.blkId)
+            if not valid:
+                invalid.add(block.blkId)
+        return valid
+    monkeypatch.setattr(BlockchainTree, "validate", counting_validate)
+
+    random.seed(5)
+    Transaction.transactionCounter = 1
+    with tempfile.TemporaryDirectory() as folder:
+        peers, _, _ = setup_peers(20, 6, folder)
+    run_simulation(peers, 10, 0.1, 1, 150, engine="heap")
+
+    assert mined
+    assert not invalid
@@ -0,0 +1,39 @@
+import random
+from hashlib import sha256
+from merkleTree import MerkleBuilder, merkle_root
+
+
+def random_digests(rng: random.Random, count: int) -> bytes:
+    """Concatenated raw digests of `count` random leaves."""
+    return b"".join(sha256(rng.randbytes(8)).digest() for _ in range(count))
+
+
+def hex_leaves(digests: bytes) -> list:
+    """Hex leaf digests of concatenated raw digests."""
+    return [digests[i:i+32].hex() for i in range(0, len(digests), 32)]
+
+
+def test_builder_matches_merkle_root():
+    """Cached roots equal the hex reference for every leaf count, including odd levels and the empty block."""
+    rng = random.Random(1)
+    builder = MerkleBuilder()
+    for count in range(0, 70):
+        digests = random_digests(rng, count)
+        assert builder.merkle_root(digests) == merkle_root(hex_leaves(digests))
+
+
+def test_builder_reuses_and_evicts_subtrees():
+    """Successive blocks sharing most leaves hit the cache, and a tiny cache evicting entries still gives the reference root."""
+    rng = random.Random(2)
+    mempool = random_digests(rng, 200)
+    builder, small = MerkleBuilder(), MerkleBuilder(capacity=8)
+    for _ in range(20):
+        ## Replace a few leaves between blocks, as a slowly changing mempool
+        for _ in range(3):
+            i = rng.randrange(200) * 32
+            mempool = mempool[:i] + random_digests(rng, 1) + mempool[i+32:]
+        expected = merkle_root(hex_leaves(mempool))
+        assert builder.merkle_root(mempool) == expected
+        assert small.merkle_root(mempool) == expected
+    assert builder.hits > builder.misses
+    assert len(small.cache) <= 8
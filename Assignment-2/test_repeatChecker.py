@@ -0,0 +1,75 @@
+import random
+from peer import RepeatChecker, StreamRepeatChecker
+
+
+STREAMS = 4
+
+
+def coinbase(id: int) -> bool:
+    """Every seventh ID is a coinbase, never gossiped."""
+    return id % 7 == 0
+
+
+def deliveries(rng: random.Random, ids: list, duplicates: float = 0.2) -> list:
+    """IDs in order of arrival, reordered by up to 30 positions, with some IDs delivered again later."""
+    arrivals = []
+    for position, id in enumerate(ids):
+        time = position + rng.uniform(0, 30)
+        arrivals.append((time, id))
+        if rng.random() < duplicates:
+            arrivals.append((time + rng.uniform(0, 60), id))
+    return [id for _, id in sorted(arrivals)]
+
+
+def check_against_set(checker, arrivals: list) -> int:
+    """Adds the arrivals, checking duplicates against a set of every ID seen, and returns the peak number of IDs kept by the checker."""
+    seen = set()
+    peak = 0
+    for id in arrivals:
+        assert checker.add(id) == (id not in seen)
+        assert checker.check(id)
+        seen.add(id)
+        peak = max(peak, len(checker))
+    return peak
+
+
+def test_coinbase_gaps_do_not_hold_threshold():
+    """Skipping coinbase IDs keeps the tracked IDs bounded by the reordering, where tracking them all keeps every ID after the first gap."""
+    rng = random.Random(6)
+    ids = [id for id in range(1, 3001) if not coinbase(id)]
+    arrivals = deliveries(rng, ids)
+
+    skipping = RepeatChecker(None, coinbase)
+    assert check_against_set(skipping, arrivals) < 100
+    assert len(skipping) == 0
+
+    tracking = RepeatChecker()
+    check_against_set(tracking, arrivals)
+    assert len(tracking) == len(ids) - 6
+
+
+def test_stream_checker_skips_lagging_stream():
+    """A stream creating fewer IDs does not hold back the other streams, where a single checker keeps every ID after its first missing one."""
+    rng = random.Random(7)
+    ## The last stream stops creating IDs a quarter of the way through
+    ids = [id for id in range(1, 3001) if not coinbase(id) and ((id - 1) % STREAMS != STREAMS - 1 or id < 750)]
+    arrivals = deliveries(rng, ids)
+
+    streams = StreamRepeatChecker(STREAMS, None, coinbase)
+    assert check_against_set(streams, arrivals) < 100
+    assert len(streams) == 0
+
+    single = RepeatChecker(None, coinbase)
+    check_against_set(single, arrivals)
+    assert len(single) > 1000
+
+
+def test_window_slides_past_lost_ids():
+    """IDs never received do not keep the tracked IDs growing once the window slides past them, and are then treated as seen."""
+    for checker, window in [(RepeatChecker(50, coinbase), 50), (StreamRepeatChecker(STREAMS, 200, coinbase), 200)]:
+        rng = random.Random(8)
+        lost = {10, 11, 500}
+        ids = [id for id in range(1, 3001) if not coinbase(id) and id not in lost]
+        assert check_against_set(checker, deliveries(rng, ids)) <= 2 * window
+        assert all(checker.check(id) for id in lost)
+        assert not any(checker.add(id) for id in lost)
@@ -1,22 +1,97 @@
+import numpy as np
+from hashlib import sha256
+from typing import List
+
+
+class TransactionStore:
+    """
+    Columnar table of all transactions, indexed by transaction ID.
+    Each transaction is a row of the sender, receiver and amount arrays, along with its sha256 digest (the merkle leaf,
+    hashed once at creation), instead of a Python object. Blocks, mempools and events refer to transactions by ID.
+    """
+
+    def __init__(self, capacity: int = 1 << 16):
+        """
+        Args:
+            capacity (int): Initial number of rows, grown geometrically as transaction IDs exceed it.
+        """
+        self.senders = np.zeros(capacity, dtype=np.int64)
+        self.receivers = np.zeros(capacity, dtype=np.int64)
+        self.amounts = np.zeros(capacity, dtype=np.int64)
+        self.digests = np.zeros((capacity, 32), dtype=np.uint8)
+        self.count = 0
+
+    def reserve(self, size: int):
+        """Grows the columns to hold at least `size` rows."""
+        capacity = len(self.senders)
+        if size <= capacity:
+            return
+        capacity = max(2 * capacity, size)
+        for column in ["senders", "receivers", "amounts", "digests"]:
+            old = getattr(self, column)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, column, new)
+
+    def add(self, txnID: int, senderId: int, receiverId: int, amount: int):
+        """Stores the transaction with the given ID."""
+        self.reserve(txnID + 1)
+        self.senders[txnID] = senderId
+        self.receivers[txnID] = receiverId
+        self.amounts[txnID] = amount
+        self.digests[txnID] = np.frombuffer(sha256(TransactionStore.text(senderId, receiverId, amount).encode()).digest(), dtype=np.uint8)
+        self.count += 1
+
+    @staticmethod
+    def text(senderId: int, receiverId: int, amount: int) -> str:
+        """String representation of a transaction, used for hashing."""
+        return f"TxnID: {senderId} pays {receiverId} {amount} coins"
+
+    def texts(self, txnIDs: np.ndarray) -> List[str]:
+        """String representations of the given transactions."""
+        return [TransactionStore.text(senderId, receiverId, amount) for senderId, receiverId, amount in zip(self.senders[txnIDs].tolist(), self.receivers[txnIDs].tolist(), self.amounts[txnIDs].tolist())]
+
+    def hex_digests(self, txnIDs: np.ndarray) -> List[str]:
+        """Hex digests (merkle leaves) of the given transactions."""
+        raw = self.digests[txnIDs].tobytes()
+        return [raw[i:i+32].hex() for i in range(0, len(raw), 32)]
+
+    def memory(self) -> int:
+        """Bytes used by the columns."""
+        return self.senders.nbytes + self.receivers.nbytes + self.amounts.nbytes + self.digests.nbytes
 
 
 class Transaction:
     transactionCounter = 1
+    peerCounters = None     # Per creator counters (peer random streams), IDs then do not depend on event interleaving
     size = 8                # 8 Kilobits
+    store = TransactionStore()
 
-    def __init__(self, senderId: int, receiverId: int, amount: int):
+    @staticmethod
+    def create(senderId: int, receiverId: int, amount: int) -> int:
         """
+        Creates a new transaction in the transaction store.
+
         Args:
-            senderId (int): Peer ID of Sender
+            senderId (int): Peer ID of Sender (-1 for coinbase)
             receiverId (int): Peer ID od Receiver
             amount (int): Amount of coins to be transferred
+
+        Returns:
+            int: Unique ID of the transaction.
         """
-        self.txnID = Transaction.transactionCounter
-        Transaction.transactionCounter += 1
+        if Transaction.peerCounters is None:
+            txnID = Transaction.transactionCounter
+            Transaction.transactionCounter += 1
+        else:
+            creatorId = senderId if senderId != -1 else receiverId     # Coinbase is created by the miner
+            txnID = Transaction.peerCounters[creatorId] * len(Transaction.peerCounters) + creatorId + 1
+            Transaction.peerCounters[creatorId] += 1
 
-        self.senID = senderId
-        self.recID = receiverId
-        self.amt = amount
+        Transaction.store.add(txnID, senderId, receiverId, amount)
+        return txnID
 
-    def __str__(self):
-        return f"TxnID: {self.senID} pays {self.recID} {self.amt} coins"
+    @staticmethod
+    def is_coinbase(txnID: int) -> bool:
+        """Returns True if the ID is a coinbase known to this process (coinbases are never gossiped)."""
+        return txnID < len(Transaction.store.senders) and Transaction.store.senders[txnID] == -1